@@ -1,15 +1,17 @@
 from rest_framework import generics, status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from django.db.models import Count, Max
 from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from galleryItem.conditional import ConditionalGetMixin, conditional_get
 from .models import BlogPost
 from .serializers import BlogPostSerializer, BlogPostListSerializer
 from taggit.models import Tag
 
 
-class BlogPostListView(generics.ListAPIView):
+class BlogPostListView(ConditionalGetMixin, generics.ListAPIView):
     """
     List all published blog posts.
     
@@ -19,6 +21,7 @@ class BlogPostListView(generics.ListAPIView):
     queryset = BlogPost.objects.filter(is_published=True)
     serializer_class = BlogPostListSerializer
     permission_classes = [AllowAny]
+    validator_timestamp_fields = ('updated_date',)
     
     @swagger_auto_schema(
         operation_description="Get list of all published blog posts",
@@ -27,6 +30,7 @@ class BlogPostListView(generics.ListAPIView):
         },
         tags=['Blog']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
     
@@ -41,7 +45,7 @@ class BlogPostListView(generics.ListAPIView):
         return context
 
 
-class BlogPostDetailView(generics.RetrieveAPIView):
+class BlogPostDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     Retrieve a single blog post by slug.
     
@@ -53,6 +57,8 @@ class BlogPostDetailView(generics.RetrieveAPIView):
     permission_classes = [AllowAny]
     lookup_field = 'slug'
     lookup_url_kwarg = 'slug'
+    validator_timestamp_fields = ('updated_date',)
+    validator_last_modified = True  # every edit of the post moves updated_date
     
     @swagger_auto_schema(
         operation_description="Get detailed information about a blog post by slug",
@@ -62,6 +68,7 @@ class BlogPostDetailView(generics.RetrieveAPIView):
         },
         tags=['Blog']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
     
@@ -81,14 +88,24 @@ class BlogPostDetailView(generics.RetrieveAPIView):
         return obj
 
 
-class BlogTagListView(generics.ListAPIView):
+class BlogTagListView(ConditionalGetMixin, generics.ListAPIView):
     """
     List all tags used in published blog posts.
     
     Returns a list of all tags that are associated with published blog posts.
     """
     permission_classes = [AllowAny]
+    validator_timestamp_fields = ('updated_date',)
+    # tags.add()/remove() don't touch updated_date: follow the tag link rows too
+    validator_aggregates = {
+        'validator_tag_links': Count('tagged_items'),
+        'validator_tag_link_max': Max('tagged_items__id'),
+    }
     
+    def get_validator_queryset(self):
+        return BlogPost.objects.filter(is_published=True)
+    
+    @conditional_get
     def get(self, request, *args, **kwargs):
         # Get all tags from published blog posts
         published_posts = BlogPost.objects.filter(is_published=True)
@@ -1,10 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericRelation
 from django.urls import reverse
-from django.utils.text import slugify
 from django.utils import timezone
 from ckeditor.fields import RichTextField
 from taggit.managers import TaggableManager
+from taggit.models import TaggedItem
+
+from galleryItem.slugs import allocate_slug
 
 
 class BlogPost(models.Model):
@@ -31,6 +34,8 @@ class BlogPost(models.Model):
     
     # Tags
     tags = TaggableManager(blank=True, help_text="Add tags to categorize your blog post (e.g., 'hardwood', 'furniture', 'sculptures')")
+    # The taggit link rows themselves, so queries can aggregate over them (see BlogTagListView)
+    tagged_items = GenericRelation(TaggedItem)
     
     # SEO fields
     meta_title = models.CharField(max_length=200, blank=True, help_text="SEO meta title")
@@ -47,7 +52,7 @@ class BlogPost(models.Model):
     def save(self, *args, **kwargs):
         """Auto-generate slug from title if not provided"""
         if not self.slug:
-            self.slug = slugify(self.title)
+            self.slug = allocate_slug(BlogPost, self.title, exclude_pk=self.pk)
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 import re
 from django.conf import settings
+from galleryItem.media_urls import get_media_url_builder
 from .models import BlogPost
 
 
@@ -50,8 +51,8 @@ class BlogPostSerializer(serializers.ModelSerializer):
         if not request:
             return content
         
-        # Get base URL (e.g., http://localhost:8000)
-        base_url = request.build_absolute_uri('/')[:-1]  # Remove trailing slash
+        # Get base URL (e.g., http://localhost:8000), resolved once per request
+        base_url = get_media_url_builder(request).host_prefix()
         
         # Function to fix image src URLs
         def fix_src(match):
@@ -90,7 +91,7 @@ class BlogPostSerializer(serializers.ModelSerializer):
         if obj.featured_image:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.featured_image.url)
+                return get_media_url_builder(request).file_url(obj.featured_image)
             return obj.featured_image.url
         return None
 
@@ -125,7 +126,7 @@ class BlogPostListSerializer(serializers.ModelSerializer):
         if obj.featured_image:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.featured_image.url)
+                return get_media_url_builder(request).file_url(obj.featured_image)
             return obj.featured_image.url
         return None
 
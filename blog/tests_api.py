@@ -277,6 +277,51 @@ class BlogAPITestCase(TestCase):
         self.assertIn('<p>', response.data['content'])
         self.assertIn('<strong>', response.data['content'])
 
+    def test_list_conditional_get(self):
+        """Test that a matching ETag gets 304 until a post changes"""
+        response = self.client.get('/api/blog/posts/')
+        etag = response['ETag']
+        # Max(updated_date) misses unpublished/deleted posts: ETag only
+        self.assertFalse(response.has_header('Last-Modified'))
+        
+        response = self.client.get('/api/blog/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.published_post2.title = 'Edited Title'
+        self.published_post2.save()
+        response = self.client.get('/api/blog/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_tags_etag_follows_tag_changes(self):
+        """Test that adding/removing tags changes the tag list ETag without a post save"""
+        self.published_post2.tags.add('walnut')
+        response = self.client.get('/api/blog/tags/')
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get('/api/blog/tags/', HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        
+        for change in (lambda: self.published_post2.tags.add('oak'), lambda: self.published_post2.tags.remove('walnut')):
+            change()
+            response = self.client.get('/api/blog/tags/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+        self.assertEqual([tag['name'] for tag in response.data], ['oak'])
+    
+    def test_detail_if_modified_since(self):
+        """Test that If-Modified-Since is answered from updated_date"""
+        response = self.client.get('/api/blog/posts/test-blog-post-1/')
+        response = self.client.get(
+            '/api/blog/posts/test-blog-post-1/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        response = self.client.get('/api/blog/posts/unpublished-post/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class BlogModelTestCase(TestCase):
     """Test cases for BlogPost model"""
@@ -403,3 +448,11 @@ class BlogModelTestCase(TestCase):
         
         self.assertIsNone(post.featured_image)
 
+    
+    def test_blog_post_slug_deduplicated(self):
+        """Test that posts with the same title get unique slugs"""
+        first = BlogPost.objects.create(title='Same Title', content='Content', author=self.author)
+        second = BlogPost.objects.create(title='Same Title', content='Content', author=self.author)
+        
+        self.assertEqual(first.slug, 'same-title')
+        self.assertEqual(second.slug, 'same-title-1')
@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.shortcuts import render, redirect
 from django.urls import path
 from django.contrib import messages
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 from mptt.admin import DraggableMPTTAdmin
 import json
 
@@ -21,26 +23,98 @@ class SpecialPriceInline(admin.TabularInline):
     extra = 1
 
 
+# Variants at or below this quantity are shown as low stock (see StockStatusAPIView)
+LOW_STOCK_THRESHOLD = 10
+
+
+def product_stock_annotations():
+    """Per-product stock aggregates over its variants, for GalleryItem querysets"""
+    return {
+        'stock_total_quantity': Coalesce(Sum('variant__quantity'), 0),
+        'stock_variant_count': Count('variant'),
+        'stock_in_count': Count('variant', filter=Q(variant__quantity__gt=0)),
+        'stock_out_count': Count('variant', filter=Q(variant__quantity__lte=0)),
+    }
+
+
+class ProductStockFilter(admin.SimpleListFilter):
+    """Filter products on the stock annotations of GalleryItemAdmin.get_queryset"""
+    title = 'stock'
+    parameter_name = 'stock'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('in_stock', 'All in stock'),
+            ('partial', 'Partially in stock'),
+            ('out_of_stock', 'All out of stock'),
+            ('no_variants', 'No variants'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'in_stock':
+            return queryset.filter(stock_variant_count__gt=0, stock_out_count=0)
+        if self.value() == 'partial':
+            return queryset.filter(stock_in_count__gt=0, stock_out_count__gt=0)
+        if self.value() == 'out_of_stock':
+            return queryset.filter(stock_variant_count__gt=0, stock_in_count=0)
+        if self.value() == 'no_variants':
+            return queryset.filter(stock_variant_count=0)
+        return queryset
+
+
+class VariantStockFilter(admin.SimpleListFilter):
+    """Filter variants on the stock_level annotation of VariantAdmin.get_queryset"""
+    title = 'stock'
+    parameter_name = 'stock'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('in_stock', 'In stock'),
+            ('low_stock', 'Low stock'),
+            ('out_of_stock', 'Out of stock'),
+        )
+
+    def queryset(self, request, queryset):
+        levels = {
+            'in_stock': VariantAdmin.IN_STOCK,
+            'low_stock': VariantAdmin.LOW_STOCK,
+            'out_of_stock': VariantAdmin.OUT_OF_STOCK,
+        }
+        if self.value() in levels:
+            return queryset.filter(stock_level=levels[self.value()])
+        return queryset
+
+
 class GalleryItemAdmin(admin.ModelAdmin):
     model = GalleryItem
     form = GalleryItemAdminModelForm
     list_display = ['title', 'category', 'stock_summary', 'active', 'updated']
-    list_filter = ['category', 'active']
+    list_filter = ['category', 'active', ProductStockFilter]
+    list_select_related = ['category']
     search_fields = ['title', 'description']
     inlines = [VariantInline, SpecialPriceInline]
     date_hierarchy = 'timeStamp'
     readonly_fields = ['updated', 'timeStamp', 'stock_summary_display']
-    
+
+    def get_queryset(self, request):
+        """Annotate the stock summary of every product with one grouped query"""
+        return super().get_queryset(request).annotate(**product_stock_annotations())
+
     def stock_summary(self, obj):
         """Show stock summary for all variants"""
-        variants = obj.variant_set.all()
-        if not variants.exists():
+        if not hasattr(obj, 'stock_variant_count'):
+            # Not loaded through get_queryset (e.g. the add form or a freshly saved object)
+            annotations = product_stock_annotations()
+            stock = GalleryItem.objects.filter(pk=obj.pk).annotate(**annotations).values(*annotations).first()
+            for name, value in (stock or {}).items():
+                setattr(obj, name, value)
+        if not getattr(obj, 'stock_variant_count', 0):
             return 'No variants'
-        
-        total_quantity = sum(v.quantity for v in variants)
-        in_stock_count = sum(1 for v in variants if v.in_stock)
-        out_of_stock_count = variants.count() - in_stock_count
-        
+
+        total_quantity = obj.stock_total_quantity
+        in_stock_count = obj.stock_in_count
+        out_of_stock_count = obj.stock_out_count
+
         if out_of_stock_count == 0:
             return f'✅ All in stock ({total_quantity} total)'
         elif in_stock_count == 0:
@@ -48,6 +122,7 @@ class GalleryItemAdmin(admin.ModelAdmin):
         else:
             return f'⚠️ {in_stock_count} in stock, {out_of_stock_count} out of stock'
     stock_summary.short_description = 'Stock Summary'
+    stock_summary.admin_order_field = 'stock_total_quantity'
     
     def stock_summary_display(self, obj):
         """Read-only field for stock summary"""
@@ -91,7 +166,8 @@ class GalleryItemAdmin(admin.ModelAdmin):
                     f'📦 Products Created: {result["created"]}\n'
                     f'⚠️  Products Skipped: {result["skipped"]}\n'
                     f'🖼️  Images Downloaded: {result["images"]}\n'
-                    f'⭐ Reviews Imported: {result["reviews"]}'
+                    f'⭐ Reviews Imported: {result["reviews"]}\n'
+                    f'♻️  Duplicate Reviews Skipped: {result["duplicate_reviews"]}'
                 )
                 
                 return redirect('..')
@@ -138,8 +214,11 @@ class VariantSupplyInline(admin.TabularInline):
 
 
 class VariantAdmin(admin.ModelAdmin):
+    IN_STOCK, LOW_STOCK, OUT_OF_STOCK = 2, 1, 0
+
     list_display = ['__str__', 'product', 'title', 'quantity', 'stock_status', 'price', 'active', 'updated']
-    list_filter = ['active', 'is_best_seller', 'product__category']
+    list_filter = ['active', 'is_best_seller', 'product__category', VariantStockFilter]
+    list_select_related = ['product']
     search_fields = ['title', 'product__title']
     readonly_fields = ['in_stock', 'stock_status_display']
     fieldsets = (
@@ -167,15 +246,35 @@ class VariantAdmin(admin.ModelAdmin):
         VariantSupplyInline,
     ]
     
+    def get_queryset(self, request):
+        """Annotate the stock level so the status column and filter are computed in SQL"""
+        return super().get_queryset(request).annotate(
+            stock_level=Case(
+                When(quantity__gt=LOW_STOCK_THRESHOLD, then=Value(self.IN_STOCK)),
+                When(quantity__gt=0, then=Value(self.LOW_STOCK)),
+                default=Value(self.OUT_OF_STOCK),
+                output_field=IntegerField(),
+            )
+        )
+
     def stock_status(self, obj):
         """Display stock status with color coding"""
-        if obj.quantity > 10:
+        level = getattr(obj, 'stock_level', None)
+        if level is None:
+            # Unsaved or not loaded through get_queryset
+            level = (
+                self.IN_STOCK if obj.quantity > LOW_STOCK_THRESHOLD
+                else self.LOW_STOCK if obj.quantity > 0
+                else self.OUT_OF_STOCK
+            )
+        if level == self.IN_STOCK:
             return f'✅ In Stock ({obj.quantity})'
-        elif obj.quantity > 0:
+        elif level == self.LOW_STOCK:
             return f'⚠️ Low Stock ({obj.quantity})'
         else:
             return f'❌ Out of Stock (0)'
     stock_status.short_description = 'Stock Status'
+    stock_status.admin_order_field = 'stock_level'
     
     def stock_status_display(self, obj):
         """Read-only field for stock status"""
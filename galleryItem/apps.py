@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class GalleryitemConfig(AppConfig):
     name = 'galleryItem'
+
+    def ready(self):
+        import galleryItem.signals
@@ -0,0 +1,27 @@
+"""
+Checks on the configured Django cache.
+
+View counters, response-cache tag versions and hit/miss stats and the cached
+category tree only work across processes (web workers, management commands,
+the importer) when the default cache is shared and has an atomic incr():
+Redis or Memcached. The local-memory and dummy backends are private to one
+process, and the database cache would turn every cached read into database
+writes, so those features are off for any other backend.
+
+settings.GALLERY_CACHE_SHARED = True/False overrides the detection (None:
+detect), e.g. for a single-process deployment or another shared backend.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.memcached import PyLibMCCache, PyMemcacheCache
+from django.core.cache.backends.redis import RedisCache
+
+SHARED_BACKENDS = (RedisCache, PyMemcacheCache, PyLibMCCache)
+
+
+def is_shared_cache(alias='default'):
+    """True when every process sees the same cache (Redis/Memcached, or GALLERY_CACHE_SHARED)"""
+    shared = getattr(settings, 'GALLERY_CACHE_SHARED', None)
+    if shared is not None:
+        return shared
+    return isinstance(caches[alias], SHARED_BACKENDS)
@@ -0,0 +1,226 @@
+"""
+Cached category closure (descendants/ancestors) built from one MPTT query.
+
+The index is stored in the Django cache under a version number that is
+bumped whenever a Category row changes (see galleryItem.signals). Each
+process also keeps the last index it loaded, so a request normally costs
+one small cache read and no category queries.
+
+Versions live in the shared default cache (see galleryItem.cache_backends),
+so every worker notices a change on its next request. Without a shared cache
+a bump would only reach the process that made it, so the index and the tree
+are rebuilt (one query each) on every call instead.
+
+The public category tree (CategoryListView) is cached the same way as
+ready-to-render nested dicts, versioned separately because product changes
+alter its product counts.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from .cache_backends import is_shared_cache
+from .models import Category, GalleryItem
+
+CATEGORY_INDEX_VERSION_KEY = 'gallery:category_index:version'
+CATEGORY_INDEX_KEY = 'gallery:category_index:{version}'
+CATEGORY_INDEX_TIMEOUT = 60 * 5
+
+CATEGORY_TREE_VERSION_KEY = 'gallery:category_tree:version'
+CATEGORY_TREE_KEY = 'gallery:category_tree:{version}:{base_url}'
+CATEGORY_TREE_TIMEOUT = 60 * 5
+
+
+class CategoryIndex:
+    """
+    In-memory closure of the category tree.
+
+    descendants[id] -> frozenset of ids in the subtree (including id)
+    ancestors[id]   -> frozenset of ids above the node (excluding id)
+    """
+
+    def __init__(self, rows):
+        """`rows` are (id, parent_id) tuples in MPTT (tree_id, lft) order"""
+        descendants = {}
+        ancestors = {}
+        path = []  # ids of open ancestors of the current node
+        for category_id, parent_id in rows:
+            # Pre-order traversal: close subtrees until we're back at the parent
+            while path and path[-1] != parent_id:
+                path.pop()
+            ancestors[category_id] = frozenset(path)
+            descendants[category_id] = {category_id}
+            for ancestor_id in path:
+                descendants[ancestor_id].add(category_id)
+            path.append(category_id)
+
+        self.descendants = {k: frozenset(v) for k, v in descendants.items()}
+        self.ancestors = ancestors
+
+    @classmethod
+    def build(cls):
+        rows = Category.objects.order_by('tree_id', 'lft').values_list('id', 'parent_id')
+        return cls(rows)
+
+    def __contains__(self, category_id):
+        return category_id in self.descendants
+
+    def resolve_filter(self, raw_ids):
+        """
+        Resolve `?category=` values to the set of category ids to filter on.
+
+        - unknown/invalid ids are ignored
+        - one category: its whole subtree
+        - several categories where one is an ancestor of another: AND logic
+          (only categories inside every selected subtree)
+        - several unrelated/sibling categories: OR logic (union of subtrees)
+        """
+        selected = []
+        for raw_id in raw_ids:
+            try:
+                category_id = int(raw_id)
+            except (TypeError, ValueError):
+                continue
+            if category_id in self and category_id not in selected:
+                selected.append(category_id)
+
+        if not selected:
+            return set()
+        if len(selected) == 1:
+            return set(self.descendants[selected[0]])
+
+        has_parent_child_relationship = any(
+            other in self.ancestors[category_id]
+            for category_id in selected
+            for other in selected
+            if other != category_id
+        )
+        subtrees = [self.descendants[category_id] for category_id in selected]
+        if has_parent_child_relationship:
+            return set.intersection(*map(set, subtrees))
+        return set().union(*subtrees)
+
+
+_local = threading.local()
+
+
+def _current_version(key=CATEGORY_INDEX_VERSION_KEY):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def get_category_index():
+    """Return the current CategoryIndex, rebuilding it only after a category change"""
+    if not is_shared_cache():
+        return CategoryIndex.build()
+    version = _current_version()
+    cached = getattr(_local, 'category_index', None)
+    if cached is not None and cached[0] == version and time.monotonic() < cached[2]:
+        return cached[1]
+
+    key = CATEGORY_INDEX_KEY.format(version=version)
+    index = cache.get(key)
+    if index is None:
+        index = CategoryIndex.build()
+        cache.set(key, index, CATEGORY_INDEX_TIMEOUT)
+    _local.category_index = (version, index, time.monotonic() + CATEGORY_INDEX_TIMEOUT)
+    return index
+
+
+def _bump_version(key=CATEGORY_INDEX_VERSION_KEY):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+    if key == CATEGORY_INDEX_VERSION_KEY:
+        _local.category_index = None
+
+
+def invalidate_category_index():
+    """
+    Drop the cached index. Bumped now and again on commit so a rebuild that
+    raced with the writing transaction can't keep serving old data.
+    """
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+def build_category_tree():
+    """
+    Build the nested category tree from a single ordered MPTT query, with
+    direct and cumulative (subtree) counts of active products per node.
+    Image URLs are left relative; see get_category_tree().
+    """
+    queryset = Category.objects.order_by('tree_id', 'lft')
+    queryset = Category.objects.add_related_count(
+        queryset, GalleryItem, 'category', 'products_cumulative_count',
+        cumulative=True, extra_filters={'active': True}
+    )
+    queryset = Category.objects.add_related_count(
+        queryset, GalleryItem, 'category', 'products_count',
+        cumulative=False, extra_filters={'active': True}
+    )
+
+    nodes = {}
+    roots = []
+    for category in queryset:
+        node = {
+            'id': category.id,
+            'title': category.title,
+            'description': category.description,
+            'image': category.image.url if category.image else None,
+            'parent': category.parent_id,
+            'products_count': category.products_count,
+            'products_cumulative_count': category.products_cumulative_count,
+            'children': [],
+        }
+        nodes[category.id] = node
+        if category.parent_id is None:
+            roots.append(node)
+        else:
+            nodes[category.parent_id]['children'].append(node)
+    return roots
+
+
+def _absolutize_images(nodes, base_url):
+    for node in nodes:
+        if node['image'] and node['image'].startswith('/'):
+            node['image'] = f"{base_url}{node['image']}"
+        _absolutize_images(node['children'], base_url)
+
+
+def get_category_tree(request=None):
+    """
+    Return the category tree (nested dicts), cached per tree version and per
+    site base URL (image URLs are absolute, like the DRF serializer's).
+    """
+    base_url = request.build_absolute_uri('/')[:-1] if request else ''
+    if not is_shared_cache():
+        tree = build_category_tree()
+        _absolutize_images(tree, base_url)
+        return tree
+    version = _current_version(CATEGORY_TREE_VERSION_KEY)
+    key = CATEGORY_TREE_KEY.format(version=version, base_url=base_url)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_category_tree()
+        _absolutize_images(tree, base_url)
+        cache.set(key, tree, CATEGORY_TREE_TIMEOUT)
+    return tree
+
+
+def get_category_tree_json(request=None):
+    """The category tree as the JSON bytes the API sends"""
+    return JSONRenderer().render(get_category_tree(request))
+
+
+def invalidate_category_tree():
+    """Drop the cached category tree (categories or product counts changed)"""
+    _bump_version(CATEGORY_TREE_VERSION_KEY)
+    transaction.on_commit(lambda: _bump_version(CATEGORY_TREE_VERSION_KEY))
@@ -0,0 +1,187 @@
+"""
+Catalog change feed for incremental frontend sync.
+
+    GET /api/gallery/changes/                 full sync, page by page
+    GET /api/gallery/changes/?since=<cursor>  only what changed after the cursor
+
+Each response carries the active products (list-serializer rows) and variants
+(price/stock) whose `updated` moved past the cursor, plus tombstones for
+deleted rows (CatalogTombstone, written by galleryItem.signals) and for
+deactivated ones. Clients apply the page and pass `cursor` back until
+`has_more` is false.
+
+Products, variants and tombstones are three keyset streams ordered by
+(timestamp, id); the cursor holds one position per stream, so the feed stays
+exact while rows keep changing. Only rows older than a settle window are
+served: a row saved by a transaction that commits later than its `updated`
+timestamp would otherwise be skipped for good.
+
+Changes that bypass `updated` (ratings, view counts) are not part of the feed;
+special price edits bump their product's `updated` (see galleryItem.signals).
+
+Settings:
+    GALLERY_CHANGE_FEED_SETTLE_SECONDS   settle window in seconds (default 30)
+    GALLERY_CHANGE_FEED_RETENTION_DAYS   tombstone retention; older cursors get
+                                         410 and must resync (default 90)
+
+Prune old tombstones with: python manage.py prune_catalog_tombstones
+"""
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .fast_serializers import GalleryItemListProjection
+from .models import CatalogTombstone, GalleryItem, Variant
+from .serializers import VariantChangeSerializer
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+STREAMS = ('products', 'variants', 'tombstones')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class ExpiredCursor(InvalidCursor):
+    pass
+
+
+def get_settle_window():
+    return datetime.timedelta(seconds=getattr(settings, 'GALLERY_CHANGE_FEED_SETTLE_SECONDS', 30))
+
+
+def get_retention():
+    return datetime.timedelta(days=getattr(settings, 'GALLERY_CHANGE_FEED_RETENTION_DAYS', 90))
+
+
+def encode_cursor(positions, issued):
+    payload = {'at': issued.isoformat()}
+    for stream in STREAMS:
+        if positions.get(stream):
+            timestamp, pk = positions[stream]
+            payload[stream] = [timestamp.isoformat(), pk]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def _parse_timestamp(value):
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        raise InvalidCursor(value)
+    if timezone.is_naive(timestamp) and settings.USE_TZ:
+        timestamp = timezone.make_aware(timestamp, datetime.timezone.utc)
+    return timestamp
+
+
+def decode_cursor(token):
+    """Return ({stream: (timestamp, pk)}, issued timestamp)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+        positions = {
+            stream: (_parse_timestamp(payload[stream][0]), int(payload[stream][1]))
+            for stream in STREAMS if stream in payload
+        }
+        return positions, _parse_timestamp(payload['at'])
+    except (TypeError, ValueError, KeyError, IndexError, AttributeError):
+        raise InvalidCursor(token)
+
+
+def after(position, field):
+    """Rows strictly after a (timestamp, id) keyset position"""
+    if not position:
+        return Q()
+    timestamp, pk = position
+    return Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk})
+
+
+def tombstone(kind, object_id, reason, at, product_id=None):
+    return {'type': kind, 'id': object_id, 'product': product_id, 'reason': reason, 'at': at}
+
+
+class ChangeFeed:
+    """One page of catalog changes after a cursor"""
+
+    def __init__(self, request=None, limit=DEFAULT_LIMIT):
+        self.request = request
+        self.limit = max(1, min(limit, MAX_LIMIT))
+
+    def read(self, token=None):
+        now = timezone.now()
+        positions = {}
+        if token:
+            positions, issued = decode_cursor(token)
+            if issued < now - get_retention():
+                raise ExpiredCursor(token)
+        until = now - get_settle_window()
+
+        products, tombstones = [], []
+        has_more = False
+
+        projection = GalleryItemListProjection(self.request)
+        rows, more = self.page(
+            projection.values_queryset(GalleryItem.objects.all()), 'updated', positions.get('products'), until
+        )
+        for row in rows:
+            if row['active']:
+                products.append(projection.to_representation(row))
+            else:
+                tombstones.append(tombstone(
+                    CatalogTombstone.PRODUCT, row['id'], 'deactivated', row['updated'], row['id']
+                ))
+            positions['products'] = (row['updated'], row['id'])
+        has_more |= more
+
+        rows, more = self.page(Variant.objects.all(), 'updated', positions.get('variants'), until)
+        variants = []
+        for variant in rows:
+            if variant.active:
+                variants.append(variant)
+            else:
+                tombstones.append(tombstone(
+                    CatalogTombstone.VARIANT, variant.id, 'deactivated', variant.updated, variant.product_id
+                ))
+            positions['variants'] = (variant.updated, variant.id)
+        has_more |= more
+
+        rows, more = self.page(CatalogTombstone.objects.all(), 'deleted', positions.get('tombstones'), until)
+        for deletion in rows:
+            tombstones.append(tombstone(
+                deletion.kind, deletion.object_id, 'deleted', deletion.deleted, deletion.product_id
+            ))
+            positions['tombstones'] = (deletion.deleted, deletion.id)
+        has_more |= more
+
+        return {
+            'products': products,
+            'variants': VariantChangeSerializer(variants, many=True, context={'request': self.request}).data,
+            'tombstones': tombstones,
+            'cursor': encode_cursor(positions, now),
+            'has_more': has_more,
+        }
+
+    def page(self, queryset, field, position, until):
+        """Up to `limit` rows after `position` (and settled before `until`), plus whether more are waiting"""
+        queryset = queryset.filter(after(position, field), **{f'{field}__lte': until}).order_by(field, 'id')
+        rows = list(queryset[:self.limit + 1])
+        return rows[:self.limit], len(rows) > self.limit
+
+
+def record_deletion(kind, object_id, product_id):
+    CatalogTombstone.objects.create(kind=kind, object_id=object_id, product_id=product_id)
+
+
+def touch_product(product_id):
+    """Move a product forward in the feed after a change that doesn't save it (e.g. special prices)"""
+    GalleryItem.objects.filter(pk=product_id).update(updated=timezone.now())
+
+
+def prune_tombstones(now=None):
+    """Delete tombstones older than the retention period; returns the number deleted"""
+    horizon = (now or timezone.now()) - get_retention()
+    deleted, _ = CatalogTombstone.objects.filter(deleted__lt=horizon).delete()
+    return deleted
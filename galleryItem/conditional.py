@@ -0,0 +1,125 @@
+"""
+Conditional GET (ETag / Last-Modified) for catalog and blog API views.
+
+Validators come from one aggregate query over the rows a response is built
+from - max of the change timestamps plus the row count - and, for views with
+`validator_tags`, one read of the database-backed content versions
+(galleryItem.content_versions), so a revalidation answers 304 before any
+serializer runs. Only database state goes into a validator, so every worker
+computes the same ETag for the same rows.
+
+Data that has no timestamp (deletions, category edits, review text, rating
+aggregates written with queryset updates, ...) is folded in through
+aggregates and content versions. View counts are left out: they change on
+every flush and would defeat revalidation.
+
+Last-Modified is only sent by views that opt in with
+`validator_last_modified`: a Max() over timestamps misses deletions,
+deactivations and queryset updates, so it is only complete when the response
+is a single row whose every change moves its timestamp.
+
+Views that have side effects on GET (view counting) run them for 304s in
+`not_modified()`.
+
+Usage:
+
+    class MyView(ConditionalGetMixin, generics.ListAPIView):
+        validator_timestamp_fields = ('updated',)
+
+        @conditional_get
+        def get(self, request, *args, **kwargs):
+            ...
+"""
+import functools
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .content_versions import get_content_versions
+
+
+def conditional_get(method):
+    """Answer If-None-Match / If-Modified-Since with 304 before running the view method"""
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        if etag is None and last_modified is None:
+            return method(self, request, *args, **kwargs)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            self.not_modified(request)
+            return not_modified
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            if etag and not response.has_header('ETag'):
+                response['ETag'] = etag
+            if last_modified and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """
+    Compute ETag/Last-Modified for a generic view without serializing.
+
+    validator_timestamp_fields  fields whose Max() changes the ETag
+    validator_aggregates        extra {name: aggregate} that change the ETag
+    validator_tags              content-version tags that change the ETag
+    validator_last_modified     send Max(validator_timestamp_fields) as Last-Modified
+    """
+    validator_timestamp_fields = ()
+    validator_aggregates = None
+    validator_tags = ()
+    validator_last_modified = False
+    validator_row = None
+
+    def not_modified(self, request):
+        """Called when a 304 is returned instead of running the view method"""
+
+    def is_detail_request(self):
+        lookup_url_kwarg = getattr(self, 'lookup_url_kwarg', None) or getattr(self, 'lookup_field', None)
+        return lookup_url_kwarg in getattr(self, 'kwargs', {})
+
+    def get_validator_queryset(self):
+        """Rows the response is built from: the filtered list, or the looked-up object"""
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.is_detail_request():
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_validators(self, request):
+        """Return (etag, last_modified timestamp); (None, None) to skip conditional handling"""
+        aggregates = {'validator_count': Count('pk', distinct=True)}
+        for i, field in enumerate(self.validator_timestamp_fields):
+            aggregates[f'validator_ts_{i}'] = Max(field)
+        if self.is_detail_request():
+            aggregates['validator_pk'] = Max('pk')  # for not_modified() hooks
+        aggregates.update(self.validator_aggregates or {})
+
+        row = self.validator_row = self.get_validator_queryset().order_by().aggregate(**aggregates)
+        if self.is_detail_request() and not row['validator_count']:
+            return None, None  # let the view answer 404
+
+        last_modified = None
+        if self.validator_last_modified:
+            timestamps = [
+                row[f'validator_ts_{i}'] for i in range(len(self.validator_timestamp_fields))
+                if row[f'validator_ts_{i}'] is not None
+            ]
+            last_modified = int(max(timestamps).timestamp()) if timestamps else None
+
+        parts = [request.get_full_path(), sorted(row.items(), key=lambda item: item[0])]
+        if self.validator_tags:
+            parts.append(sorted(get_content_versions(self.validator_tags).items()))
+        # Representation-dependent bits: renderer and staff-only fields
+        parts.append(getattr(getattr(request, 'accepted_renderer', None), 'format', ''))
+        parts.append(bool(getattr(request.user, 'is_superuser', False)))
+        digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+        return quote_etag(digest), last_modified
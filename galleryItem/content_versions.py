@@ -0,0 +1,36 @@
+"""
+Database-backed change counters for conditional GET validators.
+
+Response-cache tag versions (galleryItem.response_cache) live in the cache
+and may be evicted or, on a process-local backend, differ between workers,
+so they can't be part of an ETag. The same purges also bump a ContentVersion
+row for the coarse tags below, inside the transaction that wrote the rows:
+a validator read sees either the old rows and the old version or the new
+rows and the new one, in every process.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import ContentVersion
+
+# Coarse tags that validators depend on; per-object tags stay cache-only
+VERSIONED_TAGS = frozenset({'products', 'variants', 'reviews', 'categories'})
+
+
+def bump_content_versions(tags):
+    """Increment the version of every versioned tag in `tags`"""
+    for name in sorted(VERSIONED_TAGS.intersection(tags)):  # fixed order, no lock cycles
+        if ContentVersion.objects.filter(name=name).update(version=F('version') + 1):
+            continue
+        try:
+            with transaction.atomic():
+                ContentVersion.objects.create(name=name, version=1)
+        except IntegrityError:
+            # Created by a concurrent writer
+            ContentVersion.objects.filter(name=name).update(version=F('version') + 1)
+
+
+def get_content_versions(tags):
+    """{tag: version} in one query (tags never bumped are 0)"""
+    stored = dict(ContentVersion.objects.filter(name__in=list(tags)).values_list('name', 'version'))
+    return {tag: stored.get(tag, 0) for tag in tags}
@@ -0,0 +1,123 @@
+"""
+Projection-based, read-only fast path for the public catalog list.
+
+GalleryItemListProjection produces the same rows as GalleryItemListSerializer
+(same keys, order and values, so the rendered JSON is byte-identical) from a
+single .values() projection: no model instances, no per-row field machinery
+and no build_absolute_uri() per image (see galleryItem.media_urls). Ratings
+come from the denormalized aggregates on GalleryItem (galleryItem.ratings).
+
+Used by GalleryItemListView for anonymous, unpaginated GETs.
+Benchmark: python manage.py benchmark_list_serializers
+
+Settings:
+    GALLERY_FAST_LIST_SERIALIZER   use the projection for anonymous lists (default True)
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+from .image_derivatives import FORMATS, derivative_name
+from .media_urls import get_media_url_builder
+from .models import Variant
+
+COLUMNS = (
+    'id', 'title', 'slug', 'description', 'category_id', 'category__title',
+    'default_variant_id', 'default_variant__price', 'default_variant__image',
+    'default_variant__quantity', 'default_variant__image_derivatives',
+    'active', 'total_views', 'rating_sum', 'rating_count', 'timeStamp', 'updated',
+)
+# Columns only needed by one (optional) output field
+FIELD_COLUMNS = {
+    'description': ('description',),
+    'default_variant_image_srcset': ('default_variant__image_derivatives',),
+}
+
+
+def is_enabled(request):
+    if not getattr(settings, 'GALLERY_FAST_LIST_SERIALIZER', True):
+        return False
+    user = getattr(request, 'user', None)
+    return request.method == 'GET' and not (user is not None and user.is_authenticated)
+
+
+class GalleryItemListProjection:
+    """GalleryItemListSerializer output for a GalleryItem queryset, built from .values() rows"""
+
+    # The serializer's own field classes format values, so output matches exactly
+    price_field = serializers.DecimalField(max_digits=30, decimal_places=2)
+    datetime_field = serializers.DateTimeField()
+
+    def __init__(self, request=None, fieldset=None):
+        self.urls = get_media_url_builder(request)
+        self.fieldset = fieldset or None
+        self.image_storage = Variant._meta.get_field('image').storage
+
+    def get_columns(self):
+        if not self.fieldset:
+            return COLUMNS
+        skipped = {
+            column for name, columns in FIELD_COLUMNS.items()
+            if not self.fieldset.includes(name) for column in columns
+        }
+        return tuple(column for column in COLUMNS if column not in skipped)
+
+    def image_url(self, name):
+        return self.urls.storage_url(self.image_storage, name)
+
+    def image_srcset(self, name, derivatives):
+        """Same result as image_derivatives.get_srcset() for Variant.image"""
+        record = (derivatives or {}).get('image')
+        if not name or not record or record.get('source') != name or not record.get('widths'):
+            return None
+        return {
+            fmt: {str(width): self.image_url(derivative_name(name, width, fmt)) for width in record['widths']}
+            for fmt in FORMATS
+        }
+
+    def to_representation(self, row):
+        has_variant = row['default_variant_id'] is not None
+        image = row['default_variant__image'] if has_variant else None
+        timestamp, updated = row['timeStamp'], row['updated']
+
+        data = {
+            'id': row['id'],
+            'title': row['title'],
+            'slug': row['slug'],
+            'description': row.get('description'),
+            'category': row['category_id'],
+            'category_title': row['category__title'],
+        }
+        # Dotted-source fields are skipped (not null) when there is no default variant
+        if has_variant:
+            data['default_variant_price'] = self.price_field.to_representation(row['default_variant__price'])
+        data['default_variant_image'] = self.image_url(image) if image else None
+        data['default_variant_image_srcset'] = (
+            self.image_srcset(image, row.get('default_variant__image_derivatives')) if has_variant else None
+        )
+        if has_variant:
+            quantity = row['default_variant__quantity']
+            data['default_variant_quantity'] = quantity
+            data['default_variant_in_stock'] = quantity > 0
+        data['active'] = bool(row['active'])
+        data['total_views'] = row['total_views']
+        data['average_rating'] = (
+            round(row['rating_sum'] / row['rating_count'], 2) if row['rating_count'] else 0
+        )
+        data['review_count'] = row['rating_count']
+        data['timeStamp'] = self.datetime_field.to_representation(timestamp) if timestamp else None
+        data['updated'] = self.datetime_field.to_representation(updated) if updated else None
+
+        if self.fieldset:
+            data = {name: value for name, value in data.items() if self.fieldset.includes(name)}
+        return data
+
+    def values_queryset(self, queryset):
+        """The projection rows to_representation() expects"""
+        return queryset.values(*self.get_columns())
+
+    def iter_rows(self, queryset, chunk_size=2000):
+        rows = self.values_queryset(queryset).iterator(chunk_size=chunk_size)
+        return (self.to_representation(row) for row in rows)
+
+    def data(self, queryset):
+        return list(self.iter_rows(queryset))
@@ -0,0 +1,108 @@
+"""
+Sparse fieldsets (`?fields=` / `?omit=`) for the catalog read endpoints.
+
+    GET /api/gallery/items/?fields=id,title,slug,default_variant_price,default_variant_image
+    GET /api/gallery/items/slug/<slug>/?omit=reviews,related_products,schema_markup
+
+Both parameters take comma-separated top-level field names and may be
+repeated; unknown names are ignored. Dropped fields are removed from the
+serializer before it runs, so their SerializerMethodFields (and the queries
+behind them) never execute. Views can also skip the prefetches and columns
+that only unrequested fields need (see SparseFieldsetViewMixin).
+"""
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+
+
+def parse_field_list(values):
+    """['a,b', 'c'] -> {'a', 'b', 'c'}; None when nothing was given"""
+    names = {name.strip() for value in values for name in value.split(',')}
+    names.discard('')
+    return names or None
+
+
+class SparseFieldset:
+    """The requested field selection: `only` (None = all fields) minus `omit`"""
+
+    def __init__(self, only=None, omit=None):
+        self.only = set(only) if only else None
+        self.omit = set(omit) if omit else set()
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        return cls(
+            parse_field_list(params.getlist(FIELDS_QUERY_PARAM)),
+            parse_field_list(params.getlist(OMIT_QUERY_PARAM)),
+        )
+
+    def __bool__(self):
+        return self.only is not None or bool(self.omit)
+
+    def includes(self, name):
+        return (self.only is None or name in self.only) and name not in self.omit
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer mixin taking a `fieldset` keyword (a SparseFieldset).
+
+    Only the serializer it is passed to is trimmed; nested serializers and
+    serializers built inside method fields (e.g. related products) keep all
+    of their fields.
+    """
+
+    def __init__(self, *args, fieldset=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fieldset:
+            for name in list(self.fields):
+                if not fieldset.includes(name):
+                    self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """
+    Pass the request's sparse fieldset to GET serializers of a generic view.
+
+    sparse_prefetches  {field name: prefetch lookups only that field needs}
+    sparse_deferred    {field name: model fields only that field reads}
+    """
+    sparse_prefetches = None
+    sparse_deferred = None
+
+    def get_fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            request = getattr(self, 'request', None)
+            if request is None or request.method != 'GET':
+                self._fieldset = SparseFieldset()
+            else:
+                self._fieldset = SparseFieldset.from_request(request)
+        return self._fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        fieldset = self.get_fieldset()
+        if fieldset and issubclass(serializer_class, SparseFieldsetSerializerMixin):
+            kwargs.setdefault('fieldset', fieldset)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fieldset = self.get_fieldset()
+        lookups = [
+            lookup
+            for name, field_lookups in (self.sparse_prefetches or {}).items()
+            if fieldset.includes(name)
+            for lookup in field_lookups
+        ]
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+        deferred = [
+            model_field
+            for name, model_fields in (self.sparse_deferred or {}).items()
+            if not fieldset.includes(name)
+            for model_field in model_fields
+        ]
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        return queryset
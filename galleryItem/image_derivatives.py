@@ -0,0 +1,234 @@
+"""
+Responsive image derivatives for Variant.image, Variant.largeImage and
+VariantImage.image.
+
+Every uploaded original gets WebP and JPEG copies at fixed widths
+(GALLERY_IMAGE_DERIVATIVE_WIDTHS; originals are never upscaled), stored next
+to it as `<name>_<width>w.webp` / `<name>_<width>w.jpg`. The generated widths
+are recorded on the row's image_derivatives field
+
+    {'image': {'source': 'products/images/small/a.jpg', 'widths': [200, 400]}}
+
+so serializers can emit srcset maps without touching storage. A record whose
+source no longer matches the field (the image was replaced) is ignored until
+the derivatives are regenerated.
+
+Generation is queued when the saving transaction commits and runs on one
+background worker thread (see galleryItem.signals), so admin saves and the
+JSON product import never wait for Pillow. The record is only written with
+a queryset update, and Variant/VariantImage.save() leave image_derivatives
+out of their UPDATE, so a copy loaded before the worker finished can't put
+a stale record back.
+
+Deployment: the worker thread needs a server that runs application threads
+- uWSGI only does with `enable-threads = true`; gunicorn sync/gthread
+workers do. Where threads can't run (or a worker is recycled before the
+queue drains), set GALLERY_IMAGE_DERIVATIVES_ASYNC=False to generate on
+commit in the request, or schedule the command below, which picks up
+every image whose record is missing or out of date:
+
+    python manage.py generate_image_derivatives
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .media_urls import get_media_url_builder
+from .models import Variant, VariantImage
+from .response_cache import purge_tags
+from .storage import ContentAddressedStorage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (200, 400, 800, 1600)
+# format key: (Pillow format, file extension, quality)
+FORMATS = {
+    'webp': ('WEBP', 'webp', 80),
+    'jpeg': ('JPEG', 'jpg', 82),
+}
+IMAGE_FIELDS = {
+    Variant: ('image', 'largeImage'),
+    VariantImage: ('image',),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_widths():
+    return tuple(sorted(getattr(settings, 'GALLERY_IMAGE_DERIVATIVE_WIDTHS', DEFAULT_WIDTHS)))
+
+
+def derivative_name(name, width, fmt):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{width}w.{FORMATS[fmt][1]}'
+
+
+def render_derivatives(image, widths):
+    """Yield (width, format, bytes) for every width narrower than the image"""
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    for width in widths:
+        if width >= image.width:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for fmt, (pil_format, _, quality) in FORMATS.items():
+            output = resized
+            if pil_format == 'JPEG' and has_alpha:
+                # JPEG has no alpha channel; flatten onto white like the storefront background
+                output = Image.new('RGB', resized.size, 'white')
+                output.paste(resized, mask=resized.getchannel('A'))
+            buffer = BytesIO()
+            output.save(buffer, format=pil_format, quality=quality)
+            yield width, fmt, buffer.getvalue()
+
+
+def generate_field_derivatives(field_file, widths=None):
+    """Write the derivatives of one image file next to it; returns the generated widths"""
+    storage = field_file.storage
+    with field_file.open('rb'):
+        image = Image.open(field_file)
+        image.load()
+    generated = set()
+    for width, fmt, data in render_derivatives(image, widths or get_widths()):
+        name = derivative_name(field_file.name, width, fmt)
+        if isinstance(storage, ContentAddressedStorage):
+            # Overwritten in place; its delete() is reference-counted and skips legacy names
+            storage.save_derived(name, ContentFile(data))
+        else:
+            if storage.exists(name):
+                # Plain storages would suffix the name
+                storage.delete(name)
+            saved = storage.save(name, ContentFile(data))
+            if saved != name:
+                raise RuntimeError(f'Derivative {name} was stored as {saved}')
+        generated.add(width)
+    return sorted(generated)
+
+
+def delete_field_derivatives(storage, record):
+    for width in record.get('widths', ()):
+        for fmt in FORMATS:
+            name = derivative_name(record['source'], width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def needs_derivatives(instance):
+    """True when an image field changed since its derivatives were generated"""
+    derivatives = instance.image_derivatives or {}
+    for field_name in IMAGE_FIELDS[type(instance)]:
+        field_file = getattr(instance, field_name)
+        record = derivatives.get(field_name)
+        if (field_file.name or None) != (record or {}).get('source'):
+            return True
+    return False
+
+
+def _purge_responses(instance):
+    if isinstance(instance, VariantImage):
+        variant_id = instance.variant_id
+        product_id = Variant.objects.filter(pk=variant_id).values_list('product_id', flat=True).first()
+    else:
+        variant_id, product_id = instance.pk, instance.product_id
+    purge_tags(f'variant:{variant_id}', 'variants', f'product:{product_id}', 'products')
+
+
+def generate_derivatives(instance, force=False, generated=None):
+    """
+    Bring the derivatives of every image field of a Variant/VariantImage up
+    to date and record them; returns True if anything was (re)generated.
+
+    Fields sharing a source file (e.g. content-addressed image/largeImage)
+    are only rendered once; pass the same `generated` dict ({source name:
+    widths}) to share that across rows.
+    """
+    generated = {} if generated is None else generated
+    derivatives = dict(instance.image_derivatives or {})
+    changed = False
+    for field_name in IMAGE_FIELDS[type(instance)]:
+        field_file = getattr(instance, field_name)
+        record = derivatives.get(field_name)
+        if not field_file and not record:
+            continue
+        if record and field_file.name == record.get('source') and not force:
+            continue
+        if record and record.get('source') != field_file.name:
+            delete_field_derivatives(field_file.storage, record)
+        if field_file:
+            if field_file.name not in generated:
+                generated[field_file.name] = generate_field_derivatives(field_file)
+            derivatives[field_name] = {'source': field_file.name, 'widths': generated[field_file.name]}
+        else:
+            derivatives.pop(field_name, None)
+        changed = True
+
+    if changed:
+        # update() sends no post_save, so this can't re-queue itself
+        type(instance).objects.filter(pk=instance.pk).update(image_derivatives=derivatives)
+        instance.image_derivatives = derivatives
+        _purge_responses(instance)
+    return changed
+
+
+def generate_derivatives_safely(model, pk):
+    """Worker-side generation: a bad upload must only be logged"""
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is not None:
+            generate_derivatives(instance)
+    except Exception:
+        logger.exception('Could not generate image derivatives for %s %s', model.__name__, pk)
+
+
+def _run_in_worker(model, pk):
+    try:
+        generate_derivatives_safely(model, pk)
+    finally:
+        # The worker thread has its own connection; don't leave it open
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-derivatives')
+        return _executor
+
+
+def schedule_derivatives(instance):
+    """Queue derivative generation for after the current transaction commits"""
+    model, pk = type(instance), instance.pk
+    if getattr(settings, 'GALLERY_IMAGE_DERIVATIVES_ASYNC', True):
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, model, pk))
+    else:
+        transaction.on_commit(lambda: generate_derivatives_safely(model, pk))
+
+
+def get_srcset(instance, field_name, request=None):
+    """
+    {'webp': {'200': url, ...}, 'jpeg': {...}} for one image field, or None
+    while no derivatives are recorded for the current file.
+    """
+    field_file = getattr(instance, field_name)
+    record = (instance.image_derivatives or {}).get(field_name)
+    if not field_file or not record or record.get('source') != field_file.name or not record.get('widths'):
+        return None
+    storage, urls = field_file.storage, get_media_url_builder(request)
+    return {
+        fmt: {
+            str(width): urls.storage_url(storage, derivative_name(field_file.name, width, fmt))
+            for width in record['widths']
+        }
+        for fmt in FORMATS
+    }
@@ -0,0 +1,106 @@
+"""
+Compare GalleryItemListSerializer with the projection fast path
+Usage: python manage.py benchmark_list_serializers [--sizes 1000 10000 50000] [--repeat 3]
+
+Synthetic products (with default variants, images and ratings) are created in a
+transaction that is rolled back afterwards, so the command is safe to run against
+a real database. Both paths are timed end to end (query, serialize, render JSON)
+and their output is checked to be byte-identical.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from galleryItem.fast_serializers import GalleryItemListProjection
+from galleryItem.models import Category, GalleryItem, Variant
+from galleryItem.serializers import GalleryItemListSerializer
+from galleryItem.views import GalleryItemListView
+
+BENCHMARK_CATEGORY = '__benchmark_list_serializers__'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the projection-based catalog list against GalleryItemListSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='Product counts')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per path (best time is reported)')
+
+    def create_products(self, category, count):
+        GalleryItem.objects.bulk_create([
+            GalleryItem(
+                category=category, title=f'Benchmark product {i}', slug=f'benchmark-product-{category.pk}-{i}',
+                description='Benchmark description. ' * 40, metaKeyWords='benchmark', metaKeyDescription='benchmark',
+                rating_sum=(i % 5 + 1) * 3, rating_count=3,
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        # Not every backend returns primary keys from bulk_create
+        items = GalleryItem.objects.filter(category=category).only('pk').order_by('pk')
+        Variant.objects.bulk_create([
+            Variant(
+                product=item, title='Default', price=f'{10 + i % 90}.50', quantity=i % 7, volume=1, weight=1,
+                image=f'products/images/small/benchmark-{i}.jpg',
+                largeImage=f'products/images/large/benchmark-{i}.jpg',
+                image_derivatives={'image': {'source': f'products/images/small/benchmark-{i}.jpg', 'widths': [200, 400]}},
+            )
+            for i, item in enumerate(items)
+        ], batch_size=1000)
+        GalleryItem.objects.filter(category=category).update(default_variant=Subquery(
+            Variant.objects.filter(product=OuterRef('pk')).values('pk')[:1]
+        ))
+
+    def best_of(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def run_size(self, size, repeat):
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ('*', '') and not h.startswith('.')), 'localhost')
+        request = APIRequestFactory().get('/api/gallery/items/', HTTP_HOST=host)
+        renderer = JSONRenderer()
+        category = Category.objects.create(title=f'{BENCHMARK_CATEGORY}{size}')
+        self.create_products(category, size)
+        queryset = GalleryItemListView.queryset.filter(category=category)
+
+        serializer_time, expected = self.best_of(
+            lambda: renderer.render(
+                GalleryItemListSerializer(queryset.all(), many=True, context={'request': request}).data
+            ),
+            repeat,
+        )
+        projection_time, actual = self.best_of(
+            lambda: renderer.render(GalleryItemListProjection(request).data(queryset.all())),
+            repeat,
+        )
+        if actual != expected:
+            raise CommandError(f'Projection output differs from the serializer at {size} products')
+        return serializer_time, projection_time, len(expected)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'products':>10} {'serializer':>12} {'projection':>12} {'speedup':>8} {'bytes':>12}")
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    serializer_time, projection_time, size_bytes = self.run_size(size, options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(
+                f'{size:>10} {serializer_time:>11.3f}s {projection_time:>11.3f}s '
+                f'{serializer_time / projection_time:>7.1f}x {size_bytes:>12}'
+            )
+        self.stdout.write(self.style.SUCCESS('Output identical for every size'))
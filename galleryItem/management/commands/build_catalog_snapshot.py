@@ -0,0 +1,32 @@
+"""
+Write static, precompressed JSON snapshots of the catalog and the blog index
+Usage: python manage.py build_catalog_snapshot [--root DIR] [--base-url https://api.example.com] [--force]
+
+Run before each frontend build and on a schedule (e.g. PythonAnywhere scheduled task);
+only documents whose source rows changed since the last run are rendered again.
+Serve GALLERY_SNAPSHOT_ROOT with the web server (see galleryItem.snapshots).
+"""
+from django.core.exceptions import DisallowedHost
+from django.core.management.base import BaseCommand, CommandError
+
+from galleryItem.snapshots import CatalogSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Write incremental JSON snapshots (with .gz/.br copies) of the catalog and blog index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help='Output directory (default: GALLERY_SNAPSHOT_ROOT)')
+        parser.add_argument('--base-url', help='scheme://host for absolute URLs (default: GALLERY_SNAPSHOT_BASE_URL)')
+        parser.add_argument('--force', action='store_true', help='Render every document again')
+
+    def handle(self, *args, **options):
+        try:
+            snapshot = CatalogSnapshot(options['root'], options['base_url'], force=options['force'])
+        except DisallowedHost as exc:
+            raise CommandError(f'{exc} (the snapshot base URL host must be in ALLOWED_HOSTS)')
+        stats = snapshot.build()
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot in {snapshot.directory}: {stats['written']} written, {stats['unchanged']} unchanged, "
+            f"{stats['skipped']} skipped, {stats['removed']} removed"
+        ))
@@ -0,0 +1,24 @@
+"""
+Materialize today's product rankings (most favorited / viewed / sold)
+Usage: python manage.py compute_rankings [--limit 100] [--sold-days 30]
+
+Run once a day (e.g. PythonAnywhere scheduled task); re-running the same day replaces today's rows.
+"""
+from django.core.management.base import BaseCommand
+
+from galleryItem.models import Ranking
+from galleryItem.rankings import DEFAULT_LIMIT, DEFAULT_SOLD_DAYS, materialize_rankings
+
+
+class Command(BaseCommand):
+    help = 'Compute daily Ranking rows from wishlists, view deltas and finalized orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='Products kept per criteria')
+        parser.add_argument('--sold-days', type=int, default=DEFAULT_SOLD_DAYS, help='Sales window in days')
+
+    def handle(self, *args, **options):
+        counts = materialize_rankings(limit=options['limit'], sold_days=options['sold_days'])
+        labels = dict(Ranking.CRITERIA_CHOICES)
+        summary = ', '.join(f'{labels[criteria]}: {rows}' for criteria, rows in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Rankings computed ({summary})'))
@@ -0,0 +1,25 @@
+"""
+Recompute the related-products neighbour table
+Usage: python manage.py compute_related_products [--top-k 8]
+
+Run nightly (e.g. PythonAnywhere scheduled task) or after large imports.
+"""
+from django.core.management.base import BaseCommand
+
+from galleryItem.models import GalleryItem
+from galleryItem.related_products import TOP_K, compute_related_products, store_related_products
+from galleryItem.response_cache import purge_tags
+
+
+class Command(BaseCommand):
+    help = 'Compute top-K related products from category distance, keywords and co-purchases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K, help=f'Neighbours stored per product (default {TOP_K})')
+
+    def handle(self, *args, **options):
+        neighbours = compute_related_products(top_k=options['top_k'])
+        rows = store_related_products(neighbours)
+        # Product pages embed their related products
+        purge_tags('products', *(f'product:{pk}' for pk in GalleryItem.objects.values_list('id', flat=True)))
+        self.stdout.write(self.style.SUCCESS(f'Stored {rows} related products for {len(neighbours)} products'))
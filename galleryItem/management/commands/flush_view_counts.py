@@ -0,0 +1,24 @@
+"""
+Flush buffered product view counts to the database
+Usage: python manage.py flush_view_counts
+
+Run this periodically when GALLERY_VIEW_COUNTER_BACKEND = 'cache'
+(e.g. PythonAnywhere scheduled task every 5 minutes). With the 'local'
+backend hits are buffered inside each web process, which flushes them itself.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from galleryItem.view_counter import flush_view_counts, uses_shared_counter
+
+
+class Command(BaseCommand):
+    help = 'Write buffered product view counts to GalleryItem.total_views'
+
+    def handle(self, *args, **options):
+        if not uses_shared_counter():
+            raise CommandError(
+                "GALLERY_VIEW_COUNTER_BACKEND is 'local': hits are buffered in the web processes "
+                "and flushed by them, not by this command. Use the 'cache' backend to flush from here."
+            )
+        written = flush_view_counts()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {written} product views'))
@@ -0,0 +1,45 @@
+"""
+Generate the responsive WebP/JPEG derivatives of variant and gallery images
+Usage: python manage.py generate_image_derivatives [--product ID ...] [--force]
+"""
+from django.core.management.base import BaseCommand
+
+from galleryItem.image_derivatives import generate_derivatives
+from galleryItem.models import Variant, VariantImage
+
+
+class Command(BaseCommand):
+    help = 'Generate missing (or, with --force, all) responsive image derivatives'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            type=int,
+            action='append',
+            dest='product_ids',
+            help='Only process this product ID (can be repeated)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate derivatives that are already up to date'
+        )
+
+    def handle(self, *args, **options):
+        variants = Variant.objects.order_by('id')
+        images = VariantImage.objects.order_by('id')
+        if options.get('product_ids'):
+            variants = variants.filter(product_id__in=options['product_ids'])
+            images = images.filter(variant__product_id__in=options['product_ids'])
+
+        generated = failed = 0
+        # Rows sharing a (content-addressed) source file render it once
+        sources = {}
+        for queryset in (variants, images):
+            for instance in queryset.iterator():
+                try:
+                    generated += generate_derivatives(instance, force=options['force'], generated=sources)
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{instance._meta.model_name} {instance.pk}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Generated derivatives for {generated} images ({failed} failed)'))
@@ -1,11 +1,22 @@
 """
 Django management command to import products from JSON file
-Usage: python manage.py import_products simple_matched_data.json
+Usage: python manage.py import_products simple_matched_data.json [--resume]
+
+The file (a JSON array or NDJSON) is streamed, not loaded. Every batch is
+committed on its own and recorded in a checkpoint file (<file>.checkpoint by
+default); after a crash, --resume skips the products that were committed.
+The checkpoint is removed once the import finishes. Products whose title
+already exists are always skipped (only their missing reviews are imported).
 """
 import json
 import os
+import time
+from itertools import islice
 from django.core.management.base import BaseCommand, CommandError
-from galleryItem.utils import import_products_from_json_data
+from galleryItem.utils import (
+    IMAGE_FETCH_PER_HOST, IMAGE_FETCH_WORKERS, IMPORT_BATCH_SIZE, import_products_from_json_data,
+    iter_json_products
+)
 
 
 class Command(BaseCommand):
@@ -24,60 +35,136 @@ class Command(BaseCommand):
             help='Limit the number of products to import (for testing)'
         )
         parser.add_argument(
-            '--skip-existing',
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Products whose images are downloaded together before they are written'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=IMAGE_FETCH_WORKERS,
+            help='Concurrent image downloads'
+        )
+        parser.add_argument(
+            '--per-host',
+            type=int,
+            default=IMAGE_FETCH_PER_HOST,
+            help='Concurrent image downloads per host'
+        )
+        parser.add_argument(
+            '--resume',
             action='store_true',
-            help='Skip products that already exist (by title)'
+            help='Continue after the products recorded in the checkpoint file'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default=None,
+            help='Checkpoint file path (default: <json_file>.checkpoint)'
         )
 
     def handle(self, *args, **options):
         json_file_path = options['json_file']
         limit = options.get('limit')
-        skip_existing = options.get('skip_existing', False)
 
         # Check if file exists
         if not os.path.exists(json_file_path):
             raise CommandError(f'File "{json_file_path}" does not exist.')
 
-        # Read JSON file
+        checkpoint_path = options.get('checkpoint') or f'{json_file_path}.checkpoint'
+        start = 0
+        if options.get('resume'):
+            checkpoint = self.read_checkpoint(checkpoint_path)
+            if checkpoint is None:
+                self.stdout.write(self.style.WARNING('No checkpoint found, starting from the beginning'))
+            elif checkpoint.get('file') != os.path.abspath(json_file_path):
+                raise CommandError(f'Checkpoint "{checkpoint_path}" belongs to {checkpoint.get("file")}.')
+            else:
+                start = checkpoint['processed']
+                self.stdout.write(f'Resuming after {start} products')
+
+        # Stream the JSON file
         self.stdout.write(f'Reading JSON file: {json_file_path}')
         try:
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
-        except json.JSONDecodeError as e:
-            raise CommandError(f'Invalid JSON file: {e}')
+            f = open(json_file_path, 'r', encoding='utf-8')
         except Exception as e:
             raise CommandError(f'Error reading file: {e}')
-
-        # Validate JSON structure
-        if not isinstance(json_data, list):
-            raise CommandError('JSON file must contain an array of products.')
+        products = islice(iter_json_products(f), start, None)
 
         # Limit products if specified
         if limit:
-            json_data = json_data[:limit]
+            products = islice(products, limit)
             self.stdout.write(self.style.WARNING(f'Limiting import to {limit} products'))
 
-        total_products = len(json_data)
-        self.stdout.write(f'Found {total_products} products in JSON file')
+        def save_checkpoint(processed, stats):
+            self.write_checkpoint(checkpoint_path, {
+                'file': os.path.abspath(json_file_path),
+                'processed': start + processed,
+            })
+            self.stdout.write(f'  committed {start + processed} products')
 
         # Import products
         self.stdout.write('Starting import...')
-        stats = import_products_from_json_data(json_data)
+        started = time.monotonic()
+        try:
+            with f:
+                stats = import_products_from_json_data(
+                    products,
+                    batch_size=options['batch_size'],
+                    max_workers=options['workers'],
+                    per_host=options['per_host'],
+                    on_batch=save_checkpoint,
+                )
+        except ValueError as e:  # includes json.JSONDecodeError
+            raise CommandError(
+                f'Invalid JSON file: {e}. Committed products are in the checkpoint; fix the file and use --resume.'
+            )
+        elapsed = max(time.monotonic() - started, 1e-6)
+        total_products = stats['processed']
+        if not limit and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
 
         # Display results
         self.stdout.write('\n' + '='*50)
         self.stdout.write(self.style.SUCCESS('Import completed!'))
         self.stdout.write('='*50)
+        self.stdout.write(f'Products processed: {stats["processed"]}')
         self.stdout.write(f'Products created: {stats["created"]}')
         self.stdout.write(f'Products skipped: {stats["skipped"]}')
         self.stdout.write(f'Images downloaded: {stats["images"]}')
         self.stdout.write(f'Reviews imported: {stats["reviews"]}')
+        self.stdout.write(f'Duplicate reviews skipped: {stats["duplicate_reviews"]}')
         self.stdout.write(f'Errors: {stats["errors"]}')
+        self.stdout.write('-'*50)
+        fetch_seconds = stats['fetch_seconds']
+        self.stdout.write(f'Total time: {elapsed:.1f}s ({total_products / elapsed:.1f} products/s)')
+        self.stdout.write(
+            f'Image fetching: {fetch_seconds:.1f}s, {stats["image_failures"]} failed, '
+            f'{stats["image_bytes"] / 1024 / 1024:.1f} MB'
+            + (f' ({stats["image_bytes"] / 1024 / 1024 / fetch_seconds:.2f} MB/s)' if fetch_seconds else '')
+        )
         self.stdout.write('='*50)
 
         if stats['errors'] > 0:
             self.stdout.write(self.style.WARNING(
                 f'Warning: {stats["errors"]} products had errors during import. '
-                'Check the console output above for details.'
+                'See the errors logged above for details.'
             ))
 
+
+    def read_checkpoint(self, path):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Unreadable checkpoint "{path}": {e}')
+
+    def write_checkpoint(self, path, data):
+        """Write atomically so a crash mid-write never leaves a corrupt checkpoint"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
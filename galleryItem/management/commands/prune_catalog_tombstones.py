@@ -0,0 +1,17 @@
+"""
+Delete change-feed tombstones older than GALLERY_CHANGE_FEED_RETENTION_DAYS
+Usage: python manage.py prune_catalog_tombstones
+
+Run daily (e.g. PythonAnywhere scheduled task); cursors older than the retention get 410 and resync.
+"""
+from django.core.management.base import BaseCommand
+
+from galleryItem.change_feed import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete catalog change feed tombstones older than the retention period'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} tombstones'))
@@ -0,0 +1,32 @@
+"""
+Rebuild denormalized rating aggregates on GalleryItem from the Review table
+Usage: python manage.py rebuild_rating_aggregates [--product ID ...]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from galleryItem.models import GalleryItem
+from galleryItem.ratings import rebuild_rating_aggregates
+from galleryItem.response_cache import purge_tags
+
+
+class Command(BaseCommand):
+    help = 'Recompute rating_sum, rating_count and the star histogram for products'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            type=int,
+            action='append',
+            dest='product_ids',
+            help='Only rebuild this product ID (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        product_ids = options.get('product_ids')
+        with transaction.atomic():
+            updated = rebuild_rating_aggregates(product_ids)
+            # Aggregates are written with bulk_update, which sends no signals
+            ids = product_ids or GalleryItem.objects.values_list('id', flat=True)
+            purge_tags('products', *(f'product:{pk}' for pk in ids))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {updated} products'))
@@ -0,0 +1,42 @@
+"""
+Regenerate the precomputed Schema.org JSON-LD stored on every variant
+Usage: python manage.py rebuild_schema_markup [--product ID ...] [--missing]
+
+Deploy step: run it with --missing once after migrate, so variants created
+before schema_markup existed get their markup (reads don't generate it).
+"""
+from django.core.management.base import BaseCommand
+
+from galleryItem.models import GalleryItem, Variant
+from galleryItem.schema_markup import refresh_schema_markup
+
+
+class Command(BaseCommand):
+    help = 'Regenerate Variant.schema_markup (Schema.org Product JSON-LD)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            type=int,
+            action='append',
+            dest='product_ids',
+            help='Only rebuild this product ID (can be repeated)'
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only generate markup for variants that have none yet'
+        )
+
+    def handle(self, *args, **options):
+        if options['missing']:
+            missing = {}
+            for variant_id, product_id in Variant.objects.filter(schema_markup='').values_list('id', 'product_id'):
+                missing.setdefault(product_id, []).append(variant_id)
+            if options.get('product_ids'):
+                missing = {pk: ids for pk, ids in missing.items() if pk in options['product_ids']}
+            variants = sum(refresh_schema_markup(product_id, ids) for product_id, ids in missing.items())
+        else:
+            product_ids = options.get('product_ids') or GalleryItem.objects.values_list('id', flat=True)
+            variants = sum(refresh_schema_markup(product_id) for product_id in product_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt schema markup for {variants} variants'))
@@ -0,0 +1,21 @@
+"""
+Rebuild the full-text product search index
+Usage: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from galleryItem.search import get_backend_for_connection, reset_search_backend_cache
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for gallery items (SQLite FTS5 / PostgreSQL tsvector)'
+
+    def handle(self, *args, **options):
+        backend = get_backend_for_connection()
+        if backend is None:
+            raise CommandError('The current database does not support the full-text search index.')
+
+        self.stdout.write(f'Rebuilding {backend.vendor} search index...')
+        indexed = backend.rebuild()
+        reset_search_backend_cache()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {indexed} products'))
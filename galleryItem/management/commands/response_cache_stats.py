@@ -0,0 +1,26 @@
+"""
+Show hit/miss counters of the catalog response cache
+Usage: python manage.py response_cache_stats [--reset]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from galleryItem.cache_backends import is_shared_cache
+from galleryItem.response_cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show (and optionally reset) catalog response cache hit/miss counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        if not is_shared_cache():
+            raise CommandError("CACHES['default'] is local to each process: the response cache is off and has no counters")
+        stats = get_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']:.2%}"
+        ))
+        if options['reset']:
+            reset_stats()
+            self.stdout.write('Counters reset')
@@ -0,0 +1,64 @@
+"""
+Absolute media URLs without calling request.build_absolute_uri() per image.
+
+The scheme/host prefix (or SITE_URL when there is no request) and the base
+URL of each file-system storage are resolved once; every URL after that is a
+string concatenation that gives the same result as
+
+    request.build_absolute_uri(storage.url(name))
+"""
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+
+
+class MediaUrlBuilder:
+    """Build absolute media URLs for one request (or for SITE_URL without one)"""
+
+    def __init__(self, request=None):
+        self.request = request
+        self._host = None
+        self._storage_bases = {}
+
+    def host_prefix(self):
+        """'scheme://host' of the request (SITE_URL without one)"""
+        if self._host is None:
+            if self.request is not None:
+                self._host = self.request.build_absolute_uri('/')[:-1]
+            else:
+                self._host = getattr(settings, 'SITE_URL', '')
+        return self._host
+
+    def absolute(self, url):
+        """Absolute form of a (usually root-relative) media URL"""
+        if url.startswith('/') and not url.startswith('//') and '/.' not in url:
+            return self.host_prefix() + url
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return f'{self.host_prefix()}{url}'
+
+    def storage_url(self, storage, name):
+        """Absolute URL of `name` in `storage`"""
+        if not isinstance(storage, FileSystemStorage):
+            return self.absolute(storage.url(name))
+        base = self._storage_bases.get(id(storage))
+        if base is None:
+            base = self._storage_bases[id(storage)] = self.absolute(storage.base_url)
+        return base + filepath_to_uri(name).lstrip('/')
+
+    def file_url(self, field_file):
+        """Absolute URL of a FieldFile, or None when it is empty"""
+        if not field_file:
+            return None
+        return self.storage_url(field_file.storage, field_file.name)
+
+
+def get_media_url_builder(request=None):
+    """The builder cached on `request`, so serializers of one response share it"""
+    if request is None:
+        return MediaUrlBuilder()
+    builder = getattr(request, '_media_url_builder', None)
+    if builder is None:
+        builder = MediaUrlBuilder(request)
+        request._media_url_builder = builder
+    return builder
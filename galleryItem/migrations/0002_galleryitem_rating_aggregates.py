@@ -0,0 +1,73 @@
+# Generated by Django 5.2.8 on 2026-10-16 20:40
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Greatest, Least
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    GalleryItem = apps.get_model('galleryItem', 'GalleryItem')
+    fields = ['rating_sum', 'rating_count'] + [f'rating_{star}_count' for star in range(1, 6)]
+    # Out-of-range ratings are clamped to 1-5 like galleryItem.ratings does, so every
+    # review lands in exactly one star bucket
+    star_filters = {1: Q(reviews__rating__lte=1), 5: Q(reviews__rating__gte=5)}
+    products = GalleryItem.objects.annotate(
+        new_rating_sum=Sum(Greatest(Least('reviews__rating', 5), 1), default=0),
+        new_rating_count=Count('reviews'),
+        **{
+            f'new_rating_{star}_count': Count('reviews', filter=star_filters.get(star, Q(reviews__rating=star)))
+            for star in range(1, 6)
+        }
+    )
+    to_update = []
+    for product in products:
+        for field in fields:
+            setattr(product, field, getattr(product, f'new_{field}'))
+        to_update.append(product)
+    GalleryItem.objects.bulk_update(to_update, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galleryItem', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galleryitem',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='galleryitem',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='galleryitem',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='galleryitem',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='galleryitem',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='galleryitem',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='galleryitem',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Full-text search index for GalleryItem (FTS5 on SQLite, tsvector + GIN on PostgreSQL)
+
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from galleryItem.search import BACKENDS
+    backend_class = BACKENDS.get(schema_editor.connection.vendor)
+    if backend_class is None:
+        return
+    backend = backend_class()
+    with schema_editor.connection.cursor() as cursor:
+        backend.install(cursor)
+        if backend_class.vendor == 'sqlite':
+            table = schema_editor.connection.ops.quote_name(backend.index_table)
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(apps, schema_editor):
+    from galleryItem.search import BACKENDS
+    backend_class = BACKENDS.get(schema_editor.connection.vendor)
+    if backend_class is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        backend_class().uninstall(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galleryItem', '0002_galleryitem_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
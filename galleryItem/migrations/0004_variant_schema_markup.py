@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galleryItem', '0003_galleryitem_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variant',
+            name='schema_markup',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-16 20:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galleryItem', '0004_variant_schema_markup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='galleryItem.galleryitem')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='galleryItem.galleryitem')),
+            ],
+            options={
+                'ordering': ('product', 'rank'),
+                'unique_together': {('product', 'related')},
+            },
+        ),
+    ]
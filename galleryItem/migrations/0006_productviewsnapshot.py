@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galleryItem', '0005_relatedproduct'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductViewSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_views', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='galleryItem.galleryitem')),
+            ],
+            options={
+                'unique_together': {('product', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galleryItem', '0006_productviewsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variant',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='variantimage',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:15
+
+import galleryItem.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galleryItem', '0007_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='variant',
+            name='image',
+            field=models.ImageField(storage=galleryItem.storage.select_product_image_storage, upload_to='products/images/small/'),
+        ),
+        migrations.AlterField(
+            model_name='variant',
+            name='largeImage',
+            field=models.ImageField(storage=galleryItem.storage.select_product_image_storage, upload_to='products/images/large/'),
+        ),
+        migrations.AlterField(
+            model_name='variantimage',
+            name='image',
+            field=models.ImageField(storage=galleryItem.storage.select_product_image_storage, upload_to='products/images/'),
+        ),
+    ]
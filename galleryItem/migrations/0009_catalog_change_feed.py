@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galleryItem', '0008_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('variant', 'Variant')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('product_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('deleted', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted', 'id'], name='catalogtombstone_deleted_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='galleryitem',
+            index=models.Index(fields=['updated', 'id'], name='galleryitem_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='variant',
+            index=models.Index(fields=['updated', 'id'], name='variant_updated_id_idx'),
+        ),
+    ]
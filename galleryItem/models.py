@@ -1,13 +1,13 @@
 import math
-import json
 
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models import Avg
 from django.urls import reverse
 from mptt.fields import TreeForeignKey
 from mptt.models import MPTTModel
 
+from .storage import select_product_image_storage
+
 
 class Category(MPTTModel):
     title = models.CharField(max_length=50, unique=True)
@@ -71,21 +71,43 @@ class GalleryItem(models.Model):
     metaKeyDescription = models.CharField(max_length=255, help_text='content for description meta tag')
     google_product_category = models.ForeignKey(GoogleProductCategory, null=True, blank=True, on_delete=models.CASCADE)
 
+    # Denormalized review aggregates, maintained by galleryItem.ratings from Review signals.
+    # Rebuild with: python manage.py rebuild_rating_aggregates
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+
+    RATING_AGGREGATE_FIELDS = (
+        'rating_sum', 'rating_count',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    )
+
+    class Meta:
+        indexes = [
+            # Keyset scans of the catalog change feed (galleryItem.change_feed)
+            models.Index(fields=['updated', 'id'], name='galleryitem_updated_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
     def save(self, *args, **kwargs):
+        # Never write back rating aggregates from a stale in-memory copy;
+        # they are only changed through F() updates in galleryItem.ratings.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.RATING_AGGREGATE_FIELDS
+            ]
         # Auto-generate slug from title if not provided
         if not self.slug:
-            from django.utils.text import slugify
-            base_slug = slugify(self.title)
-            slug = base_slug
-            counter = 1
-            # Ensure uniqueness
-            while GalleryItem.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
+            from .slugs import allocate_slug
+            # Ensure uniqueness (one query, see galleryItem.slugs)
+            self.slug = allocate_slug(GalleryItem, self.title, exclude_pk=self.pk)
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -103,10 +125,22 @@ class GalleryItem(models.Model):
             self.save()
         return self.default_variant
 
+    @property
+    def average_rating(self):
+        """Average review rating rounded to 2 decimals (0 when there are no reviews)"""
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 2)
+
+    @property
+    def rating_histogram(self):
+        """Number of reviews per star rating, e.g. {1: 0, 2: 1, 3: 0, 4: 4, 5: 10}"""
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+
     # Get average rating stars Note: We can also use 'round' instead of 'ceil' but better to show glass half full.
     def rating_stars(self):
-        if self.reviews.count() > 0:
-            avg_rating = math.ceil(self.reviews.aggregate(Avg('rating'))['rating__avg'])
+        if self.rating_count > 0:
+            avg_rating = math.ceil(self.rating_sum / self.rating_count)
         else:
             avg_rating = 0
 
@@ -120,99 +154,27 @@ class GalleryItem(models.Model):
 
     def get_schema_markup(self, variant=None, request=None):
         """
-        Generate Schema.org Product markup (JSON-LD) for SEO
+        Schema.org Product markup (JSON-LD) for SEO, served from the copy
+        precomputed on the variant (see galleryItem.schema_markup). None
+        until the markup has been generated (rebuild_schema_markup --missing).
         """
+        from .schema_markup import render_schema_markup
+
         if variant is None:
-            variant = self.get_default_variant()
-        
-        # Calculate average rating
-        reviews = self.reviews.all()
-        review_count = reviews.count()
-        if review_count > 0:
-            avg_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-        else:
-            avg_rating = None
-        
-        # Build absolute URL
-        if request:
-            product_url = request.build_absolute_uri(self.get_absolute_url())
-            image_url = request.build_absolute_uri(variant.image.url) if variant.image else None
-        else:
-            product_url = self.get_absolute_url()
-            image_url = variant.image.url if variant.image else None
-        
-        # Build schema
-        schema = {
-            "@context": "https://schema.org/",
-            "@type": "Product",
-            "name": self.title,
-            "description": self.description if self.description else self.metaKeyDescription,
-            "image": image_url,
-            "url": product_url,
-            "sku": str(variant.id) if variant else str(self.id),
-            "brand": {
-                "@type": "Brand",
-                "name": "Your Store Name"  # TODO: Update with actual store name
-            },
-            "offers": {
-                "@type": "Offer",
-                "url": product_url,
-                "priceCurrency": "USD",
-                "price": str(variant.price) if variant else "0.00",
-                "availability": "https://schema.org/InStock" if (variant and variant.in_stock) else "https://schema.org/OutOfStock",
-                "priceValidUntil": "2025-12-31",  # TODO: Update with actual price validity
-                "seller": {
-                    "@type": "Organization",
-                    "name": "Your Store Name"  # TODO: Update with actual store name
-                }
-            }
-        }
-        
-        # Add aggregateRating if reviews exist
-        if avg_rating and review_count > 0:
-            schema["aggregateRating"] = {
-                "@type": "AggregateRating",
-                "ratingValue": str(round(avg_rating, 2)),
-                "reviewCount": str(review_count),
-                "bestRating": "5",
-                "worstRating": "1"
-            }
-        
-        # Add category if available
-        if self.category:
-            schema["category"] = self.category.title
-        
-        # Add individual reviews
-        if review_count > 0:
-            schema["review"] = []
-            for review in reviews[:10]:  # Limit to 10 reviews for performance
-                review_data = {
-                    "@type": "Review",
-                    "reviewRating": {
-                        "@type": "Rating",
-                        "ratingValue": str(review.rating),
-                        "bestRating": "5",
-                        "worstRating": "1"
-                    },
-                    "author": {
-                        "@type": "Person",
-                        "name": review.get_author() if not review.keep_anonymous else "Anonymous"
-                    },
-                    "datePublished": review.date_added.strftime("%Y-%m-%d") if review.date_added else ""
-                }
-                if review.content:
-                    review_data["reviewBody"] = review.content
-                schema["review"].append(review_data)
-        
-        return json.dumps(schema, ensure_ascii=False)
+            # Unlike get_default_variant() this never writes to the database
+            variant = self.default_variant or self.variant_set.first()
+        if variant is None or not variant.schema_markup:
+            return None
+        return render_schema_markup(variant.schema_markup, request)
 
 
 class Variant(models.Model):
     product = models.ForeignKey(GalleryItem, on_delete=models.CASCADE)
     supplies = models.ManyToManyField(Supply, related_name='variant_supply', through='VariantSupply')
-    image = models.ImageField(height_field=None, width_field=None, max_length=100, upload_to='products/images/small/')
+    image = models.ImageField(height_field=None, width_field=None, max_length=100, upload_to='products/images/small/',
+                              storage=select_product_image_storage)
     largeImage = models.ImageField(height_field=None, width_field=None, max_length=100,
-                                   upload_to='products/images/large/')
+                                   upload_to='products/images/large/', storage=select_product_image_storage)
     title = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=30, decimal_places=2)
     quantity = models.IntegerField()
@@ -221,10 +183,32 @@ class Variant(models.Model):
     is_best_seller = models.BooleanField(default=False)
     updated = models.DateTimeField(auto_now_add=False, auto_now=True)
     active = models.BooleanField(default=True)
+    # Precomputed Schema.org JSON-LD template, maintained by galleryItem.schema_markup
+    schema_markup = models.TextField(blank=True, default='', editable=False)
+    # Responsive image widths per image field, maintained by galleryItem.image_derivatives
+    image_derivatives = models.JSONField(blank=True, default=dict, editable=False)
+
+    # Written by background jobs with queryset updates, never by a regular save
+    MAINTAINED_FIELDS = ('schema_markup', 'image_derivatives')
+
+    class Meta:
+        indexes = [
+            # Keyset scans of the catalog change feed (galleryItem.change_feed)
+            models.Index(fields=['updated', 'id'], name='variant_updated_id_idx'),
+        ]
 
     def __str__(self):
         return f'{self.product.title} ({self.title})'
 
+    def save(self, *args, **kwargs):
+        # A copy loaded before the derivative worker finished must not write its record back
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def get_price(self):
         return "{:.2f}".format(self.price)
 
@@ -236,15 +220,28 @@ class Variant(models.Model):
 class VariantImage(models.Model):
     name = models.CharField(max_length=255, blank=False)
     variant = models.ForeignKey(Variant, on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='products/images/')
+    image = models.ImageField(upload_to='products/images/', storage=select_product_image_storage)
     featured = models.BooleanField(default=False)
     thumbnail = models.BooleanField(default=False)
     active = models.BooleanField(default=True)
     updated = models.DateTimeField(auto_now_add=False, auto_now=True)
+    # Responsive image widths, maintained by galleryItem.image_derivatives
+    image_derivatives = models.JSONField(blank=True, default=dict, editable=False)
+
+    MAINTAINED_FIELDS = ('image_derivatives',)
 
     def __str__(self):
         return f'{self.variant.product.title} ({self.variant.title})'
 
+    def save(self, *args, **kwargs):
+        # See Variant.save()
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class VariantVideo(models.Model):
     title = models.CharField(max_length=255, blank=False)
@@ -386,3 +383,71 @@ class Ranking(models.Model):
 
     def __str__(self):
         return f"{self.date_added}, {self.get_criteria_display()}, {self.product}, {self.rank}"
+
+
+class ProductViewSnapshot(models.Model):
+    """Daily copy of total_views; the baseline for most-viewed ranking deltas"""
+    product = models.ForeignKey(GalleryItem, on_delete=models.CASCADE)
+    date = models.DateField()
+    total_views = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('product', 'date')
+
+
+class RelatedProduct(models.Model):
+    """Precomputed top-K neighbours of a product (see galleryItem.related_products)"""
+    product = models.ForeignKey(GalleryItem, related_name='neighbours', on_delete=models.CASCADE)
+    related = models.ForeignKey(GalleryItem, related_name='+', on_delete=models.CASCADE)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('product', 'related')
+        ordering = ('product', 'rank')
+
+    def __str__(self):
+        return f"{self.product} -> {self.related} ({self.rank})"
+
+
+class MediaBlob(models.Model):
+    """Reference count of a content-addressed media file (see galleryItem.storage)"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount} refs)'
+
+
+class CatalogTombstone(models.Model):
+    """Deleted product/variant, reported by the catalog change feed (see galleryItem.change_feed)"""
+    PRODUCT = 'product'
+    VARIANT = 'variant'
+    KIND_CHOICES = (
+        (PRODUCT, 'Product'),
+        (VARIANT, 'Variant'),
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    product_id = models.PositiveBigIntegerField(null=True, blank=True)
+    deleted = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted', 'id'], name='catalogtombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} deleted {self.deleted:%Y-%m-%d %H:%M}'
+
+
+class ContentVersion(models.Model):
+    """Change counter of a slice of the catalog, bumped in the writing transaction (see galleryItem.content_versions)"""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} v{self.version}'
@@ -0,0 +1,155 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .search import SEARCH_RANK
+
+
+class GalleryItemKeysetPagination(BasePagination):
+    """
+    Opt-in keyset (cursor) pagination for the product catalog.
+
+    Pages are keyed on (ordering field, id) so tokens stay stable while products
+    are added or removed, and every page costs one indexed query no matter how
+    deep the client scrolls. Enabled only when the request sends `cursor` or
+    `page_size`; old clients keep getting the full unpaginated list. Searches
+    without an explicit `ordering` are keyed on their relevance rank.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 24
+    max_page_size = 100
+    default_ordering = '-timeStamp'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        """Return True if the client asked for a paginated response"""
+        params = request.query_params
+        return cls.cursor_query_param in params or cls.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Resolve the primary ordering field from the view's OrderingFilter.
+        Only one field is used; `id` is always appended as the tie-breaker.
+        """
+        # Ranked searches without `ordering` were sorted by relevance (GalleryItemOrderingFilter)
+        if queryset.query.order_by[:1] == (f'-{SEARCH_RANK}',):
+            return f'-{SEARCH_RANK}'
+        allowed = getattr(view, 'ordering_fields', None) or []
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view) or []
+                for term in ordering:
+                    if term.lstrip('-') in allowed:
+                        return term
+        return self.default_ordering
+
+    def encode_cursor(self, value, pk, reverse):
+        payload = json.dumps({'v': value, 'id': pk, 'r': reverse}, default=str)
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, field):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+            value = field.to_python(payload['v'])
+            return value, int(payload['id']), bool(payload.get('r', False))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        ordering = self.get_ordering(request, queryset, view)
+        descending = ordering.startswith('-')
+        self.field_name = ordering.lstrip('-')
+        if self.field_name in queryset.query.annotations:
+            field = queryset.query.annotations[self.field_name].output_field
+        else:
+            field = queryset.model._meta.get_field(self.field_name)
+
+        cursor = self.decode_cursor(request, field)
+        reverse = cursor[2] if cursor else False
+
+        # Walking backwards flips the sort so the page boundary is still a
+        # simple "strictly after the key" comparison.
+        forward_desc = descending != reverse
+        prefix = '-' if forward_desc else ''
+        queryset = queryset.order_by(f'{prefix}{self.field_name}', f'{prefix}id')
+
+        if cursor:
+            value, pk, _ = cursor
+            op = 'lt' if forward_desc else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field_name}__{op}': value}) |
+                Q(**{self.field_name: value, f'id__{op}': pk})
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        return self.encode_cursor(getattr(last, self.field_name), last.pk, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        first = self.page[0]
+        return self.encode_cursor(getattr(first, self.field_name), first.pk, True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
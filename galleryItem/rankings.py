@@ -0,0 +1,132 @@
+"""
+Daily materialized product rankings (Ranking model).
+
+Each criteria is computed with one grouped query and ranked in SQL:
+
+- F most favorited: active wishlist entries (is_unwished=False)
+- V most viewed: total_views gained since the previous day's snapshot
+  (ProductViewSnapshot); the first run counts all views so far
+- S most sold: OrderItem quantities of finalized, non-canceled orders in
+  the last `sold_days` days
+
+Today's rows are replaced in one transaction, so re-running the job on the
+same day is safe. Storefront carousels read the result through
+RankingListView instead of aggregating live.
+
+Run daily with: python manage.py compute_rankings
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+
+from .models import GalleryItem, ProductViewSnapshot, Ranking, WishedItem
+from .response_cache import purge_tags
+
+DEFAULT_LIMIT = 100
+DEFAULT_SOLD_DAYS = 30
+SNAPSHOT_RETENTION_DAYS = 30
+
+CRITERIA_ALIASES = {
+    'favorited': Ranking.MOST_FAVORITED,
+    'viewed': Ranking.MOST_VIEWED,
+    'sold': Ranking.MOST_SOLD,
+}
+
+
+def _ranked(queryset, limit):
+    """Rank a values('product_id', 'value') queryset in SQL, best first"""
+    return queryset.filter(value__gt=0).annotate(
+        position=Window(RowNumber(), order_by=[F('value').desc(), F('product_id').asc()])
+    ).order_by('position')[:limit]
+
+
+def most_favorited(limit):
+    return _ranked(
+        WishedItem.objects.filter(is_unwished=False, product__active=True)
+        .values('product_id').annotate(value=Count('id')),
+        limit
+    )
+
+
+def most_viewed(limit, today):
+    baseline = ProductViewSnapshot.objects.filter(
+        product=OuterRef('pk'), date__lt=today
+    ).order_by('-date').values('total_views')[:1]
+    return _ranked(
+        GalleryItem.objects.filter(active=True)
+        .annotate(product_id=F('pk'), value=F('total_views') - Coalesce(Subquery(baseline), 0))
+        .values('product_id', 'value'),
+        limit
+    )
+
+
+def most_sold(limit, since):
+    from cart.models import Order, OrderItem
+
+    return _ranked(
+        OrderItem.objects.filter(
+            order__ordered=True, order__ordered_date__gte=since, variant__product__active=True
+        ).exclude(order__status=Order.CANCELED)
+        .values(product_id=F('variant__product_id')).annotate(value=Sum('quantity')),
+        limit
+    )
+
+
+def snapshot_view_counts(today):
+    """Upsert today's total_views snapshot and drop old ones"""
+    snapshots = [
+        ProductViewSnapshot(product_id=product_id, date=today, total_views=total_views)
+        for product_id, total_views in GalleryItem.objects.values_list('id', 'total_views')
+    ]
+    ProductViewSnapshot.objects.bulk_create(
+        snapshots, batch_size=1000,
+        update_conflicts=True, unique_fields=['product', 'date'], update_fields=['total_views']
+    )
+    ProductViewSnapshot.objects.filter(date__lt=today - datetime.timedelta(days=SNAPSHOT_RETENTION_DAYS)).delete()
+
+
+def materialize_rankings(limit=DEFAULT_LIMIT, sold_days=DEFAULT_SOLD_DAYS):
+    """Recompute today's rankings for every criteria; returns {criteria: rows}"""
+    # Ranking.date_added is auto_now_add, which uses date.today()
+    today = datetime.date.today()
+    since = timezone.now() - datetime.timedelta(days=sold_days)
+    querysets = {
+        Ranking.MOST_FAVORITED: most_favorited(limit),
+        Ranking.MOST_VIEWED: most_viewed(limit, today),
+        Ranking.MOST_SOLD: most_sold(limit, since),
+    }
+
+    with transaction.atomic():
+        rows = [
+            Ranking(criteria=criteria, product_id=row['product_id'], value=row['value'], rank=row['position'])
+            for criteria, queryset in querysets.items()
+            for row in queryset
+        ]
+        Ranking.objects.filter(date_added=today).delete()
+        Ranking.objects.bulk_create(rows, batch_size=1000)
+        snapshot_view_counts(today)
+    purge_tags('rankings')
+
+    counts = {criteria: 0 for criteria in querysets}
+    for row in rows:
+        counts[row.criteria] += 1
+    return counts
+
+
+def resolve_criteria(value):
+    """Accept a criteria code (F/V/S) or name (favorited/viewed/sold); None if unknown"""
+    value = (value or '').strip()
+    if value.upper() in dict(Ranking.CRITERIA_CHOICES):
+        return value.upper()
+    return CRITERIA_ALIASES.get(value.lower())
+
+
+def top_rankings(criteria, limit):
+    """Latest materialized top-N for a criteria, with products ready for GalleryItemListSerializer"""
+    latest = Ranking.objects.filter(criteria=criteria).order_by('-date_added').values('date_added')[:1]
+    return Ranking.objects.filter(
+        criteria=criteria, date_added=Subquery(latest), product__active=True
+    ).select_related('product__category', 'product__default_variant').order_by('rank')[:limit]
@@ -0,0 +1,99 @@
+"""
+Denormalized review rating aggregates on GalleryItem.
+
+GalleryItem stores rating_sum, rating_count and one counter per star so that
+listings can show average rating and review count without touching the Review
+table. Counters are changed with F() expressions so concurrent reviews never
+overwrite each other; decrements stop at 0, so counters that drifted (reviews
+loaded with loaddata or bulk_create outside BulkReviewLoader) can't make a
+review or product delete fail on the unsigned columns. Fix drift with
+rebuild_rating_aggregates.
+"""
+from collections import Counter
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest, Least
+
+from .models import GalleryItem, Review
+
+MIN_RATING = min(star for star, _ in Review.RATING_CHOICES)
+MAX_RATING = max(star for star, _ in Review.RATING_CHOICES)
+
+
+def clamp_rating(rating):
+    """A rating as an int within 1-5 (Review.rating has no DB constraint; imports may be out of range)"""
+    return min(MAX_RATING, max(MIN_RATING, int(rating)))
+
+
+def _star_field(rating):
+    return f'rating_{clamp_rating(rating)}_count'
+
+
+def _shifted(field, delta):
+    """F(field) + delta, never below 0 (the counters are PositiveIntegerFields)"""
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def apply_rating_changes(product_id, added=(), removed=()):
+    """
+    Add and/or remove ratings for one product in a single UPDATE.
+
+    `added` and `removed` are iterables of ratings, clamped to 1-5. Used by
+    the Review signals and by bulk review loaders that bypass signals.
+    """
+    added = [clamp_rating(r) for r in added]
+    removed = [clamp_rating(r) for r in removed]
+    if not added and not removed:
+        return
+
+    updates = {
+        'rating_sum': _shifted('rating_sum', sum(added) - sum(removed)),
+        'rating_count': _shifted('rating_count', len(added) - len(removed)),
+    }
+    stars = Counter(added)
+    stars.subtract(removed)
+    for star, delta in stars.items():
+        if delta:
+            field = _star_field(star)
+            updates[field] = _shifted(field, delta)
+
+    GalleryItem.objects.filter(pk=product_id).update(**updates)
+
+
+def _star_filter(star):
+    if star == MIN_RATING:
+        return Q(reviews__rating__lte=star)
+    if star == MAX_RATING:
+        return Q(reviews__rating__gte=star)
+    return Q(reviews__rating=star)
+
+
+def rebuild_rating_aggregates(product_ids=None):
+    """
+    Recompute rating aggregates from the Review table with one grouped query.
+    Returns the number of products updated.
+    """
+    products = GalleryItem.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    totals = products.annotate(
+        # Clamped like apply_rating_changes(), so both agree on out-of-range rows
+        new_rating_sum=Sum(Greatest(Least('reviews__rating', MAX_RATING), MIN_RATING), default=0),
+        new_rating_count=Count('reviews'),
+        **{
+            f'new_{_star_field(star)}': Count('reviews', filter=_star_filter(star))
+            for star, _ in Review.RATING_CHOICES
+        }
+    ).only('id')
+
+    to_update = []
+    for product in totals:
+        for field in GalleryItem.RATING_AGGREGATE_FIELDS:
+            setattr(product, field, getattr(product, f'new_{field}'))
+        to_update.append(product)
+
+    GalleryItem.objects.bulk_update(to_update, GalleryItem.RATING_AGGREGATE_FIELDS, batch_size=500)
+    return len(to_update)
@@ -0,0 +1,211 @@
+"""
+Offline related-products engine.
+
+A batch job scores candidate pairs of active products on three signals and
+stores the top-K neighbours of every product in the RelatedProduct table:
+
+- category: closeness in the category tree, 1 / (1 + edges between the two
+  categories); products in different trees score 0
+- keywords: TF-IDF cosine similarity of the comma separated metaKeyWords
+- co-purchase: how often both products were in the same finalized order,
+  normalized by the product's strongest co-purchase
+
+Candidates are bounded per product: keyword and co-purchase partners, plus
+the first few products of each nearby category (every other product there
+would get the same category score and lose the id tie-break anyway), so the
+job grows with products x candidates rather than with all product pairs.
+Products left with fewer than MIN_NEIGHBOURS are topped up with the most
+viewed products (score 0).
+
+The product detail serializer reads the table with one prefetched query and
+falls back to same-category products until the job has run.
+
+Run with: python manage.py compute_related_products
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, islice
+
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .categories import CategoryIndex
+from .models import GalleryItem, RelatedProduct
+
+TOP_K = 8
+# Products with fewer neighbours than this are topped up with popular products
+MIN_NEIGHBOURS = 4
+DEFAULT_WEIGHTS = {'category': 0.3, 'keywords': 0.4, 'copurchase': 0.3}
+# Candidates from the category tree are limited to this many edges away
+MAX_CATEGORY_DISTANCE = 2
+# Keywords used by more than this share (or number) of products carry no signal and make pairs explode
+MAX_KEYWORD_DF = 0.5
+MAX_KEYWORD_PRODUCTS = 500
+
+
+def neighbours_prefetch():
+    """Prefetch for GalleryItem querysets feeding GalleryItemDetailSerializer.related_products"""
+    return Prefetch(
+        'neighbours',
+        queryset=RelatedProduct.objects.select_related(
+            'related__default_variant', 'related__category'
+        ).order_by('rank')
+    )
+
+
+def parse_keywords(raw):
+    return {keyword.strip().lower() for keyword in (raw or '').split(',') if keyword.strip()}
+
+
+def keyword_vectors(keywords_by_product):
+    """L2-normalized TF-IDF vectors ({term: weight}) from {product_id: set(keywords)}"""
+    total = len(keywords_by_product)
+    df = Counter(term for terms in keywords_by_product.values() for term in terms)
+    vectors = {}
+    for product_id, terms in keywords_by_product.items():
+        vector = {
+            term: math.log((1 + total) / (1 + df[term])) + 1
+            for term in terms if df[term] <= min(max(1, total * MAX_KEYWORD_DF), MAX_KEYWORD_PRODUCTS)
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        vectors[product_id] = {term: weight / norm for term, weight in vector.items()} if norm else {}
+    return vectors
+
+
+def keyword_similarities(vectors):
+    """Sparse cosine similarities {(a, b): score} via an inverted index (a < b)"""
+    postings = defaultdict(list)
+    for product_id, vector in vectors.items():
+        for term, weight in vector.items():
+            postings[term].append((product_id, weight))
+    scores = defaultdict(float)
+    for entries in postings.values():
+        for (a, weight_a), (b, weight_b) in combinations(sorted(entries), 2):
+            scores[(a, b)] += weight_a * weight_b
+    return scores
+
+
+def category_distance(index, a, b):
+    """Number of tree edges between two categories, or None when in different trees"""
+    if a == b:
+        return 0
+    path_a = index.ancestors[a] | {a}
+    path_b = index.ancestors[b] | {b}
+    common = path_a & path_b
+    if not common:
+        return None
+    # The lowest common ancestor has the most ancestors of its own
+    depth = {category_id: len(index.ancestors[category_id]) for category_id in path_a | path_b}
+    lca_depth = max(depth[category_id] for category_id in common)
+    return (depth[a] - lca_depth) + (depth[b] - lca_depth)
+
+
+def copurchase_counts(product_ids):
+    """{(a, b): number of finalized orders containing both products} (a < b)"""
+    from cart.models import OrderItem
+
+    rows = OrderItem.objects.filter(
+        order__ordered=True, variant__product_id__in=product_ids
+    ).values_list('order_id', 'variant__product_id').distinct()
+    baskets = defaultdict(set)
+    for order_id, product_id in rows:
+        baskets[order_id].add(product_id)
+    counts = Counter()
+    for products in baskets.values():
+        for pair in combinations(sorted(products), 2):
+            counts[pair] += 1
+    return counts
+
+
+def compute_related_products(top_k=TOP_K, weights=None):
+    """
+    Score the candidates of every product and return {product_id: [(related_id, score), ...]}
+    with at most `top_k` neighbours per product, best first.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    products = list(
+        GalleryItem.objects.filter(active=True).order_by('-total_views', 'id').values_list('id', 'category_id', 'metaKeyWords')
+    )
+    if not products:
+        return {}
+    index = CategoryIndex.build()
+    category_of = {product_id: category_id for product_id, category_id, _ in products}
+    popular = [product_id for product_id, _, _ in products]
+
+    keyword_scores = keyword_similarities(
+        keyword_vectors({product_id: parse_keywords(keywords) for product_id, _, keywords in products})
+    )
+    copurchases = copurchase_counts(list(category_of))
+    strongest = Counter()
+    partners = defaultdict(set)
+    for (a, b), count in copurchases.items():
+        strongest[a] = max(strongest[a], count)
+        strongest[b] = max(strongest[b], count)
+    for a, b in list(keyword_scores) + list(copurchases):
+        partners[a].add(b)
+        partners[b].add(a)
+
+    # Categories within MAX_CATEGORY_DISTANCE of each category (itself included)
+    members = defaultdict(list)
+    for product_id in sorted(category_of):
+        members[category_of[product_id]].append(product_id)
+    nearby = {category_id: [category_id] for category_id in members}
+    for category_a, category_b in combinations(sorted(members), 2):
+        distance = category_distance(index, category_a, category_b)
+        if distance is not None and distance <= MAX_CATEGORY_DISTANCE:
+            nearby[category_a].append(category_b)
+            nearby[category_b].append(category_a)
+
+    distances = {}
+    neighbours = {}
+    for product_id, category_id in category_of.items():
+        candidates = set(partners[product_id])
+        for other_category in nearby[category_id]:
+            # Ties on the category score go to the lowest ids: more of them could never rank
+            others = (other for other in members[other_category] if other != product_id)
+            candidates.update(islice(others, top_k))
+
+        scored = []
+        for other in candidates:
+            key = (category_id, category_of[other])
+            if key not in distances:
+                distances[key] = category_distance(index, *key)
+            distance = distances[key]
+            pair = (min(product_id, other), max(product_id, other))
+            count = copurchases.get(pair, 0)
+            score = (
+                weights['category'] * (1 / (1 + distance) if distance is not None else 0.0) +
+                weights['keywords'] * keyword_scores.get(pair, 0.0)
+            )
+            if score <= 0 and not count:
+                continue
+            # Co-purchase is normalized per product, so the pair scores differently from each side
+            if count:
+                score += weights['copurchase'] * count / strongest[product_id]
+            scored.append((score, other))
+
+        ranked = [
+            (related_id, score)
+            for score, related_id in heapq.nlargest(top_k, scored, key=lambda item: (item[0], -item[1]))
+        ]
+        wanted = min(MIN_NEIGHBOURS, top_k) - len(ranked)
+        if wanted > 0:
+            taken = {related_id for related_id, _ in ranked} | {product_id}
+            ranked.extend((other, 0.0) for other in islice((p for p in popular if p not in taken), wanted))
+        if ranked:
+            neighbours[product_id] = ranked
+    return neighbours
+
+
+def store_related_products(neighbours):
+    """Replace the whole neighbour table in one transaction; returns the number of rows"""
+    rows = [
+        RelatedProduct(product_id=product_id, related_id=related_id, score=round(score, 6), rank=rank)
+        for product_id, ranked in neighbours.items()
+        for rank, (related_id, score) in enumerate(ranked, start=1)
+    ]
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        RelatedProduct.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
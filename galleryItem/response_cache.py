@@ -0,0 +1,284 @@
+"""
+Tag-invalidated response cache for the public catalog endpoints.
+
+Anonymous GET responses are cached by path + normalized query params. Every
+entry records the tags it depends on (e.g. `product:12`, `category:3`,
+`reviews:12`) together with each tag's version at store time. Purging a tag
+just bumps its version, which makes every entry that used it stale; this
+works on any Django cache backend without key scans.
+
+Tags are purged by model signals in galleryItem.signals. Cached tag
+versions only decide whether an entry is stale; ETags use the database-backed
+versions in galleryItem.content_versions.
+
+Entries, tag versions and stats live in the default cache, which must be
+shared by every process (Redis/Memcached, see galleryItem.cache_backends):
+purges from other workers, management commands and the importer would never
+reach a local-memory cache, so the response cache stays off there.
+
+Streamed responses (galleryItem.streaming) are stored once their last chunk
+has been sent, unless the body grew past GALLERY_RESPONSE_CACHE_MAX_STREAM_BYTES:
+from then on chunks are passed through without being kept, so a streamed
+export never ends up buffered in memory.
+
+Settings:
+    GALLERY_RESPONSE_CACHE_ENABLED   turn the cache on/off (default True)
+    GALLERY_RESPONSE_CACHE_TIMEOUT   entry lifetime in seconds (default 300)
+    GALLERY_RESPONSE_CACHE_MAX_STREAM_BYTES
+                                     largest streamed body that is cached (default 1 MiB)
+
+Hit/miss counters are buffered per process and added to the cache every
+STATS_FLUSH_EVERY requests or STATS_FLUSH_INTERVAL seconds, not on every
+request; see them with python manage.py response_cache_stats
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, urlencode
+
+from .cache_backends import is_shared_cache
+from .content_versions import bump_content_versions
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'gallery:response:'
+TAG_PREFIX = 'gallery:tag:'
+# Validators set by galleryItem.conditional are replayed on cache hits
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+STATS_KEYS = {'hits': 'gallery:response_cache:hits', 'misses': 'gallery:response_cache:misses'}
+STATS_FLUSH_EVERY = 100  # requests
+STATS_FLUSH_INTERVAL = 30  # seconds
+
+_pending_stats = Counter()
+_stats_flushed_at = time.monotonic()
+_stats_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, 'GALLERY_RESPONSE_CACHE_ENABLED', True) and is_shared_cache()
+
+
+def get_timeout():
+    return getattr(settings, 'GALLERY_RESPONSE_CACHE_TIMEOUT', 60 * 5)
+
+
+def get_max_stream_bytes():
+    return getattr(settings, 'GALLERY_RESPONSE_CACHE_MAX_STREAM_BYTES', 1024 * 1024)
+
+
+def normalize_query(query_params):
+    """Sorted, de-duplicated query string with empty values dropped"""
+    items = []
+    for key in sorted(query_params.keys()):
+        values = sorted({value for value in query_params.getlist(key) if value != ''})
+        items.extend((key, value) for value in values)
+    return urlencode(items)
+
+
+def make_cache_key(request):
+    # Host/scheme are part of the key because serializers emit absolute media URLs
+    raw = '|'.join([
+        request.build_absolute_uri('/'),
+        request.path,
+        normalize_query(request.GET),
+        request.META.get('HTTP_ACCEPT', ''),
+    ])
+    return KEY_PREFIX + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def _tag_key(tag):
+    return f'{TAG_PREFIX}{tag}'
+
+
+def get_tag_versions(tags):
+    """Current version of every tag (tags never seen before start at 0)"""
+    stored = cache.get_many([_tag_key(tag) for tag in tags])
+    return {tag: stored.get(_tag_key(tag), 0) for tag in tags}
+
+
+def _incr(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Key missing: add() is atomic, so if another worker won the race incr again
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def _bump_tags(tags):
+    for tag in tags:
+        _incr(_tag_key(tag))
+
+
+def purge_tags(*tags):
+    """
+    Invalidate every cached response that depends on any of `tags`. Bumped
+    now and again on commit so a response rendered from the old rows while
+    the write was in flight can't stay cached. Coarse tags also bump their
+    database version (galleryItem.content_versions) for ETags.
+    """
+    tags = set(tags)
+    bump_content_versions(tags)
+    _bump_tags(tags)
+    transaction.on_commit(lambda: _bump_tags(tags))
+
+
+def _count(stat):
+    global _stats_flushed_at
+    with _stats_lock:
+        _pending_stats[stat] += 1
+        due = (
+            _pending_stats.total() >= STATS_FLUSH_EVERY or
+            time.monotonic() - _stats_flushed_at >= STATS_FLUSH_INTERVAL
+        )
+    if due:
+        try:
+            flush_stats()
+        except Exception:
+            # Stats are approximate; a cached response must not fail on them
+            logger.exception('Failed to flush response cache stats')
+
+
+def flush_stats():
+    """Add this process's buffered hit/miss counts to the shared counters"""
+    global _stats_flushed_at
+    with _stats_lock:
+        pending = dict(_pending_stats)
+        _pending_stats.clear()
+        _stats_flushed_at = time.monotonic()
+    for stat, count in pending.items():
+        _incr(STATS_KEYS[stat], count)
+
+
+def get_stats():
+    flush_stats()
+    stored = cache.get_many(list(STATS_KEYS.values()))
+    stats = {name: stored.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / total, 4) if total else 0.0
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _pending_stats.clear()
+    cache.delete_many(list(STATS_KEYS.values()))
+
+
+def store_response(key, response, versions, meta, content):
+    cache.set(key, {
+        'tags': versions,
+        'meta': meta,
+        'content': content,
+        'status': response.status_code,
+        'content_type': response['Content-Type'],
+        'headers': {h: response[h] for h in VALIDATOR_HEADERS if response.has_header(h)},
+    }, get_timeout())
+
+
+def is_cacheable_request(request):
+    """Only anonymous GETs are cached; staff/superusers see extra fields"""
+    if request.method != 'GET' or not is_enabled():
+        return False
+    if request.META.get('HTTP_AUTHORIZATION'):
+        return False
+    user = getattr(request, 'user', None)
+    return not (user is not None and user.is_authenticated)
+
+
+class ResponseCacheMixin:
+    """
+    Cache anonymous GET responses of a DRF view.
+
+    Views define get_cache_tags(request, response) returning the tags the
+    response depends on, and may override cache_hit(request, meta) to run
+    side effects (e.g. view counting) for responses served from cache.
+    """
+
+    def get_cache_tags(self, request, response):
+        return []
+
+    def get_cache_meta(self, request, response):
+        return None
+
+    def cache_hit(self, request, meta):
+        pass
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = make_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None and get_tag_versions(entry['tags']) == entry['tags']:
+            _count('hits')
+            self.cache_hit(request, entry['meta'])
+            headers = entry['headers']
+            not_modified = get_conditional_response(
+                request,
+                etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(headers['Last-Modified']) if 'Last-Modified' in headers else None,
+            )
+            response = not_modified or HttpResponse(
+                entry['content'], status=entry['status'], content_type=entry['content_type']
+            )
+            for header, value in headers.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _count('misses')
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and response.streaming:
+            try:
+                self.cache_streaming_response(key, response)
+            except Exception:
+                logger.exception('Could not cache response for %s', request.path)
+        elif response.status_code == 200 and hasattr(response, 'data'):
+            try:
+                # self.request is the DRF Request built by dispatch()
+                tags = self.get_cache_tags(self.request, response)
+                meta = self.get_cache_meta(self.request, response)
+                # Read tag versions before rendering so a purge during rendering wins
+                versions = get_tag_versions(tags)
+                response.render()
+                store_response(key, response, versions, meta, response.content)
+            except Exception:
+                logger.exception('Could not cache response for %s', request.path)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def cache_streaming_response(self, key, response):
+        """Pass the chunks through and store the body once the stream is exhausted (if it stayed small)"""
+        tags = self.get_cache_tags(self.request, response)
+        meta = self.get_cache_meta(self.request, response)
+        versions = get_tag_versions(tags)
+        chunks = response.streaming_content
+        limit = get_max_stream_bytes()
+
+        def stream():
+            body, size = [], 0
+            for chunk in chunks:
+                if body is not None:
+                    size += len(chunk)
+                    if size > limit:
+                        body = None  # too big to cache: stop keeping chunks
+                    else:
+                        body.append(chunk)
+                yield chunk
+            if body is None:
+                return
+            try:
+                store_response(key, response, versions, meta, b''.join(body))
+            except Exception:
+                logger.exception('Could not cache streamed response for %s', self.request.path)
+
+        response.streaming_content = stream()
@@ -0,0 +1,134 @@
+"""
+Bulk loader for imported reviews.
+
+The JSON product import (command and admin upload) queues reviews here
+instead of creating them one by one. Queued reviews are written with
+bulk_create; reviews already stored for the product with the same
+import_author, date_added and content are skipped, so re-importing a file
+doesn't duplicate them. Reviews whose date can't be parsed are stored with
+the import time and matched on import_author and content only.
+
+The importer calls flush_if_full() between products, outside their
+savepoints, so rolling back one product never takes other products'
+reviews with it.
+
+bulk_create sends no signals, so flush() does what the Review receivers
+would: rating aggregates, response-cache purges and schema markup refreshes,
+once per product instead of once per review.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import datetime
+
+from django.utils import timezone
+
+from .models import Review
+from .ratings import apply_rating_changes, clamp_rating
+from .response_cache import purge_tags
+from .schema_markup import refresh_schema_markup_safely
+
+REVIEW_DATE_FORMATS = [
+    '%d/%b/%Y',  # 01/Feb/2024
+    '%m/%d/%Y',  # 01/20/2025 (MM/DD/YYYY)
+    '%d/%m/%Y',  # 20/01/2025 (DD/MM/YYYY)
+]
+REVIEW_BATCH_SIZE = 500
+
+
+def content_hash(content):
+    return hashlib.sha1((content or '').encode('utf-8')).hexdigest()
+
+
+class BulkReviewLoader:
+    """
+    Queue imported reviews with add() and write them with flush().
+
+    Dates are parsed with the first format that matches a date of the file;
+    other formats are only tried when that one fails.
+    """
+
+    def __init__(self, batch_size=REVIEW_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.date_format = None
+        self.pending = []
+        self.created = 0
+        self.duplicates = 0
+
+    def parse_date(self, value):
+        """Timezone-aware datetime for a review date string, or None when unparsable"""
+        formats = REVIEW_DATE_FORMATS
+        if self.date_format:
+            formats = [self.date_format] + [fmt for fmt in formats if fmt != self.date_format]
+        for fmt in formats:
+            try:
+                parsed_date = datetime.strptime(value, fmt)
+            except (ValueError, TypeError):
+                continue
+            if self.date_format is None:
+                self.date_format = fmt
+            return timezone.make_aware(parsed_date, timezone.get_current_timezone())
+        return None
+
+    def add(self, product_id, reviews_data):
+        """Queue the reviews of one product (JSON dicts, both field name styles); returns how many"""
+        reviews = []
+        for review_data in reviews_data:
+            date_added = self.parse_date(review_data.get('date_reviewed') or review_data.get('date', ''))
+            review = Review(
+                product_id=product_id,
+                content=review_data.get('message') or review_data.get('review', ''),
+                rating=clamp_rating(review_data.get('star_rating') or review_data.get('rating', 5)),
+                import_author=review_data.get('reviewer') or review_data.get('author', 'Anonymous'),
+                is_imported=True,
+                date_added=date_added or timezone.now(),
+            )
+            # An unparsed date is left out of the key: now() would never match a re-import
+            reviews.append((self._review_key(product_id, review.import_author, date_added, review.content), review))
+        # Only queue complete products, so a bad review can't leave part of one behind
+        self.pending.extend(reviews)
+        return len(reviews_data)
+
+    def flush_if_full(self):
+        """Flush once a batch is queued; call between products, never inside one's savepoint"""
+        if len(self.pending) >= self.batch_size:
+            return self.flush()
+        return 0
+
+    def _review_key(self, product_id, import_author, date_added, content):
+        return product_id, import_author, date_added, content_hash(content)
+
+    def flush(self):
+        """Insert the queued reviews that aren't stored yet; returns the number created"""
+        pending = self.pending
+        if not pending:
+            return 0
+
+        product_ids = {review.product_id for _, review in pending}
+        seen = set()
+        for product_id, import_author, date_added, content in (
+            Review.objects.filter(product_id__in=product_ids, is_imported=True)
+            .values_list('product_id', 'import_author', 'date_added', 'content').iterator()
+        ):
+            seen.add(self._review_key(product_id, import_author, date_added, content))
+            seen.add(self._review_key(product_id, import_author, None, content))
+        reviews = []
+        for key, review in pending:
+            if key not in seen:
+                seen.add(key)
+                seen.add(key[:2] + (None,) + key[3:])
+                reviews.append(review)
+
+        Review.objects.bulk_create(reviews, batch_size=self.batch_size)
+        self.pending = []
+        self.duplicates += len(pending) - len(reviews)
+
+        ratings = defaultdict(list)
+        for review in reviews:
+            ratings[review.product_id].append(review.rating)
+        for product_id, added in ratings.items():
+            apply_rating_changes(product_id, added=added)
+            purge_tags('reviews', f'reviews:{product_id}', f'product:{product_id}', 'products')
+            refresh_schema_markup_safely(product_id)
+
+        self.created += len(reviews)
+        return len(reviews)
@@ -0,0 +1,152 @@
+"""
+Precomputed Schema.org Product JSON-LD.
+
+The JSON-LD document for every variant is generated when its product or
+one of its reviews changes, and for a single variant when that variant is
+saved (see galleryItem.signals), and stored on Variant.schema_markup. Site-dependent
+URL prefixes are stored as a placeholder and filled in at render time, so
+serving the markup is a string replace with no queries.
+
+Rebuild everything with: python manage.py rebuild_schema_markup
+Reads never generate markup, so after deploying this (or restoring data that
+predates the field) run `python manage.py rebuild_schema_markup --missing`
+once after migrate; it only fills variants that have no markup yet.
+"""
+import json
+import logging
+
+from django.db import transaction
+from django.urls import NoReverseMatch, reverse
+
+from .models import GalleryItem, Review, Variant
+
+logger = logging.getLogger(__name__)
+
+SITE_URL_PLACEHOLDER = '__SITE_URL__'
+MAX_REVIEWS = 10
+
+
+def _site_url(url):
+    """Prefix site-relative URLs with the placeholder; absolute (e.g. CDN) URLs are kept"""
+    if url and url.startswith('/'):
+        return f'{SITE_URL_PLACEHOLDER}{url}'
+    return url
+
+
+def _product_path(product):
+    try:
+        return product.get_absolute_url()
+    except NoReverseMatch:
+        # No storefront route in this project; point at the product API instead
+        return reverse('galleryItem:galleryitem-by-slug', kwargs={'slug': product.slug})
+
+
+def build_schema_markup(product, variant, reviews):
+    """
+    Build the JSON-LD template for one product variant.
+    `reviews` are the product's latest reviews (authors selected).
+    """
+    product_url = _site_url(_product_path(product))
+    image_url = _site_url(variant.image.url) if variant and variant.image else None
+
+    schema = {
+        "@context": "https://schema.org/",
+        "@type": "Product",
+        "name": product.title,
+        "description": product.description if product.description else product.metaKeyDescription,
+        "image": image_url,
+        "url": product_url,
+        "sku": str(variant.id) if variant else str(product.id),
+        "brand": {
+            "@type": "Brand",
+            "name": "Your Store Name"  # TODO: Update with actual store name
+        },
+        "offers": {
+            "@type": "Offer",
+            "url": product_url,
+            "priceCurrency": "USD",
+            "price": str(variant.price) if variant else "0.00",
+            "availability": "https://schema.org/InStock" if (variant and variant.in_stock) else "https://schema.org/OutOfStock",
+            "priceValidUntil": "2025-12-31",  # TODO: Update with actual price validity
+            "seller": {
+                "@type": "Organization",
+                "name": "Your Store Name"  # TODO: Update with actual store name
+            }
+        }
+    }
+
+    # Ratings come from the denormalized aggregates
+    if product.rating_count > 0:
+        schema["aggregateRating"] = {
+            "@type": "AggregateRating",
+            "ratingValue": str(round(product.rating_sum / product.rating_count, 2)),
+            "reviewCount": str(product.rating_count),
+            "bestRating": "5",
+            "worstRating": "1"
+        }
+
+    if product.category:
+        schema["category"] = product.category.title
+
+    if reviews:
+        schema["review"] = []
+        for review in reviews:
+            review_data = {
+                "@type": "Review",
+                "reviewRating": {
+                    "@type": "Rating",
+                    "ratingValue": str(review.rating),
+                    "bestRating": "5",
+                    "worstRating": "1"
+                },
+                "author": {
+                    "@type": "Person",
+                    "name": str(review.get_author() or '') if not review.keep_anonymous else "Anonymous"
+                },
+                "datePublished": review.date_added.strftime("%Y-%m-%d") if review.date_added else ""
+            }
+            if review.content:
+                review_data["reviewBody"] = review.content
+            schema["review"].append(review_data)
+
+    return json.dumps(schema, ensure_ascii=False)
+
+
+def refresh_schema_markup(product_id, variant_ids=None):
+    """Regenerate and store the JSON-LD of a product's variants (all, or only `variant_ids`)"""
+    product = GalleryItem.objects.select_related('category').filter(pk=product_id).first()
+    if product is None:
+        return 0
+    variants = Variant.objects.filter(product_id=product_id)
+    if variant_ids is not None:
+        variants = variants.filter(pk__in=variant_ids)
+    variants = list(variants)
+    if not variants:
+        return 0
+    reviews = list(
+        Review.objects.filter(product_id=product_id).select_related('author')[:MAX_REVIEWS]
+    )
+    for variant in variants:
+        variant.schema_markup = build_schema_markup(product, variant, reviews)
+    # bulk_update sends no signals, so this can't re-trigger itself
+    Variant.objects.bulk_update(variants, ['schema_markup'])
+    return len(variants)
+
+
+def refresh_schema_markup_safely(product_id, variant_ids=None):
+    """
+    Signal-side refresh: a markup failure must never break the save that
+    triggered it. The savepoint keeps a failed query from leaving the
+    caller's transaction unusable.
+    """
+    try:
+        with transaction.atomic():
+            refresh_schema_markup(product_id, variant_ids)
+    except Exception:
+        logger.exception('Could not refresh schema markup for product %s', product_id)
+
+
+def render_schema_markup(template, request=None):
+    """Fill in the site URL (absolute when a request is given, like build_absolute_uri)"""
+    base_url = request.build_absolute_uri('/')[:-1] if request else ''
+    return template.replace(SITE_URL_PLACEHOLDER, base_url)
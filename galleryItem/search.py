@@ -0,0 +1,245 @@
+"""
+Full-text product search.
+
+Replaces the `LIKE '%term%'` scans done by DRF's SearchFilter with a real
+inverted index:
+
+- SQLite: an FTS5 external-content table kept in sync by triggers
+- PostgreSQL: a generated, weighted `tsvector` column with a GIN index
+
+Both stay in sync for GalleryItem.save(), bulk_create() and queryset updates
+because the database maintains them. Results are ranked by relevance
+(title > keywords > description).
+
+Backend is chosen with settings.GALLERY_SEARCH_BACKEND:
+    'auto' (default) - full-text index when the database supports it
+    'fts'            - same as auto
+    'icontains'      - original SearchFilter behaviour
+Rebuild with: python manage.py rebuild_search_index
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import GalleryItem
+
+SEARCH_RANK = 'search_rank'
+
+
+def tokenize_query(term):
+    """Split a user search string into safe word tokens"""
+    return re.findall(r'\w+', term or '', re.UNICODE)[:20]
+
+
+class SQLiteSearchBackend:
+    """FTS5 external-content index over title, description and metaKeyWords"""
+    vendor = 'sqlite'
+    index_table = 'galleryItem_search'
+    columns = ('title', 'description', 'metaKeyWords')
+    # bm25 weights per column, same order as `columns`
+    weights = (10.0, 1.0, 5.0)
+
+    def __init__(self):
+        self.content_table = GalleryItem._meta.db_table
+
+    def _q(self, name):
+        return connection.ops.quote_name(name)
+
+    def is_installed(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s)",
+                [self.index_table, f'{self.index_table}_au']
+            )
+            return cursor.fetchone()[0] == 2
+
+    def install(self, cursor=None):
+        """Create the FTS table and sync triggers (idempotent)"""
+        idx, content = self._q(self.index_table), self._q(self.content_table)
+        cols = ', '.join(self._q(c) for c in self.columns)
+        new_values = ', '.join(f'new.{self._q(c)}' for c in self.columns)
+        old_values = ', '.join(f'old.{self._q(c)}' for c in self.columns)
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {idx} USING fts5({cols}, "
+            f"content={content}, content_rowid='id', tokenize='porter unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER IF NOT EXISTS {self._q(self.index_table + '_ai')} AFTER INSERT ON {content} BEGIN "
+            f"INSERT INTO {idx}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {self._q(self.index_table + '_ad')} AFTER DELETE ON {content} BEGIN "
+            f"INSERT INTO {idx}({idx}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {self._q(self.index_table + '_au')} AFTER UPDATE OF {cols} ON {content} BEGIN "
+            f"INSERT INTO {idx}({idx}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {idx}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+            f"INSERT INTO {idx}({idx}, rank) VALUES ('rank', 'bm25({', '.join(str(w) for w in self.weights)})')",
+        ]
+        if cursor is None:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        else:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def uninstall(self, cursor):
+        for suffix in ('_ai', '_ad', '_au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {self._q(self.index_table + suffix)}")
+        cursor.execute(f"DROP TABLE IF EXISTS {self._q(self.index_table)}")
+
+    def rebuild(self):
+        """Re-create triggers if missing and rebuild the index from the product table"""
+        self.install()
+        idx = self._q(self.index_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {idx}({idx}) VALUES ('rebuild')")
+        return GalleryItem.objects.count()
+
+    def build_match(self, tokens):
+        # Quote every token; the last one is a prefix so search-as-you-type works
+        quoted = [f'"{t}"' for t in tokens]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, queryset, tokens):
+        match = self.build_match(tokens)
+        idx, content = self._q(self.index_table), self._q(self.content_table)
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {idx} WHERE {idx} MATCH %s", (match,))
+        ).annotate(**{
+            # FTS5 rank is bm25 (lower is better); negate so higher is better
+            SEARCH_RANK: RawSQL(
+                f"SELECT -rank FROM {idx} WHERE {idx} MATCH %s AND rowid = {content}.{self._q('id')}",
+                (match,), output_field=FloatField()
+            )
+        })
+
+
+class PostgresSearchBackend:
+    """Generated tsvector column with a GIN index"""
+    vendor = 'postgresql'
+    column = 'search_vector'
+    index_name = 'galleryitem_search_vector_gin'
+    config = 'english'
+
+    def __init__(self):
+        self.content_table = GalleryItem._meta.db_table
+
+    def _q(self, name):
+        return connection.ops.quote_name(name)
+
+    def is_installed(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+                [self.content_table, self.column]
+            )
+            return cursor.fetchone()[0] == 1
+
+    def install(self, cursor=None):
+        content = self._q(self.content_table)
+        vector = (
+            f"setweight(to_tsvector('{self.config}', coalesce({self._q('title')}, '')), 'A') || "
+            f"setweight(to_tsvector('{self.config}', coalesce({self._q('metaKeyWords')}, '')), 'B') || "
+            f"setweight(to_tsvector('{self.config}', coalesce({self._q('description')}, '')), 'C')"
+        )
+        statements = [
+            f"ALTER TABLE {content} ADD COLUMN IF NOT EXISTS {self._q(self.column)} tsvector "
+            f"GENERATED ALWAYS AS ({vector}) STORED",
+            f"CREATE INDEX IF NOT EXISTS {self._q(self.index_name)} ON {content} USING GIN ({self._q(self.column)})",
+        ]
+        if cursor is None:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        else:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def uninstall(self, cursor):
+        cursor.execute(f"DROP INDEX IF EXISTS {self._q(self.index_name)}")
+        cursor.execute(f"ALTER TABLE {self._q(self.content_table)} DROP COLUMN IF EXISTS {self._q(self.column)}")
+
+    def rebuild(self):
+        """The generated column is always current; just make sure it exists and reindex"""
+        self.install()
+        with connection.cursor() as cursor:
+            cursor.execute(f"REINDEX INDEX {self._q(self.index_name)}")
+        return GalleryItem.objects.count()
+
+    def search(self, queryset, tokens):
+        tsquery = ' & '.join(tokens[:-1] + [f'{tokens[-1]}:*'])
+        column = f"{self._q(self.content_table)}.{self._q(self.column)}"
+        return queryset.filter(
+            RawSQL(f"{column} @@ to_tsquery(%s, %s)", (self.config, tsquery), output_field=BooleanField())
+        ).annotate(**{
+            SEARCH_RANK: RawSQL(
+                f"ts_rank_cd({column}, to_tsquery(%s, %s))",
+                (self.config, tsquery), output_field=FloatField()
+            )
+        })
+
+
+BACKENDS = {
+    SQLiteSearchBackend.vendor: SQLiteSearchBackend,
+    PostgresSearchBackend.vendor: PostgresSearchBackend,
+}
+
+_installed_cache = {}
+
+
+def get_backend_for_connection():
+    """Full-text backend for the current database vendor, or None if unsupported"""
+    backend_class = BACKENDS.get(connection.vendor)
+    return backend_class() if backend_class else None
+
+
+def get_search_backend():
+    """
+    Return the configured full-text backend, or None to fall back to icontains.
+    Whether the index is installed is checked once per process.
+    """
+    choice = getattr(settings, 'GALLERY_SEARCH_BACKEND', 'auto')
+    if choice == 'icontains':
+        return None
+    backend = get_backend_for_connection()
+    if backend is None:
+        return None
+    key = (connection.alias, connection.vendor)
+    if key not in _installed_cache:
+        try:
+            _installed_cache[key] = backend.is_installed()
+        except Exception:
+            _installed_cache[key] = False
+    return backend if _installed_cache[key] else None
+
+
+def reset_search_backend_cache():
+    _installed_cache.clear()
+
+
+class GalleryItemSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that uses the full-text index for the `search` param and
+    falls back to the original icontains lookups when no index is available.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        tokens = tokenize_query(request.query_params.get(self.search_param, ''))
+        if not tokens:
+            return queryset
+        backend = get_search_backend()
+        if backend is None:
+            return super().filter_queryset(request, queryset, view)
+        return backend.search(queryset, tokens)
+
+
+class GalleryItemOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter that keeps relevance order for searches without an explicit `ordering`"""
+
+    def filter_queryset(self, request, queryset, view):
+        if SEARCH_RANK in queryset.query.annotations and not request.query_params.get(self.ordering_param):
+            default = self.get_default_ordering(view) or []
+            return queryset.order_by(f'-{SEARCH_RANK}', *default)
+        return super().filter_queryset(request, queryset, view)
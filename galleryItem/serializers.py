@@ -1,13 +1,18 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import (
-    GalleryItem, Variant, Category, Review, WishedItem,
+    GalleryItem, Variant, Category, Review, WishedItem, Ranking,
     VariantImage, VariantVideo, VariantYoutubeVideo, SpecialPrice,
     Supply, VariantSupply, Supplier
 )
+from .fieldsets import SparseFieldsetSerializerMixin
+from .image_derivatives import get_srcset
+from .media_urls import get_media_url_builder
 
 User = get_user_model()
 
+RELATED_PRODUCTS_LIMIT = 4
+
 
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model"""
@@ -26,11 +31,16 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class VariantImageSerializer(serializers.ModelSerializer):
     """Serializer for VariantImage model"""
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = VariantImage
-        fields = ('id', 'name', 'image', 'featured', 'thumbnail', 'active')
+        fields = ('id', 'name', 'image', 'image_srcset', 'featured', 'thumbnail', 'active')
         read_only_fields = ('id',)
+    
+    def get_image_srcset(self, obj):
+        """Responsive derivative URLs by format and width (None until generated)"""
+        return get_srcset(obj, 'image', self.context.get('request'))
 
 
 class VariantVideoSerializer(serializers.ModelSerializer):
@@ -81,13 +91,7 @@ class SupplySerializer(serializers.ModelSerializer):
     
     def get_image(self, obj):
         """Return absolute URL for image"""
-        if obj.image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.image.url)
-            from django.conf import settings
-            return f"{settings.SITE_URL}{obj.image.url}" if hasattr(settings, 'SITE_URL') else obj.image.url
-        return None
+        return get_media_url_builder(self.context.get('request')).file_url(obj.image)
 
 
 class VariantSupplySerializer(serializers.ModelSerializer):
@@ -113,7 +117,7 @@ class VariantSupplySerializer(serializers.ModelSerializer):
         return float(obj.get_supply_required_cost_to_manufacturer())
 
 
-class VariantSerializer(serializers.ModelSerializer):
+class VariantSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Variant model"""
     images = VariantImageSerializer(source='variantimage_set', many=True, read_only=True)
     videos = VariantVideoSerializer(source='variantvideo_set', many=True, read_only=True)
@@ -121,38 +125,34 @@ class VariantSerializer(serializers.ModelSerializer):
     in_stock = serializers.ReadOnlyField()
     image = serializers.SerializerMethodField()
     largeImage = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    largeImage_srcset = serializers.SerializerMethodField()
     supplies = serializers.SerializerMethodField()
     
     class Meta:
         model = Variant
         fields = (
-            'id', 'product', 'image', 'largeImage', 'title', 'price', 
+            'id', 'product', 'image', 'largeImage', 'image_srcset', 'largeImage_srcset', 'title', 'price', 
             'quantity', 'volume', 'weight', 'is_best_seller', 'active',
             'in_stock', 'images', 'videos', 'youtube_videos', 'supplies', 'updated'
         )
         read_only_fields = ('id', 'updated')
     
     def get_image(self, obj):
-        """Return absolute URL for image"""
-        if obj.image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.image.url)
-            # Fallback: use settings if no request context
-            from django.conf import settings
-            return f"{settings.SITE_URL}{obj.image.url}" if hasattr(settings, 'SITE_URL') else obj.image.url
-        return None
+        """Return absolute URL for image (SITE_URL-based without a request)"""
+        return get_media_url_builder(self.context.get('request')).file_url(obj.image)
     
     def get_largeImage(self, obj):
-        """Return absolute URL for largeImage"""
-        if obj.largeImage:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.largeImage.url)
-            # Fallback: use settings if no request context
-            from django.conf import settings
-            return f"{settings.SITE_URL}{obj.largeImage.url}" if hasattr(settings, 'SITE_URL') else obj.largeImage.url
-        return None
+        """Return absolute URL for largeImage (SITE_URL-based without a request)"""
+        return get_media_url_builder(self.context.get('request')).file_url(obj.largeImage)
+    
+    def get_image_srcset(self, obj):
+        """Responsive derivative URLs of image by format and width (None until generated)"""
+        return get_srcset(obj, 'image', self.context.get('request'))
+    
+    def get_largeImage_srcset(self, obj):
+        """Responsive derivative URLs of largeImage by format and width (None until generated)"""
+        return get_srcset(obj, 'largeImage', self.context.get('request'))
     
     def get_supplies(self, obj):
         """
@@ -173,11 +173,27 @@ class VariantSerializer(serializers.ModelSerializer):
         if not request.user.is_superuser:
             return []
         
-        # Get supplies for THIS specific variant (each variant has different supplies)
-        variant_supplies = obj.variantsupply_set.select_related('supply', 'supply__supplier').all()
+        # Get supplies for THIS specific variant (each variant has different supplies);
+        # use the views' prefetch when present instead of one query per variant
+        if 'variantsupply_set' in getattr(obj, '_prefetched_objects_cache', {}):
+            variant_supplies = obj.variantsupply_set.all()
+        else:
+            variant_supplies = obj.variantsupply_set.select_related('supply', 'supply__supplier').all()
         return VariantSupplySerializer(variant_supplies, many=True, context=self.context).data
 
 
+class VariantChangeSerializer(serializers.ModelSerializer):
+    """Price/stock rows of the catalog change feed"""
+    in_stock = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = Variant
+        fields = (
+            'id', 'product', 'title', 'price', 'quantity', 'in_stock', 'is_best_seller', 'active', 'updated'
+        )
+        read_only_fields = fields
+
+
 class VariantCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating Variant (without nested objects)"""
     
@@ -190,7 +206,7 @@ class VariantCreateUpdateSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Review model"""
     author_name = serializers.SerializerMethodField()
     author_id = serializers.SerializerMethodField()
@@ -235,7 +251,7 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class GalleryItemListSerializer(serializers.ModelSerializer):
+class GalleryItemListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for listing GalleryItems (lightweight)"""
     category_title = serializers.CharField(source='category.title', read_only=True)
     default_variant_price = serializers.DecimalField(
@@ -245,6 +261,7 @@ class GalleryItemListSerializer(serializers.ModelSerializer):
         read_only=True
     )
     default_variant_image = serializers.SerializerMethodField()
+    default_variant_image_srcset = serializers.SerializerMethodField()
     default_variant_quantity = serializers.IntegerField(
         source='default_variant.quantity',
         read_only=True
@@ -257,41 +274,38 @@ class GalleryItemListSerializer(serializers.ModelSerializer):
     review_count = serializers.SerializerMethodField()
     
     def get_default_variant_image(self, obj):
-        """Return absolute URL for default variant image"""
-        if obj.default_variant and obj.default_variant.image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.default_variant.image.url)
-            # Fallback: use settings if no request context
-            from django.conf import settings
-            return f"{settings.SITE_URL}{obj.default_variant.image.url}" if hasattr(settings, 'SITE_URL') else obj.default_variant.image.url
+        """Return absolute URL for default variant image (SITE_URL-based without a request)"""
+        if obj.default_variant:
+            return get_media_url_builder(self.context.get('request')).file_url(obj.default_variant.image)
+        return None
+    
+    def get_default_variant_image_srcset(self, obj):
+        """Thumbnail-sized derivatives of the default variant image for catalog grids"""
+        if obj.default_variant:
+            return get_srcset(obj.default_variant, 'image', self.context.get('request'))
         return None
     
     class Meta:
         model = GalleryItem
         fields = (
             'id', 'title', 'slug', 'description', 'category', 'category_title',
-            'default_variant_price', 'default_variant_image', 'default_variant_quantity',
+            'default_variant_price', 'default_variant_image', 'default_variant_image_srcset',
+            'default_variant_quantity',
             'default_variant_in_stock', 'active',
             'total_views', 'average_rating', 'review_count', 'timeStamp', 'updated'
         )
         read_only_fields = ('id', 'slug', 'timeStamp', 'updated')
     
     def get_average_rating(self, obj):
-        """Calculate average rating from reviews"""
-        reviews = obj.reviews.all()
-        if reviews.exists():
-            from django.db.models import Avg
-            avg = reviews.aggregate(Avg('rating'))['rating__avg']
-            return round(avg, 2) if avg else 0
-        return 0
+        """Average rating from the denormalized aggregates (no Review query)"""
+        return obj.average_rating
     
     def get_review_count(self, obj):
-        """Get total review count"""
-        return obj.reviews.count()
+        """Review count from the denormalized aggregates (no Review query)"""
+        return obj.rating_count
 
 
-class GalleryItemDetailSerializer(serializers.ModelSerializer):
+class GalleryItemDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for GalleryItem detail view (with all related data)"""
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
@@ -305,8 +319,10 @@ class GalleryItemDetailSerializer(serializers.ModelSerializer):
     reviews = ReviewSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
     review_count = serializers.SerializerMethodField()
+    rating_histogram = serializers.ReadOnlyField()
     admin_info = serializers.SerializerMethodField()
     related_products = serializers.SerializerMethodField()
+    schema_markup = serializers.SerializerMethodField()
     
     class Meta:
         model = GalleryItem
@@ -315,22 +331,23 @@ class GalleryItemDetailSerializer(serializers.ModelSerializer):
             'default_variant', 'variants', 'active', 'timeStamp', 'updated',
             'total_views', 'metaKeyWords', 'metaKeyDescription',
             'google_product_category', 'reviews', 'average_rating', 'review_count',
-            'admin_info', 'related_products'
+            'rating_histogram', 'admin_info', 'related_products', 'schema_markup'
         )
         read_only_fields = ('id', 'slug', 'timeStamp', 'updated', 'total_views')
     
     def get_average_rating(self, obj):
-        """Calculate average rating from reviews"""
-        reviews = obj.reviews.all()
-        if reviews.exists():
-            from django.db.models import Avg
-            avg = reviews.aggregate(Avg('rating'))['rating__avg']
-            return round(avg, 2) if avg else 0
-        return 0
+        """Average rating from the denormalized aggregates (no Review query)"""
+        return obj.average_rating
     
     def get_review_count(self, obj):
-        """Get total review count"""
-        return obj.reviews.count()
+        """Review count from the denormalized aggregates (no Review query)"""
+        return obj.rating_count
+    
+    def get_schema_markup(self, obj):
+        """Precomputed Schema.org JSON-LD of the default variant (no extra queries)"""
+        if obj.default_variant is None:
+            return None
+        return obj.get_schema_markup(obj.default_variant, self.context.get('request'))
     
     def get_admin_info(self, obj):
         """
@@ -399,28 +416,45 @@ class GalleryItemDetailSerializer(serializers.ModelSerializer):
     
     def get_related_products(self, obj):
         """
-        Get related products from the same category.
-        Excludes current product and limits to 4 products.
+        Get related products from the precomputed neighbour table (prefetched
+        by the detail views as `neighbours`), limited to 4 products.
+        Falls back to same-category products until compute_related_products has run.
         Only returns products that have a default_variant (to avoid errors).
         """
-        # Get products from the same category, excluding current product
-        # Filter only products that have a default_variant
-        related = GalleryItem.objects.filter(
-            category=obj.category,
-            active=True,
-            default_variant__isnull=False  # Only products with default_variant
-        ).exclude(
-            id=obj.id
-        ).select_related(
-            'default_variant', 'category'
-        ).prefetch_related(
-            'reviews'
-        )[:4]  # Limit to 4 related products only
+        neighbours = [
+            neighbour.related for neighbour in obj.neighbours.all()
+            if neighbour.related.active and neighbour.related.default_variant_id
+        ]
+        if neighbours:
+            related = neighbours[:RELATED_PRODUCTS_LIMIT]
+        else:
+            # Get products from the same category, excluding current product
+            # Filter only products that have a default_variant
+            related = GalleryItem.objects.filter(
+                category=obj.category,
+                active=True,
+                default_variant__isnull=False  # Only products with default_variant
+            ).exclude(
+                id=obj.id
+            ).select_related(
+                'default_variant', 'category'
+            )[:RELATED_PRODUCTS_LIMIT]
         
         # Use GalleryItemListSerializer for consistent format
         return GalleryItemListSerializer(related, many=True, context=self.context).data
 
 
+class RankingSerializer(serializers.ModelSerializer):
+    """Serializer for materialized product rankings"""
+    product = GalleryItemListSerializer(read_only=True)
+    criteria_display = serializers.CharField(source='get_criteria_display', read_only=True)
+    
+    class Meta:
+        model = Ranking
+        fields = ('rank', 'criteria', 'criteria_display', 'value', 'date_added', 'product')
+        read_only_fields = fields
+
+
 class GalleryItemCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating GalleryItem"""
     
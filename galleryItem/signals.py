@@ -0,0 +1,236 @@
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+from .categories import invalidate_category_index, invalidate_category_tree
+from .change_feed import record_deletion, touch_product
+from .image_derivatives import needs_derivatives, schedule_derivatives
+from .models import (
+    CatalogTombstone, Category, GalleryItem, Review, SpecialPrice, Supply, Variant, VariantImage, VariantSupply,
+    VariantVideo, VariantYoutubeVideo,
+)
+from .ratings import apply_rating_changes
+from .response_cache import purge_tags
+from .schema_markup import refresh_schema_markup_safely
+from .search import get_backend_for_connection, reset_search_backend_cache
+from .storage import release_deleted_files, release_replaced_files, remember_stored_files
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    """
+    Remember the stored rating/product before an edit so post_save can
+    move the review between rating buckets (or products).
+    """
+    instance._previous_rating = None
+    if instance.pk and not instance._state.adding:
+        previous = Review.objects.filter(pk=instance.pk).values('product_id', 'rating').first()
+        if previous:
+            instance._previous_rating = (previous['product_id'], previous['rating'])
+
+
+@receiver(post_save, sender=Review)
+def update_rating_aggregates_on_save(sender, instance, created, raw=False, **kwargs):
+    """Keep GalleryItem rating aggregates in sync when a review is created or edited"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        # New review (or one we never saw stored before)
+        apply_rating_changes(instance.product_id, added=[instance.rating])
+        return
+
+    previous_product_id, previous_rating = previous
+    if previous_product_id == instance.product_id:
+        if previous_rating != instance.rating:
+            apply_rating_changes(instance.product_id, added=[instance.rating], removed=[previous_rating])
+    else:
+        apply_rating_changes(previous_product_id, removed=[previous_rating])
+        apply_rating_changes(instance.product_id, added=[instance.rating])
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_aggregates_on_delete(sender, instance, **kwargs):
+    """Remove a deleted review from its product's rating aggregates"""
+    apply_rating_changes(instance.product_id, removed=[instance.rating])
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, using='default', **kwargs):
+    """
+    Re-create the full-text index triggers after migrate. SQLite table
+    rebuilds (AlterField etc.) silently drop triggers on GalleryItem.
+    """
+    if sender.name != 'galleryItem' or using != 'default':
+        return
+    backend = get_backend_for_connection()
+    if backend is None or backend.is_installed():
+        return
+    backend.rebuild()
+    reset_search_backend_cache()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    """Any category add/edit/move/delete invalidates the cached category tree"""
+    invalidate_category_index()
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=GalleryItem)
+@receiver(post_delete, sender=GalleryItem)
+def product_changed_category_counts(sender, **kwargs):
+    """Product adds/moves/(de)activations change the per-category product counts"""
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=GalleryItem)
+@receiver(post_delete, sender=GalleryItem)
+def purge_product_responses(sender, instance, **kwargs):
+    """Drop cached product pages and listings that show this product"""
+    purge_tags(f'product:{instance.pk}', 'products')
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+def purge_variant_responses(sender, instance, **kwargs):
+    """Variant price/stock changes show up on variant, product and listing responses"""
+    purge_tags(f'variant:{instance.pk}', 'variants', f'product:{instance.product_id}', 'products')
+
+
+@receiver(post_save, sender=VariantImage)
+@receiver(post_delete, sender=VariantImage)
+@receiver(post_save, sender=VariantVideo)
+@receiver(post_delete, sender=VariantVideo)
+@receiver(post_save, sender=VariantYoutubeVideo)
+@receiver(post_delete, sender=VariantYoutubeVideo)
+@receiver(post_save, sender=VariantSupply)
+@receiver(post_delete, sender=VariantSupply)
+def purge_variant_media_responses(sender, instance, **kwargs):
+    """Images, videos and supplies are embedded in variant, product and listing responses"""
+    tags = [f'variant:{instance.variant_id}', 'variants', 'products']
+    product_id = Variant.objects.filter(pk=instance.variant_id).values_list('product_id', flat=True).first()
+    if product_id:
+        tags.append(f'product:{product_id}')
+    purge_tags(*tags)
+
+
+@receiver(post_save, sender=Supply)
+def purge_supply_responses(sender, instance, **kwargs):
+    """A supply is embedded in every variant using it (deletes cascade through VariantSupply)"""
+    tags = ['variants', 'products']
+    for variant_id, product_id in VariantSupply.objects.filter(supply=instance).values_list('variant_id', 'variant__product_id'):
+        tags += [f'variant:{variant_id}', f'product:{product_id}']
+    purge_tags(*tags)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def purge_review_responses(sender, instance, **kwargs):
+    """Reviews feed the review lists, product pages and listing ratings"""
+    tags = [f'review:{instance.pk}', 'reviews', f'reviews:{instance.product_id}',
+            f'product:{instance.product_id}', 'products']
+    previous = getattr(instance, '_previous_rating', None)
+    if previous and previous[0] != instance.product_id:
+        tags += [f'reviews:{previous[0]}', f'product:{previous[0]}']
+    purge_tags(*tags)
+
+
+@receiver(post_save, sender=SpecialPrice)
+@receiver(post_delete, sender=SpecialPrice)
+def purge_special_price_responses(sender, instance, **kwargs):
+    """Special prices change what product pages and listings show"""
+    purge_tags(f'product:{instance.product_id}', 'products')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_category_responses(sender, instance, **kwargs):
+    """Category edits change category details, nested children and product pages"""
+    purge_tags(f'category:{instance.pk}', 'categories')
+
+
+@receiver(post_save, sender=GalleryItem)
+def refresh_product_schema_markup(sender, instance, raw=False, **kwargs):
+    """Regenerate the stored JSON-LD of the product's variants"""
+    if not raw:
+        refresh_schema_markup_safely(instance.pk)
+
+
+@receiver(post_save, sender=Variant)
+def refresh_variant_schema_markup(sender, instance, raw=False, **kwargs):
+    """Price/stock/image changes show up in the variant's offer markup (siblings are unaffected)"""
+    if not raw:
+        refresh_schema_markup_safely(instance.product_id, [instance.pk])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_review_schema_markup(sender, instance, raw=False, **kwargs):
+    """Reviews feed aggregateRating and the embedded review list (runs after the rating update)"""
+    if raw:
+        return
+    refresh_schema_markup_safely(instance.product_id)
+    previous = getattr(instance, '_previous_rating', None)
+    if previous and previous[0] != instance.product_id:
+        refresh_schema_markup_safely(previous[0])
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_schema_markup(sender, instance, raw=False, **kwargs):
+    """The category title is part of every product's markup"""
+    if raw or kwargs.get('created'):
+        return
+    for product_id in GalleryItem.objects.filter(category=instance).values_list('id', flat=True):
+        refresh_schema_markup_safely(product_id)
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_save, sender=VariantImage)
+def queue_image_derivatives(sender, instance, raw=False, **kwargs):
+    """New or replaced uploads get their responsive derivatives off the request path"""
+    if not raw and needs_derivatives(instance):
+        schedule_derivatives(instance)
+
+
+@receiver(pre_save, sender=Variant)
+@receiver(pre_save, sender=VariantImage)
+def remember_image_files(sender, instance, raw=False, **kwargs):
+    """Note the stored image names so replaced content-addressed files can be released"""
+    if not raw:
+        remember_stored_files(instance)
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_save, sender=VariantImage)
+def release_replaced_image_files(sender, instance, raw=False, **kwargs):
+    """Drop the references of images replaced by this save"""
+    if not raw:
+        release_replaced_files(instance)
+
+
+@receiver(post_delete, sender=Variant)
+@receiver(post_delete, sender=VariantImage)
+def release_deleted_image_files(sender, instance, **kwargs):
+    """Drop the references of a deleted row's images"""
+    release_deleted_files(instance)
+
+
+@receiver(post_delete, sender=GalleryItem)
+def record_product_tombstone(sender, instance, **kwargs):
+    """Deleted products are reported by the catalog change feed"""
+    record_deletion(CatalogTombstone.PRODUCT, instance.pk, instance.pk)
+
+
+@receiver(post_delete, sender=Variant)
+def record_variant_tombstone(sender, instance, **kwargs):
+    """Deleted variants are reported by the catalog change feed"""
+    record_deletion(CatalogTombstone.VARIANT, instance.pk, instance.product_id)
+
+
+@receiver(post_save, sender=SpecialPrice)
+@receiver(post_delete, sender=SpecialPrice)
+def touch_special_price_product(sender, instance, raw=False, **kwargs):
+    """Special prices have no timestamp of their own: move the product forward in the change feed"""
+    if not raw:
+        touch_product(instance.product_id)
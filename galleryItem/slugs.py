@@ -0,0 +1,93 @@
+"""
+Unique slug allocation without a query per candidate.
+
+Existing slugs sharing a title's prefix are fetched with one query and the
+first free `<slug>`, `<slug>-1`, `<slug>-2`, ... is picked in memory (the same
+sequence the old exists() loop produced). Importers allocate for many titles
+at once with SlugAllocator.preload() / allocate_slugs(), which load every
+needed prefix in one query and remember the slugs they hand out.
+
+Used by GalleryItem.save and blog.BlogPost.save.
+"""
+from django.db.models import Q
+from django.utils.text import slugify
+
+# Room kept for a "-<n>" suffix when a slug has to be cut to the field's max_length
+SUFFIX_RESERVE = 8
+# Above this many prefixes one query for all slugs beats a long OR of LIKEs
+PRELOAD_ALL_THRESHOLD = 100
+
+
+class SlugAllocator:
+    """Hands out unique slugs for one model field, remembering what it has seen and allocated"""
+
+    def __init__(self, model, field='slug', exclude_pk=None):
+        self.model = model
+        self.field = field
+        self.exclude_pk = exclude_pk
+        self.max_length = model._meta.get_field(field).max_length
+        self.taken = set()
+        self.loaded_stems = set()
+        self.loaded_all = False
+        # Next suffix to try per base slug, so repeated titles don't rescan from -1
+        self.next_counter = {}
+
+    def base_slug(self, title):
+        return slugify(title or '')[:self.max_length] or self.model._meta.model_name
+
+    def stem(self, base):
+        """Prefix shared by the base slug and all its suffixed variants"""
+        if len(base) > self.max_length - SUFFIX_RESERVE:
+            return base[:self.max_length - SUFFIX_RESERVE]
+        return base
+
+    def _queryset(self):
+        queryset = self.model._default_manager.all()
+        if self.exclude_pk is not None:
+            queryset = queryset.exclude(pk=self.exclude_pk)
+        return queryset
+
+    def preload(self, titles):
+        """Load the existing slugs for all titles' prefixes with one query"""
+        if self.loaded_all:
+            return
+        stems = {self.stem(self.base_slug(title)) for title in titles} - self.loaded_stems
+        if not stems:
+            return
+        queryset = self._queryset()
+        if len(stems) > PRELOAD_ALL_THRESHOLD:
+            self.loaded_all = True
+        else:
+            condition = Q()
+            for stem in stems:
+                condition |= Q(**{f'{self.field}__startswith': stem})
+            queryset = queryset.filter(condition)
+        self.taken.update(slug for slug in queryset.values_list(self.field, flat=True) if slug)
+        self.loaded_stems |= stems
+
+    def allocate(self, title):
+        """Next free slug for a title; it counts as taken from now on"""
+        base = self.base_slug(title)
+        self.preload([title])
+        slug = base
+        counter = self.next_counter.get(base, 1)
+        while slug in self.taken:
+            suffix = f'-{counter}'
+            slug = f'{base[:self.max_length - len(suffix)]}{suffix}'
+            counter += 1
+        self.next_counter[base] = counter
+        self.taken.add(slug)
+        return slug
+
+
+def allocate_slug(model, title, field='slug', exclude_pk=None):
+    """Unique slug for one new row (one query)"""
+    return SlugAllocator(model, field=field, exclude_pk=exclude_pk).allocate(title)
+
+
+def allocate_slugs(model, titles, field='slug'):
+    """Unique slugs for many titles at once, also unique among themselves (one query)"""
+    titles = list(titles)
+    allocator = SlugAllocator(model, field=field)
+    allocator.preload(titles)
+    return [allocator.allocate(title) for title in titles]
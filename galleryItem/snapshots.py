@@ -0,0 +1,296 @@
+"""
+Static JSON snapshots of the catalog for the frontend's ISR builds.
+
+    python manage.py build_catalog_snapshot
+
+writes, under GALLERY_SNAPSHOT_ROOT/v<FORMAT>/:
+
+    catalog/index.json             the anonymous /api/gallery/items/ list
+    catalog/products/<slug>.json   /api/gallery/items/slug/<slug>/ per active product
+    catalog/categories.json        the /api/gallery/categories/ tree
+    blog/index.json                the /api/blog/posts/ list
+    manifest.json                  build version plus sha256/version of every document
+
+Every document has precompressed `.gz` (and `.br`, when the brotli package is
+installed) siblings, so the web server can serve the directory on its own, e.g.
+nginx with `gzip_static on; brotli_static on;` and `default_type application/json`.
+Files are replaced atomically; compressed copies are written before the plain
+one.
+
+A signature of the rows each document is built from (products, variants,
+media, reviews, related products, categories, blog posts) is kept in the
+manifest; documents whose signature did not change are not rendered again, and
+rendered documents whose bytes did not change are not rewritten. Documents of
+products that were deleted, deactivated or renamed are removed. Edits that
+touch no timestamp and no row count (e.g. a review's text) are only picked up
+by `--force`.
+
+Settings:
+    GALLERY_SNAPSHOT_ROOT       output directory (default BASE_DIR/snapshots)
+    GALLERY_SNAPSHOT_BASE_URL   scheme://host media URLs are built for; the host
+                                must be in ALLOWED_HOSTS
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count, Max
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from blog.api_views import BlogPostListView
+from blog.models import BlogPost
+from blog.serializers import BlogPostListSerializer
+from wildwud.renderers import FastJSONRenderer
+
+from .categories import get_category_tree_json
+from .fast_serializers import GalleryItemListProjection
+from .models import Category, GalleryItem, RelatedProduct, Review, Variant, VariantImage, VariantVideo, VariantYoutubeVideo
+from .related_products import neighbours_prefetch
+from .serializers import GalleryItemDetailSerializer
+from .views import GalleryItemBySlugView, GalleryItemListView
+
+try:
+    import brotli
+except ImportError:  # optional, only .gz copies are written without it
+    brotli = None
+
+FORMAT = 1
+MANIFEST = 'manifest.json'
+INDEX = 'catalog/index.json'
+CATEGORIES = 'catalog/categories.json'
+BLOG_INDEX = 'blog/index.json'
+PRODUCT_PATH = 'catalog/products/{slug}.json'
+RENDER_CHUNK_SIZE = 200
+
+# GALLERY_ITEM_DETAIL_PREFETCHES without supplies (superuser-only, never in a snapshot)
+DETAIL_PREFETCHES = (
+    'variant_set__variantimage_set',
+    'variant_set__variantvideo_set',
+    'variant_set__variantyoutubevideo_set',
+    'reviews',
+)
+
+PRODUCT_SOURCE_FIELDS = (
+    'id', 'slug', 'title', 'description', 'category_id', 'default_variant_id', 'google_product_category_id',
+    'timeStamp', 'updated', 'total_views', 'rating_sum', 'rating_count', 'metaKeyWords', 'metaKeyDescription',
+)
+
+
+def get_snapshot_root():
+    return Path(getattr(settings, 'GALLERY_SNAPSHOT_ROOT', Path(settings.BASE_DIR) / 'snapshots'))
+
+
+def get_snapshot_base_url():
+    return getattr(settings, 'GALLERY_SNAPSHOT_BASE_URL', 'http://localhost:8000')
+
+
+def snapshot_request(base_url):
+    """An anonymous GET request on `base_url`, so URLs match what the API serves there"""
+    parts = urlsplit(base_url)
+    request = APIRequestFactory().get('/', HTTP_HOST=parts.netloc, secure=parts.scheme == 'https')
+    request.user = AnonymousUser()
+    return request
+
+
+def digest(value):
+    return hashlib.sha256(repr(value).encode('utf-8')).hexdigest()
+
+
+def _grouped(queryset, key, timestamp):
+    """{key: (row count, latest timestamp)}: additions, deletions and edits all move one of them"""
+    rows = queryset.values(key).order_by().annotate(n=Count('id'), last=Max(timestamp))
+    return {row[key]: (row['n'], row['last']) for row in rows}
+
+
+def catalog_signatures():
+    """
+    Signatures of the catalog documents from a handful of grouped queries:
+    {'products': {product id: (slug, signature)}, 'index': ..., 'categories': ...}
+    """
+    products = {row[0]: row for row in GalleryItem.objects.filter(active=True).values_list(*PRODUCT_SOURCE_FIELDS)}
+    sources = (
+        _grouped(Variant.objects.all(), 'product_id', 'updated'),
+        _grouped(VariantImage.objects.all(), 'variant__product_id', 'updated'),
+        _grouped(VariantVideo.objects.all(), 'variant__product_id', 'updated'),
+        _grouped(VariantYoutubeVideo.objects.all(), 'variant__product_id', 'updated'),
+        _grouped(Review.objects.all(), 'product_id', 'date_added'),
+    )
+    own = {pk: digest((row, [source.get(pk) for source in sources])) for pk, row in products.items()}
+    # Every detail document embeds its category with the whole subtree
+    categories = digest(list(Category.objects.order_by('id').values_list('id', 'title', 'description', 'image', 'parent_id')))
+
+    neighbours = defaultdict(list)
+    for product_id, related_id in RelatedProduct.objects.order_by('product_id', 'rank').values_list('product_id', 'related_id'):
+        neighbours[product_id].append(related_id)
+    # Without neighbours the serializer falls back to products of the same category
+    by_category = defaultdict(list)
+    for pk, row in products.items():
+        by_category[row[4]].append(own[pk])
+    category_members = {category_id: digest(sorted(members)) for category_id, members in by_category.items()}
+
+    signatures = {}
+    for pk, row in products.items():
+        related = [own.get(related_id) for related_id in neighbours.get(pk, ())] or category_members[row[4]]
+        signatures[pk] = (row[1], digest((own[pk], categories, related)))
+    return {
+        'products': signatures,
+        'index': digest((sorted(own.items()), categories)),
+        'categories': digest((categories, sorted((pk, row[4]) for pk, row in products.items()))),
+    }
+
+
+def blog_signature():
+    posts = list(BlogPost.objects.filter(is_published=True).order_by('id').values_list(
+        'id', 'updated_date', 'author__first_name', 'author__last_name'
+    ))
+    tags = list(BlogPost.tags.through.objects.filter(
+        object_id__in=[post[0] for post in posts]
+    ).order_by('object_id', 'tag__name').values_list('object_id', 'tag__name'))
+    return digest((posts, tags))
+
+
+def compress(content):
+    """{suffix: bytes} of the precompressed copies"""
+    copies = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        copies['.br'] = brotli.compress(content, quality=11)
+    return copies
+
+
+def write_atomic(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp, 0o644)  # readable by the web server
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class CatalogSnapshot:
+    """Incremental build of the snapshot directory"""
+
+    def __init__(self, root=None, base_url=None, force=False):
+        self.base_url = (base_url or get_snapshot_base_url()).rstrip('/')
+        self.directory = (Path(root) if root else get_snapshot_root()) / f'v{FORMAT}'
+        self.force = force
+        self.request = snapshot_request(self.base_url)
+        self.request.get_host()  # DisallowedHost now rather than halfway through the build
+        self.renderer = FastJSONRenderer()
+        self.stats = {'written': 0, 'unchanged': 0, 'skipped': 0, 'removed': 0}
+
+    def read_manifest(self):
+        try:
+            manifest = json.loads((self.directory / MANIFEST).read_text())
+        except (OSError, ValueError):
+            return None
+        if manifest.get('format') != FORMAT or manifest.get('base_url') != self.base_url:
+            return None  # different layout or host: rebuild everything
+        return manifest
+
+    def build(self):
+        """Bring the snapshot up to date; returns the stats"""
+        manifest = self.read_manifest() or {'version': 0, 'documents': {}}
+        previous = manifest['documents']
+        version = manifest['version'] + 1
+
+        catalog = catalog_signatures()
+        renderers = {
+            INDEX: (catalog['index'], self.render_index),
+            CATEGORIES: (catalog['categories'], lambda: get_category_tree_json(self.request)),
+            BLOG_INDEX: (blog_signature(), self.render_blog_index),
+        }
+        products = {}
+        for pk, (slug, signature) in catalog['products'].items():
+            products[PRODUCT_PATH.format(slug=slug)] = (pk, signature)
+
+        documents = {}
+        for path, (signature, render) in renderers.items():
+            documents[path] = self.refresh(path, signature, previous.get(path), render, version)
+        stale = {
+            path: signature for path, (pk, signature) in products.items()
+            if not self.is_current(path, signature, previous.get(path))
+        }
+        for path, (pk, signature) in products.items():
+            if path not in stale:
+                documents[path] = previous[path]
+                self.stats['skipped'] += 1
+        for path, content in self.render_products({products[path][0]: path for path in stale}):
+            documents[path] = self.store(path, stale[path], previous.get(path), content, version)
+            documents[path]['product'] = products[path][0]
+
+        for path in previous.keys() - documents.keys():
+            self.remove(path)
+
+        changed = self.stats['written'] or self.stats['removed']
+        write_atomic(self.directory / MANIFEST, json.dumps({
+            'format': FORMAT,
+            'version': version if changed else manifest['version'],
+            'generated': timezone.now().isoformat(),
+            'base_url': self.base_url,
+            'documents': documents,
+        }, indent=1, sort_keys=True).encode('utf-8'))
+        return self.stats
+
+    def is_current(self, path, signature, entry):
+        return (
+            not self.force and entry is not None and entry['signature'] == signature
+            and (self.directory / path).exists()
+        )
+
+    def refresh(self, path, signature, entry, render, version):
+        if self.is_current(path, signature, entry):
+            self.stats['skipped'] += 1
+            return entry
+        return self.store(path, signature, entry, render(), version)
+
+    def store(self, path, signature, entry, content, version):
+        """Write `content` unless the same bytes are already on disk; returns the manifest entry"""
+        sha256 = hashlib.sha256(content).hexdigest()
+        target = self.directory / path
+        if entry is not None and entry['sha256'] == sha256 and target.exists():
+            self.stats['unchanged'] += 1
+            return dict(entry, signature=signature)
+
+        copies = compress(content)
+        for suffix, data in copies.items():
+            write_atomic(target.with_name(target.name + suffix), data)
+        if '.br' not in copies:
+            target.with_name(target.name + '.br').unlink(missing_ok=True)
+        write_atomic(target, content)
+        self.stats['written'] += 1
+        return {'signature': signature, 'sha256': sha256, 'version': version, 'bytes': len(content)}
+
+    def remove(self, path):
+        target = self.directory / path
+        for suffix in ('.br', '.gz', ''):
+            target.with_name(target.name + suffix).unlink(missing_ok=True)
+        self.stats['removed'] += 1
+
+    def render_index(self):
+        queryset = GalleryItemListView.queryset.all()
+        return self.renderer.render(GalleryItemListProjection(self.request).data(queryset))
+
+    def render_blog_index(self):
+        queryset = BlogPostListView(request=self.request, kwargs={}).get_queryset()
+        return self.renderer.render(BlogPostListSerializer(queryset, many=True, context={'request': self.request}).data)
+
+    def render_products(self, paths):
+        """Yield (path, content) of the detail documents of {product id: path}"""
+        queryset = GalleryItemBySlugView.queryset.prefetch_related(*DETAIL_PREFETCHES, neighbours_prefetch())
+        ids = sorted(paths)
+        for start in range(0, len(ids), RENDER_CHUNK_SIZE):
+            for item in queryset.filter(pk__in=ids[start:start + RENDER_CHUNK_SIZE]):
+                data = GalleryItemDetailSerializer(item, context={'request': self.request}).data
+                yield paths[item.pk], self.renderer.render(data)
@@ -0,0 +1,197 @@
+"""
+Content-addressed storage for product images.
+
+Uploads are stored once per distinct content as
+
+    cas/<h[0:2]>/<h[2:4]>/<sha256><ext>
+
+so the importer's identical image/largeImage copies and re-imported images
+share one file. Content-addressed names are written in place (atomically
+replaced, never suffixed by get_available_name), so regenerating derivatives
+named after a blob keeps their names. MediaBlob counts the references:
+saving a file adds one,
+delete() removes one and only deletes the file (and the responsive
+derivatives named after it) when none are left. The model signals in
+galleryItem.signals release the files of deleted rows and replaced images.
+Names that aren't content-addressed (legacy products/images/... uploads,
+which rows copied between each other) have no reference count and are never
+deleted through this storage.
+
+Names never change for a given content, so everything under MEDIA_URL/cas/
+can be served with far-future, immutable cache headers (see
+galleryItem.views.serve_immutable_media for development; configure the same
+header for the media mapping of the production web server).
+
+Settings:
+    GALLERY_CONTENT_ADDRESSED_MEDIA  store product images content-addressed (default True)
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import F
+
+CAS_PREFIX = 'cas'
+# Files named after a blob, e.g. the responsive derivatives <sha256>_400w.webp
+DERIVED_NAME_RE = re.compile(rf'^{CAS_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})_')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def file_digest(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(digest, extension):
+    return f'{CAS_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(f'{CAS_PREFIX}/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names uploads by their SHA-256 and reference-counts them"""
+
+    def get_available_name(self, name, max_length=None):
+        # A content-addressed name always means the same file: overwrite, never suffix
+        if is_content_addressed(name):
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        if is_content_addressed(name):
+            # Already a content-addressed name (derived files): store as given
+            return self._replace(name, content)
+
+        from .models import MediaBlob
+
+        name = blob_name(file_digest(content), os.path.splitext(name)[1])
+        with transaction.atomic():
+            blob, _ = MediaBlob.objects.get_or_create(name=name, defaults={'size': content.size})
+            MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+        if not self.exists(name):
+            self._replace(name, content)
+        return name
+
+    def _replace(self, name, content):
+        """Write `content` to a temporary file and move it over `name` (readers never see a partial file)"""
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            os.chmod(tmp, self.file_permissions_mode if self.file_permissions_mode is not None else 0o644)
+            os.replace(tmp, full_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return name
+
+    def save_derived(self, name, content):
+        """
+        Store a file derived from a stored one (e.g. a responsive derivative)
+        under exactly `name`, replacing any previous version: no hashing and
+        no reference of its own, also next to legacy names.
+        """
+        return self._replace(name, content)
+
+    def delete(self, name):
+        """Drop one reference; the file goes when the last one does"""
+        if not is_content_addressed(name):
+            # Legacy name: other rows may still point at it and nothing counts them
+            return
+
+        from .models import MediaBlob
+
+        derived = DERIVED_NAME_RE.match(name)
+        if derived:
+            # Derived files are shared by every row using the blob
+            if MediaBlob.objects.filter(name__startswith=name[:derived.end() - 1], refcount__gt=0).exists():
+                return
+            return super().delete(name)
+
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') - 1)
+        deleted, _ = MediaBlob.objects.filter(name=name, refcount__lte=0).delete()
+        if deleted:
+            super().delete(name)
+            self.delete_derived(name)
+
+    def delete_derived(self, name):
+        directory, filename = os.path.split(name)
+        prefix = f'{os.path.splitext(filename)[0]}_'
+        try:
+            _, files = self.listdir(directory)
+        except FileNotFoundError:
+            return
+        for derived_name in files:
+            if derived_name.startswith(prefix):
+                super().delete(f'{directory}/{derived_name}')
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def select_product_image_storage():
+    """Storage of the product image fields (a callable keeps the setting out of migrations)"""
+    if getattr(settings, 'GALLERY_CONTENT_ADDRESSED_MEDIA', True):
+        return content_addressed_storage
+    return default_storage
+
+
+def release_file(storage, name):
+    """Release a stored file's reference; plain storages and legacy names keep their files as before"""
+    if is_content_addressed(name) and isinstance(storage, ContentAddressedStorage):
+        storage.delete(name)
+
+
+IMAGE_FIELDS = {
+    'Variant': ('image', 'largeImage'),
+    'VariantImage': ('image',),
+}
+
+
+def remember_stored_files(instance):
+    """
+    Before a save: note the stored file names, and which fields have an
+    upload pending (it adds a reference even when the content is unchanged).
+    """
+    field_names = IMAGE_FIELDS[type(instance).__name__]
+    stored = {}
+    if instance.pk and not instance._state.adding:
+        stored = type(instance).objects.filter(pk=instance.pk).values(*field_names).first() or {}
+    instance._stored_files = {
+        field_name: (stored.get(field_name), not getattr(getattr(instance, field_name), '_committed', True))
+        for field_name in field_names
+    }
+
+
+def release_replaced_files(instance):
+    """After a save: release the files the row no longer (or now doubly) references"""
+    for field_name, (old_name, uploading) in getattr(instance, '_stored_files', {}).items():
+        field_file = getattr(instance, field_name)
+        if old_name and (old_name != field_file.name or uploading):
+            storage = field_file.storage
+            transaction.on_commit(lambda storage=storage, name=old_name: release_file(storage, name))
+    instance._stored_files = {}
+
+
+def release_deleted_files(instance):
+    for field_name in IMAGE_FIELDS[type(instance).__name__]:
+        field_file = getattr(instance, field_name)
+        if field_file:
+            storage, name = field_file.storage, field_file.name
+            transaction.on_commit(lambda storage=storage, name=name: release_file(storage, name))
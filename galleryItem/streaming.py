@@ -0,0 +1,85 @@
+"""
+Streaming JSON responses for the large unpaginated list endpoints.
+
+The queryset is read with .iterator() in chunks; each chunk is serialized
+and rendered on its own and written out as a fragment of one JSON array.
+The first byte leaves as soon as the first chunk is rendered and memory
+stays bounded by the chunk size instead of the catalog size. The body is
+byte-identical to the buffered JSON response.
+
+Streaming is opt-in so existing clients (and the browsable API) keep the
+buffered response:
+
+    GET /api/gallery/items/?stream=true
+
+Settings:
+    GALLERY_STREAM_LIST_RESPONSES   stream JSON lists by default (default False);
+                                    `?stream=false` still opts out per request
+"""
+import itertools
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+STREAM_QUERY_PARAM = 'stream'
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def iter_json_array(items, render_chunk, chunk_size):
+    """Yield b'[' + comma-joined rendered chunks + b']'"""
+    yield b'['
+    items = iter(items)
+    first = True
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            break
+        # Rendering a list gives b'[...]': keep only the elements
+        body = render_chunk(chunk)[1:-1]
+        if not first:
+            yield b','
+        yield body
+        first = False
+    yield b']'
+
+
+class StreamingListMixin:
+    """
+    Let a generic list view answer with a StreamingHttpResponse.
+
+        if self.should_stream(request):
+            return self.stream_list(queryset)
+    """
+    stream_chunk_size = 500
+
+    def should_stream(self, request):
+        value = request.query_params.get(STREAM_QUERY_PARAM)
+        if value is None:
+            enabled = getattr(settings, 'GALLERY_STREAM_LIST_RESPONSES', False)
+        else:
+            enabled = value.lower() in TRUE_VALUES
+        # Only the JSON renderer can be streamed; the browsable API stays buffered
+        return enabled and getattr(getattr(request, 'accepted_renderer', None), 'format', None) == 'json'
+
+    def get_stream_renderer(self):
+        # The negotiated JSON renderer (see should_stream), so bytes match the buffered response
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return renderer if getattr(renderer, 'format', None) == 'json' else JSONRenderer()
+
+    def stream_list(self, queryset):
+        """Stream model rows through the view's serializer, one chunk at a time"""
+        renderer = self.get_stream_renderer()
+
+        def render_chunk(chunk):
+            return renderer.render(self.get_serializer(chunk, many=True).data)
+
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        content = iter_json_array(rows, render_chunk, self.stream_chunk_size)
+        return StreamingHttpResponse(content, content_type=renderer.media_type)
+
+    def stream_rows(self, rows):
+        """Stream already-serialized rows (e.g. from galleryItem.fast_serializers)"""
+        renderer = self.get_stream_renderer()
+        content = iter_json_array(rows, renderer.render, self.stream_chunk_size)
+        return StreamingHttpResponse(content, content_type=renderer.media_type)
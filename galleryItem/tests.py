@@ -1,14 +1,43 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import GalleryItem, Variant, Category, Review, WishedItem
+from .models import (
+    GalleryItem, Variant, Category, Ranking, Review, RelatedProduct, SpecialPrice, Supplier, Supply, VariantSupply,
+    VariantYoutubeVideo, WishedItem,
+)
+from .cache_backends import is_shared_cache
+from .categories import get_category_index
+from .related_products import compute_related_products, store_related_products
+from .response_cache import STATS_KEYS, get_stats, reset_stats
+from .snapshots import CatalogSnapshot
+from .view_counter import CacheViewCounter, LocalViewCounter, flush_view_counts, get_view_counter
 
 User = get_user_model()
 
 
+def catalog_queries(ctx):
+    """Captured queries without the database cache's own (settings.CACHES), savepoints included"""
+    table = settings.CACHES['default'].get('LOCATION', '')
+    return [
+        query for query in ctx.captured_queries
+        if f'"{table}"' not in query['sql'] and 'SAVEPOINT' not in query['sql']
+    ]
+
+
 class CategoryTestCase(TestCase):
     """Test cases for Category API"""
 
@@ -109,9 +138,14 @@ class GalleryItemTestCase(TestCase):
 
     def test_gallery_item_detail_increments_views(self):
         """Test that viewing a gallery item increments view count"""
+        # Views are buffered per process; start from an empty buffer
+        flush_view_counts()
+        self.gallery_item.refresh_from_db()
         initial_views = self.gallery_item.total_views
         url = f'{self.item_list_url}{self.gallery_item.id}/'
         response = self.client.get(url)
+        # Views are buffered; flush them before reading the stored count
+        flush_view_counts()
         self.gallery_item.refresh_from_db()
         self.assertEqual(self.gallery_item.total_views, initial_views + 1)
 
@@ -507,3 +541,1894 @@ class WishedItemTestCase(TestCase):
         self.assertIn('results', response.data)
         self.assertEqual(len(response.data['results']), 1)
         self.assertEqual(response.data['results'][0]['user'], self.user.username)
+
+
+class GalleryItemCursorPaginationTestCase(TestCase):
+    """Test cases for opt-in cursor pagination on the gallery item list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.item_list_url = '/api/gallery/items/'
+        self.category = Category.objects.create(title='Test Category')
+        for i in range(5):
+            GalleryItem.objects.create(
+                category=self.category,
+                title=f'Product {i}',
+                metaKeyWords='test',
+                metaKeyDescription='test',
+                active=True
+            )
+
+    def test_unpaginated_by_default(self):
+        """Test that the list stays a plain array without pagination params"""
+        response = self.client.get(self.item_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_walks_all_pages_without_duplicates(self):
+        """Test following next links returns every item exactly once"""
+        seen = []
+        url = f'{self.item_list_url}?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_previous_link_returns_prior_page(self):
+        """Test that the previous link points back to the same items"""
+        first = self.client.get(f'{self.item_list_url}?page_size=2&ordering=title')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in back.data['results']],
+            [item['id'] for item in first.data['results']]
+        )
+
+    def test_invalid_cursor(self):
+        """Test that a garbage cursor returns 404"""
+        response = self.client.get(f'{self.item_list_url}?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RatingAggregateTestCase(TestCase):
+    """Test cases for denormalized rating aggregates on GalleryItem"""
+
+    def setUp(self):
+        self.category = Category.objects.create(title='Test Category')
+        self.gallery_item = GalleryItem.objects.create(
+            category=self.category,
+            title='Test Product',
+            metaKeyWords='test',
+            metaKeyDescription='test',
+            active=True
+        )
+        self.other_item = GalleryItem.objects.create(
+            category=self.category,
+            title='Other Product',
+            metaKeyWords='test',
+            metaKeyDescription='test',
+            active=True
+        )
+
+    def _review(self, rating, product=None):
+        from django.utils import timezone
+        return Review.objects.create(
+            product=product or self.gallery_item,
+            rating=rating,
+            date_added=timezone.now(),
+            is_imported=True,
+            import_author='Importer'
+        )
+
+    def test_create_updates_aggregates(self):
+        """Test that creating reviews updates sum, count and histogram"""
+        self._review(5)
+        self._review(4)
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.rating_count, 2)
+        self.assertEqual(self.gallery_item.rating_sum, 9)
+        self.assertEqual(self.gallery_item.average_rating, 4.5)
+        self.assertEqual(self.gallery_item.rating_histogram[5], 1)
+        self.assertEqual(self.gallery_item.rating_histogram[4], 1)
+
+    def test_edit_and_delete_update_aggregates(self):
+        """Test that editing a rating or moving/deleting a review adjusts aggregates"""
+        review = self._review(2)
+        review.rating = 5
+        review.save()
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.rating_sum, 5)
+        self.assertEqual(self.gallery_item.rating_histogram[2], 0)
+
+        review.product = self.other_item
+        review.save()
+        self.gallery_item.refresh_from_db()
+        self.other_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.rating_count, 0)
+        self.assertEqual(self.other_item.rating_count, 1)
+
+        review.delete()
+        self.other_item.refresh_from_db()
+        self.assertEqual(self.other_item.rating_count, 0)
+        self.assertEqual(self.other_item.rating_sum, 0)
+
+    def test_stale_product_save_keeps_aggregates(self):
+        """Test that saving a stale product instance does not overwrite aggregates"""
+        stale = GalleryItem.objects.get(pk=self.gallery_item.pk)
+        self._review(3)
+        stale.title = 'Renamed Product'
+        stale.save()
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.title, 'Renamed Product')
+        self.assertEqual(self.gallery_item.rating_count, 1)
+
+    def test_rebuild_command(self):
+        """Test that the rebuild command recomputes aggregates from reviews"""
+        self._review(1)
+        self._review(3)
+        GalleryItem.objects.filter(pk=self.gallery_item.pk).update(rating_sum=0, rating_count=0, rating_1_count=0)
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.rating_count, 2)
+        self.assertEqual(self.gallery_item.rating_sum, 4)
+        self.assertEqual(self.gallery_item.rating_histogram[1], 1)
+
+    def test_out_of_range_ratings_are_clamped(self):
+        """Test that ratings outside 1-5 are counted as 1 or 5 instead of failing the save"""
+        self._review(9)
+        self._review(0)
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.rating_sum, 6)
+        self.assertEqual((self.gallery_item.rating_histogram[5], self.gallery_item.rating_histogram[1]), (1, 1))
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.rating_sum, 6)
+        self.assertEqual((self.gallery_item.rating_histogram[5], self.gallery_item.rating_histogram[1]), (1, 1))
+
+    def test_deleting_reviews_with_drifted_counters(self):
+        """Test that reviews the counters never saw (bulk_create) can still be deleted"""
+        from django.utils import timezone
+        Review.objects.bulk_create([
+            Review(product=self.gallery_item, rating=4, date_added=timezone.now()) for _ in range(2)
+        ])
+        Review.objects.all().delete()
+        self.gallery_item.refresh_from_db()
+        self.assertEqual((self.gallery_item.rating_sum, self.gallery_item.rating_count), (0, 0))
+        self.assertEqual(self.gallery_item.rating_histogram[4], 0)
+        self.gallery_item.delete()
+
+    def test_list_reads_aggregates_without_review_queries(self):
+        """Test that the product list does not query the Review table"""
+        self._review(5)
+        with CaptureQueriesContext(connection) as ctx:
+            response = APIClient().get('/api/gallery/items/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('galleryitem_review' in q['sql'] for q in ctx.captured_queries))
+        item = next(i for i in response.data if i['id'] == self.gallery_item.id)
+        self.assertEqual(item['review_count'], 1)
+        self.assertEqual(item['average_rating'], 5)
+
+
+class GalleryItemSearchTestCase(TestCase):
+    """Test cases for full-text product search"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.item_list_url = '/api/gallery/items/'
+        self.category = Category.objects.create(title='Test Category')
+        self.in_description = GalleryItem.objects.create(
+            category=self.category,
+            title='Wooden Bowl',
+            description='A bowl carved next to a walnut sculpture',
+            metaKeyWords='bowl',
+            metaKeyDescription='test'
+        )
+        self.in_title = GalleryItem.objects.create(
+            category=self.category,
+            title='Walnut Sculpture',
+            description='Hand finished',
+            metaKeyWords='sculpture, walnut',
+            metaKeyDescription='test'
+        )
+        GalleryItem.objects.create(
+            category=self.category,
+            title='Oak Table',
+            description='Dining table',
+            metaKeyWords='table',
+            metaKeyDescription='test'
+        )
+
+    def test_search_ranks_title_matches_first(self):
+        """Test that title/keyword matches rank above description matches"""
+        response = self.client.get(f'{self.item_list_url}?search=walnut sculpture')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in response.data],
+            [self.in_title.id, self.in_description.id]
+        )
+
+    def test_search_prefix_and_stemming(self):
+        """Test that partial last words and word stems match"""
+        response = self.client.get(f'{self.item_list_url}?search=carving wal')
+        self.assertEqual([item['id'] for item in response.data], [self.in_description.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test that saves and deletes keep the index in sync"""
+        self.in_title.title = 'Cherry Sculpture'
+        self.in_title.metaKeyWords = 'sculpture'
+        self.in_title.save()
+        response = self.client.get(f'{self.item_list_url}?search=cherry')
+        self.assertEqual([item['id'] for item in response.data], [self.in_title.id])
+
+        self.in_title.delete()
+        response = self.client.get(f'{self.item_list_url}?search=cherry')
+        self.assertEqual(response.data, [])
+
+    def test_explicit_ordering_overrides_relevance(self):
+        """Test that ?ordering still wins over relevance"""
+        response = self.client.get(f'{self.item_list_url}?search=walnut&ordering=title')
+        self.assertEqual(
+            [item['title'] for item in response.data],
+            ['Walnut Sculpture', 'Wooden Bowl']
+        )
+
+    def test_paginated_search_keeps_relevance_order(self):
+        """Test that cursor pages of a search follow the rank, not the newest-first default"""
+        newest = GalleryItem.objects.create(
+            category=self.category, title='Pine Shelf', description='Stained to look like walnut',
+            metaKeyWords='shelf', metaKeyDescription='test'
+        )
+        ranked = [item['id'] for item in self.client.get(f'{self.item_list_url}?search=walnut').data]
+        seen = []
+        url = f'{self.item_list_url}?search=walnut&page_size=1'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, ranked)
+        self.assertEqual(seen[0], self.in_title.id)
+        self.assertIn(newest.id, seen[1:])
+        back = self.client.get(response.data['previous'])
+        self.assertEqual([item['id'] for item in back.data['results']], seen[-2:-1])
+
+    def test_icontains_backend_switch(self):
+        """Test that the icontains backend still works"""
+        with override_settings(GALLERY_SEARCH_BACKEND='icontains'):
+            response = self.client.get(f'{self.item_list_url}?search=dining')
+        self.assertEqual(len(response.data), 1)
+
+    def test_rebuild_command(self):
+        """Test that the rebuild command re-indexes every product"""
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3 products', out.getvalue())
+        response = self.client.get(f'{self.item_list_url}?search=table')
+        self.assertEqual(len(response.data), 1)
+
+
+class ViewCounterTestCase(TestCase):
+    """Test cases for the write-buffered product view counter"""
+
+    def setUp(self):
+        self.client = APIClient()
+        flush_view_counts()  # Drop hits buffered by other tests
+        self.category = Category.objects.create(title='Test Category')
+        self.gallery_item = GalleryItem.objects.create(
+            category=self.category,
+            title='Test Product',
+            metaKeyWords='test',
+            metaKeyDescription='test',
+            active=True
+        )
+
+    def test_slug_views_are_buffered_until_flush(self):
+        """Test that page hits do not write until flushed, then add up exactly"""
+        url = f'/api/gallery/items/slug/{self.gallery_item.slug}/'
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.total_views, 0)
+
+        flush_view_counts()
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.total_views, 3)
+
+    def test_flush_command_requires_shared_counter(self):
+        """Test that the command refuses to run against the per-process buffer"""
+        with self.assertRaises(CommandError):
+            call_command('flush_view_counts', stdout=StringIO())
+
+    def test_failed_flush_does_not_fail_the_view(self):
+        """Test that a database error during an inline flush keeps the hits buffered"""
+        from unittest import mock
+        counter = LocalViewCounter(flush_interval=3600, flush_threshold=1)
+        with mock.patch('galleryItem.view_counter.apply_view_counts', side_effect=RuntimeError('db down')):
+            with self.assertLogs('galleryItem.view_counter', 'ERROR'):
+                counter.record(self.gallery_item.pk)
+        self.assertEqual(counter.pending(self.gallery_item.pk), 1)
+
+    def test_flush_groups_products_with_same_increment(self):
+        """Test that one UPDATE is issued per distinct increment"""
+        other = GalleryItem.objects.create(
+            category=self.category, title='Other', metaKeyWords='t', metaKeyDescription='t'
+        )
+        counter = LocalViewCounter(flush_interval=3600, flush_threshold=1000)
+        for product_id in (self.gallery_item.pk, other.pk):
+            counter.record(product_id)
+            counter.record(product_id)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(counter.flush(), 4)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        other.refresh_from_db()
+        self.assertEqual(other.total_views, 2)
+
+    def test_threshold_triggers_flush(self):
+        """Test that reaching the threshold flushes automatically"""
+        counter = LocalViewCounter(flush_interval=3600, flush_threshold=2)
+        counter.record(self.gallery_item.pk)
+        self.assertEqual(counter.pending(self.gallery_item.pk), 1)
+        counter.record(self.gallery_item.pk)
+        self.assertEqual(counter.pending(self.gallery_item.pk), 0)
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.total_views, 2)
+
+    @override_settings(GALLERY_VIEW_COUNTER_BACKEND='cache', GALLERY_CACHE_SHARED=None)
+    def test_cache_counter_needs_shared_cache(self):
+        """Test that the 'cache' backend falls back to the local buffer on a process-local cache"""
+        from unittest import mock
+        with mock.patch('galleryItem.view_counter._counter', None):
+            with self.assertLogs('galleryItem.view_counter', 'WARNING'):
+                self.assertIsInstance(get_view_counter(), LocalViewCounter)
+
+    def test_cache_counter_keeps_hits_recorded_during_flush(self):
+        """Test that the shared-cache counter decrements instead of deleting"""
+        counter = CacheViewCounter()
+        counter.record(self.gallery_item.pk)
+        counter.record(self.gallery_item.pk)
+        self.assertEqual(counter.flush(), 2)
+        counter.record(self.gallery_item.pk)
+        self.assertEqual(counter.pending(self.gallery_item.pk), 1)
+        self.assertEqual(counter.flush(), 1)
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.total_views, 3)
+
+
+@override_settings(GALLERY_CACHE_SHARED=True)
+class CategoryIndexTestCase(TestCase):
+    """Test cases for the cached category closure used by the category filter"""
+
+    def setUp(self):
+        cache.clear()  # The local-memory test cache isn't rolled back between tests
+        self.client = APIClient()
+        self.item_list_url = '/api/gallery/items/'
+        self.furniture = Category.objects.create(title='Furniture')
+        self.tables = Category.objects.create(title='Tables', parent=self.furniture)
+        self.chairs = Category.objects.create(title='Chairs', parent=self.furniture)
+        self.decor = Category.objects.create(title='Decor')
+        self.items = {}
+        for category in (self.furniture, self.tables, self.chairs, self.decor):
+            self.items[category.title] = GalleryItem.objects.create(
+                category=category,
+                title=f'{category.title} Item',
+                metaKeyWords='test',
+                metaKeyDescription='test'
+            )
+
+    def _titles(self, query):
+        response = self.client.get(f'{self.item_list_url}?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(item['title'] for item in response.data)
+
+    def test_closure(self):
+        """Test descendant and ancestor sets built from the tree"""
+        index = get_category_index()
+        self.assertEqual(index.descendants[self.furniture.id], {self.furniture.id, self.tables.id, self.chairs.id})
+        self.assertEqual(index.ancestors[self.tables.id], {self.furniture.id})
+        self.assertEqual(index.descendants[self.decor.id], {self.decor.id})
+
+    def test_single_category_includes_descendants(self):
+        """Test filtering by a parent returns its whole subtree"""
+        self.assertEqual(
+            self._titles(f'category={self.furniture.id}'),
+            ['Chairs Item', 'Furniture Item', 'Tables Item']
+        )
+
+    def test_parent_child_uses_and_logic(self):
+        """Test parent + child selections intersect"""
+        self.assertEqual(
+            self._titles(f'category={self.furniture.id}&category={self.tables.id}'),
+            ['Tables Item']
+        )
+
+    def test_siblings_use_or_logic(self):
+        """Test unrelated selections are unioned, invalid ids ignored"""
+        self.assertEqual(
+            self._titles(f'category={self.tables.id}&category={self.decor.id}&category=abc&category=99999'),
+            ['Decor Item', 'Tables Item']
+        )
+        self.assertEqual(self._titles('category=99999'), [])
+
+    def test_filter_runs_without_category_queries(self):
+        """Test that a warm index answers the filter with no category queries"""
+        get_category_index()
+        with CaptureQueriesContext(connection) as ctx:
+            self._titles(f'category={self.furniture.id}&category={self.decor.id}')
+        # Only the conditional GET validators (aggregate + content versions) and the product list query itself
+        self.assertEqual(len(catalog_queries(ctx)), 3)
+
+    def test_category_change_invalidates_index(self):
+        """Test that adding a category is visible immediately"""
+        get_category_index()
+        lamps = Category.objects.create(title='Lamps', parent=self.decor)
+        self.assertIn(lamps.id, get_category_index().descendants[self.decor.id])
+
+
+@override_settings(GALLERY_CACHE_SHARED=True)
+class CategoryTreeTestCase(TestCase):
+    """Test cases for the cached single-query category tree endpoint"""
+
+    def setUp(self):
+        cache.clear()  # The local-memory test cache isn't rolled back between tests
+        self.client = APIClient()
+        self.category_list_url = '/api/gallery/categories/'
+        self.furniture = Category.objects.create(title='Furniture')
+        self.tables = Category.objects.create(title='Tables', parent=self.furniture)
+        self.chairs = Category.objects.create(title='Chairs', parent=self.furniture)
+        self.decor = Category.objects.create(title='Decor')
+        for category in (self.furniture, self.tables, self.tables):
+            GalleryItem.objects.create(
+                category=category, title=f'{category.title} Item', metaKeyWords='t', metaKeyDescription='t'
+            )
+        GalleryItem.objects.create(
+            category=self.chairs, title='Hidden Chair', metaKeyWords='t', metaKeyDescription='t', active=False
+        )
+
+    def _tree(self):
+        response = self.client.get(self.category_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_tree_structure_and_counts(self):
+        """Test nesting, ordering and direct/cumulative active product counts"""
+        tree = self._tree()
+        self.assertEqual([node['title'] for node in tree], ['Decor', 'Furniture'])
+        furniture = tree[1]
+        self.assertEqual([node['title'] for node in furniture['children']], ['Chairs', 'Tables'])
+        self.assertEqual(furniture['products_count'], 1)
+        self.assertEqual(furniture['products_cumulative_count'], 3)
+        self.assertEqual(furniture['children'][0]['products_cumulative_count'], 0)
+        self.assertEqual(furniture['children'][1]['parent'], self.furniture.id)
+
+    def test_tree_is_one_query_then_cached(self):
+        """Test the tree costs one query to build and only the ETag version read when cached"""
+        with CaptureQueriesContext(connection) as ctx:
+            self._tree()
+        self.assertEqual(len(catalog_queries(ctx)), 2)
+        with CaptureQueriesContext(connection) as ctx:
+            self._tree()
+        self.assertEqual(len(catalog_queries(ctx)), 1)
+
+    @override_settings(GALLERY_CACHE_SHARED=False)
+    def test_tree_is_not_cached_without_shared_cache(self):
+        """Test that changes made by another process show up when the cache is process-local"""
+        self._tree()
+        Category.objects.filter(pk=self.decor.pk).update(title='Home Decor')  # No signals, like another worker
+        self.assertEqual(self._tree()[0]['title'], 'Home Decor')
+
+    def test_product_and_category_changes_invalidate(self):
+        """Test that product and category changes show up immediately"""
+        self._tree()
+        GalleryItem.objects.create(
+            category=self.decor, title='Vase', metaKeyWords='t', metaKeyDescription='t'
+        )
+        self.assertEqual(self._tree()[0]['products_count'], 1)
+        Category.objects.create(title='Lamps', parent=self.decor)
+        self.assertEqual(self._tree()[0]['children'][0]['title'], 'Lamps')
+
+
+@override_settings(GALLERY_CACHE_SHARED=True)
+class ResponseCacheTestCase(TestCase):
+    """Test cases for the tag-invalidated catalog response cache"""
+
+    def setUp(self):
+        cache.clear()  # The local-memory test cache isn't rolled back between tests
+        # Drop hits buffered by other tests before product ids get reused
+        flush_view_counts()
+        self.client = APIClient()
+        self.item_list_url = '/api/gallery/items/'
+        self.category = Category.objects.create(title='Test Category')
+        self.gallery_item = GalleryItem.objects.create(
+            category=self.category,
+            title='Test Product',
+            metaKeyWords='test',
+            metaKeyDescription='test',
+            active=True
+        )
+        self.variant = Variant.objects.create(
+            product=self.gallery_item, title='Small', price=10.00, quantity=5, volume=1, weight=1
+        )
+        self.slug_url = f'/api/gallery/items/slug/{self.gallery_item.slug}/'
+        reset_stats()
+
+    def test_second_request_is_a_hit_without_queries(self):
+        """Test that repeated anonymous GETs are served from cache"""
+        first = self.client.get(self.item_list_url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(self.item_list_url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(len(catalog_queries(ctx)), 0)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(get_stats()['hits'], 1)
+        self.assertEqual(get_stats()['misses'], 1)
+
+    def test_query_params_are_normalized(self):
+        """Test that param order and empty values share one cache entry"""
+        self.client.get(f'{self.item_list_url}?ordering=title&search=test')
+        response = self.client.get(f'{self.item_list_url}?search=test&category=&ordering=title')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_product_save_purges_list_and_detail(self):
+        """Test that editing a product invalidates its cached responses"""
+        self.client.get(self.item_list_url)
+        self.client.get(self.slug_url)
+        self.gallery_item.title = 'Renamed Product'
+        self.gallery_item.save()
+        response = self.client.get(self.item_list_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data[0]['title'], 'Renamed Product')
+        self.assertEqual(self.client.get(self.slug_url)['X-Cache'], 'MISS')
+
+    def test_related_models_purge_product_tags(self):
+        """Test that variant, review and special price changes purge the product page"""
+        from django.utils import timezone
+        user = User.objects.create_user(username='reviewer', email='reviewer@example.com', password='pass12345')
+        changes = [
+            lambda: Variant.objects.create(
+                product=self.gallery_item, title='Large', price=20.00, quantity=1, volume=1, weight=1
+            ),
+            lambda: Review.objects.create(product=self.gallery_item, author=user, rating=4, date_added=timezone.now()),
+            lambda: SpecialPrice.objects.create(
+                product=self.gallery_item, name='Sale', calculation_type='subtraction', value=2
+            ),
+        ]
+        for change in changes:
+            self.client.get(self.slug_url)
+            self.assertEqual(self.client.get(self.slug_url)['X-Cache'], 'HIT')
+            change()
+            self.assertEqual(self.client.get(self.slug_url)['X-Cache'], 'MISS')
+
+    def test_review_list_is_tagged_per_product(self):
+        """Test that a review only purges its own product's review list"""
+        from django.utils import timezone
+        other = GalleryItem.objects.create(
+            category=self.category, title='Other', metaKeyWords='t', metaKeyDescription='t'
+        )
+        url = f'/api/gallery/reviews/?product={self.gallery_item.id}'
+        other_url = f'/api/gallery/reviews/?product={other.id}'
+        self.client.get(url)
+        self.client.get(other_url)
+        Review.objects.create(product=self.gallery_item, rating=5, date_added=timezone.now())
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(other_url)['X-Cache'], 'HIT')
+
+    def test_cache_hits_still_count_views(self):
+        """Test that slug pages served from cache are counted as views"""
+        for _ in range(3):
+            self.client.get(self.slug_url)
+        flush_view_counts()
+        self.gallery_item.refresh_from_db()
+        self.assertEqual(self.gallery_item.total_views, 3)
+
+    def test_authenticated_requests_bypass_cache(self):
+        """Test that requests with credentials are never cached"""
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass12345')
+        refresh = RefreshToken.for_user(admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(refresh.access_token)}')
+        self.client.get(self.slug_url)
+        response = self.client.get(self.slug_url)
+        self.assertNotIn('X-Cache', response)
+        self.assertIsNotNone(response.data['admin_info'])
+
+    def test_stats_command(self):
+        """Test that the stats command reports hits and misses"""
+        self.client.get(self.item_list_url)
+        self.client.get(self.item_list_url)
+        out = StringIO()
+        call_command('response_cache_stats', '--reset', stdout=out)
+        self.assertIn('hits=1 misses=1', out.getvalue())
+        self.assertEqual(get_stats()['hits'], 0)
+
+    def test_variant_media_and_supplies_purge_product_tags(self):
+        """Test that videos, YouTube videos and supplies purge the product page"""
+        supplier = Supplier.objects.create(name='Supplier')
+        supply = Supply.objects.create(title='Oil', quantity=1, supplier=supplier)
+        changes = [
+            lambda: VariantYoutubeVideo.objects.create(variant=self.variant, title='Demo', youtube_video_code='abc'),
+            lambda: VariantSupply.objects.create(variant=self.variant, supply=supply, quantity_required=1),
+            lambda: Supply.objects.filter(pk=supply.pk).first().save(),
+        ]
+        for change in changes:
+            self.client.get(self.slug_url)
+            self.assertEqual(self.client.get(self.slug_url)['X-Cache'], 'HIT')
+            change()
+            self.assertEqual(self.client.get(self.slug_url)['X-Cache'], 'MISS')
+
+    @override_settings(GALLERY_CACHE_SHARED=None)
+    def test_process_local_cache_disables_response_cache(self):
+        """Test that a local-memory cache never serves (possibly stale) cached responses"""
+        self.client.get(self.slug_url)
+        self.assertNotIn('X-Cache', self.client.get(self.slug_url))
+        with self.assertRaises(CommandError):
+            call_command('response_cache_stats', stdout=StringIO())
+
+    def test_only_redis_and_memcached_count_as_shared(self):
+        """Test that the database cache doesn't switch the cross-process features on"""
+        backends = {
+            'django.core.cache.backends.db.DatabaseCache': False,
+            'django.core.cache.backends.locmem.LocMemCache': False,
+            'django.core.cache.backends.redis.RedisCache': True,
+        }
+        for backend, shared in backends.items():
+            caches = {'default': {'BACKEND': backend, 'LOCATION': 'gallery_cache'}}
+            with self.subTest(backend=backend), override_settings(CACHES=caches, GALLERY_CACHE_SHARED=None):
+                self.assertEqual(is_shared_cache(), shared)
+
+    def test_stats_are_not_written_per_request(self):
+        """Test that hit/miss counts are buffered in the process until read or flushed"""
+        self.client.get(self.item_list_url)
+        self.client.get(self.item_list_url)
+        self.assertIsNone(cache.get(STATS_KEYS['hits']))
+        self.assertEqual(get_stats()['hits'], 1)
+        self.assertEqual(cache.get(STATS_KEYS['hits']), 1)
+
+
+@override_settings(GALLERY_CACHE_SHARED=True)
+class ConditionalGetTestCase(TestCase):
+    """Test cases for ETag / Last-Modified handling on catalog endpoints"""
+
+    def setUp(self):
+        cache.clear()  # The local-memory test cache isn't rolled back between tests
+        self.client = APIClient()
+        self.item_list_url = '/api/gallery/items/'
+        self.category = Category.objects.create(title='Test Category')
+        self.gallery_item = GalleryItem.objects.create(
+            category=self.category,
+            title='Test Product',
+            metaKeyWords='test',
+            metaKeyDescription='test',
+            active=True
+        )
+        self.variant = Variant.objects.create(
+            product=self.gallery_item, title='Small', price=10.00, quantity=5, volume=1, weight=1
+        )
+
+    def test_etag_answers_304_without_serializing(self):
+        """Test that a matching If-None-Match costs the aggregate and content-version queries"""
+        url = f'/api/gallery/items/{self.gallery_item.id}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(catalog_queries(ctx)), 2)
+
+    def test_etag_survives_view_flush_and_deletes_change_it(self):
+        """Test that validators follow database rows: view flushes keep them, deletes change them"""
+        other = GalleryItem.objects.create(
+            category=self.category, title='Other Product', metaKeyWords='t', metaKeyDescription='t', active=True
+        )
+        etag = self.client.get(self.item_list_url)['ETag']
+        self.client.get(f'/api/gallery/items/slug/{self.gallery_item.slug}/')
+        flush_view_counts()
+        response = self.client.get(self.item_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        other.delete()
+        response = self.client.get(self.item_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_not_modified_product_page_counts_a_view(self):
+        """Test that a 304 on the product pages still records the view"""
+        for url in (f'/api/gallery/items/slug/{self.gallery_item.slug}/', f'/api/gallery/items/{self.gallery_item.id}/'):
+            with self.settings(GALLERY_RESPONSE_CACHE_ENABLED=False):
+                etag = self.client.get(url)['ETag']
+                flush_view_counts()
+                before = GalleryItem.objects.get(pk=self.gallery_item.pk).total_views
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                flush_view_counts()
+                self.assertEqual(GalleryItem.objects.get(pk=self.gallery_item.pk).total_views, before + 1)
+
+    def test_variant_change_changes_product_etag(self):
+        """Test that variant edits invalidate the product and list validators"""
+        list_etag = self.client.get(self.item_list_url)['ETag']
+        url = f'/api/gallery/items/{self.gallery_item.id}/'
+        etag = self.client.get(url)['ETag']
+        self.variant.price = 12.00
+        self.variant.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        response = self.client.get(self.item_list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cached_response_revalidates(self):
+        """Test that responses served from the response cache keep their validators"""
+        first = self.client.get(self.item_list_url)
+        response = self.client.get(self.item_list_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_category_and_review_endpoints(self):
+        """Test conditional GET on endpoints without timestamps"""
+        from django.utils import timezone
+        for url in ('/api/gallery/categories/', f'/api/gallery/reviews/?product={self.gallery_item.id}'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+            Review.objects.create(product=self.gallery_item, rating=4, date_added=timezone.now())
+            self.category.title = 'Renamed'
+            self.category.save()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class SchemaMarkupTestCase(TestCase):
+    """Test cases for the precomputed Schema.org JSON-LD"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(title='Furniture')
+        self.gallery_item = GalleryItem.objects.create(
+            category=self.category,
+            title='Walnut Table',
+            metaKeyWords='test',
+            metaKeyDescription='A table',
+            active=True
+        )
+        self.variant = Variant.objects.create(
+            product=self.gallery_item, title='Small', price=10.00, quantity=5, volume=1, weight=1
+        )
+        self.gallery_item.default_variant = self.variant
+        self.gallery_item.save()
+
+    def _markup(self, request=None):
+        product = GalleryItem.objects.select_related('default_variant').get(pk=self.gallery_item.pk)
+        return json.loads(product.get_schema_markup(product.default_variant, request))
+
+    def test_markup_is_stored_and_rendered_without_queries(self):
+        """Test that rendering stored markup costs no queries"""
+        product = GalleryItem.objects.select_related('default_variant').get(pk=self.gallery_item.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            markup = json.loads(product.get_schema_markup(product.default_variant))
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(markup['name'], 'Walnut Table')
+        self.assertEqual(markup['offers']['price'], '10.00')
+        self.assertEqual(markup['category'], 'Furniture')
+        self.assertTrue(markup['url'].startswith('/'))
+
+    def test_changes_regenerate_markup(self):
+        """Test that variant, review and category changes update the stored markup"""
+        from django.utils import timezone
+        self.variant.price = 15.00
+        self.variant.save()
+        Review.objects.create(
+            product=self.gallery_item, rating=4, content='Solid', date_added=timezone.now(), keep_anonymous=True
+        )
+        self.category.title = 'Tables'
+        self.category.save()
+        markup = self._markup()
+        self.assertEqual(markup['offers']['price'], '15.00')
+        self.assertEqual(markup['aggregateRating']['reviewCount'], '1')
+        self.assertEqual(markup['review'][0]['author']['name'], 'Anonymous')
+        self.assertEqual(markup['category'], 'Tables')
+
+    def test_detail_api_serves_absolute_urls(self):
+        """Test that the API fills in the site URL"""
+        response = self.client.get(f'/api/gallery/items/{self.gallery_item.id}/')
+        markup = json.loads(response.data['schema_markup'])
+        self.assertTrue(markup['url'].startswith('http://testserver/'))
+
+    def test_rebuild_command(self):
+        """Test that the rebuild command regenerates every variant"""
+        Variant.objects.update(schema_markup='')
+        out = StringIO()
+        call_command('rebuild_schema_markup', stdout=out)
+        self.assertIn('1 variants', out.getvalue())
+        self.assertNotEqual(Variant.objects.get(pk=self.variant.pk).schema_markup, '')
+
+    def test_missing_markup_is_not_generated_on_read(self):
+        """Test that reads never write; the --missing rebuild backfills"""
+        Variant.objects.update(schema_markup='')
+        product = GalleryItem.objects.select_related('default_variant').get(pk=self.gallery_item.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertIsNone(product.get_schema_markup(product.default_variant))
+        self.assertEqual(len(ctx.captured_queries), 0)
+        out = StringIO()
+        call_command('rebuild_schema_markup', missing=True, stdout=out)
+        self.assertIn('1 variants', out.getvalue())
+        self.assertEqual(self._markup()['name'], 'Walnut Table')
+
+    def test_variant_save_only_refreshes_that_variant(self):
+        """Test that saving a variant leaves its siblings' markup alone"""
+        large = Variant.objects.create(
+            product=self.gallery_item, title='Large', price=20.00, quantity=5, volume=1, weight=1
+        )
+        Variant.objects.filter(pk=self.variant.pk).update(schema_markup='stale')
+        large.price = 25.00
+        large.save()
+        self.assertEqual(Variant.objects.get(pk=self.variant.pk).schema_markup, 'stale')
+        self.assertEqual(json.loads(Variant.objects.get(pk=large.pk).schema_markup)['offers']['price'], '25.00')
+
+
+class RelatedProductsTestCase(TestCase):
+    """Test cases for the offline related-products neighbour table"""
+
+    def setUp(self):
+        self.client = APIClient()
+        furniture = Category.objects.create(title='Furniture')
+        tables = Category.objects.create(title='Tables', parent=furniture)
+        chairs = Category.objects.create(title='Chairs', parent=furniture)
+        decor = Category.objects.create(title='Decor')
+        self.products = {}
+        for title, category, keywords in (
+            ('Walnut Table', tables, 'walnut, table'),
+            ('Oak Table', tables, 'oak, table'),
+            ('Walnut Chair', chairs, 'walnut, chair'),
+            ('Vase', decor, 'ceramic'),
+        ):
+            product = GalleryItem.objects.create(
+                category=category, title=title, metaKeyWords=keywords, metaKeyDescription='t'
+            )
+            product.default_variant = Variant.objects.create(
+                product=product, title='Default', price=10.00, quantity=1, volume=1, weight=1
+            )
+            product.save()
+            self.products[title] = product
+
+    def _ids(self, *titles):
+        return [self.products[title].id for title in titles]
+
+    def test_scores_combine_category_keywords_and_copurchases(self):
+        """Test neighbour ranking and that unrelated products need a co-purchase"""
+        from cart.models import Order, OrderItem
+        order = Order.objects.create(ordered=True)
+        for title in ('Walnut Table', 'Vase'):
+            OrderItem.objects.create(order=order, variant=self.products[title].default_variant)
+
+        neighbours = compute_related_products()
+        walnut_table = [related_id for related_id, _ in neighbours[self.products['Walnut Table'].id]]
+        # Same category + shared keyword first; the co-purchased vase joins the cousin chair
+        self.assertEqual(walnut_table[0], self.products['Oak Table'].id)
+        self.assertEqual(set(walnut_table), set(self._ids('Oak Table', 'Walnut Chair', 'Vase')))
+        # The vase has a single real neighbour and is topped up with the most viewed products
+        GalleryItem.objects.filter(pk=self.products['Walnut Chair'].pk).update(total_views=5)
+        vase = compute_related_products()[self.products['Vase'].id]
+        self.assertEqual([related_id for related_id, _ in vase], self._ids('Walnut Table', 'Walnut Chair', 'Oak Table'))
+        self.assertEqual([score for _, score in vase[1:]], [0.0, 0.0])
+
+    def test_category_candidates_are_bounded(self):
+        """Test that a large category only feeds the first top_k members of each nearby category"""
+        tables = self.products['Oak Table'].category
+        for i in range(10):
+            GalleryItem.objects.create(category=tables, title=f'Table {i}', metaKeyWords=f'model{i}', metaKeyDescription='t')
+        neighbours = compute_related_products(top_k=3)
+        self.assertTrue(all(len(ranked) == 3 for ranked in neighbours.values()))
+        # Same category + shared keyword still wins over the bounded category candidates
+        self.assertEqual(neighbours[self.products['Walnut Table'].id][0][0], self.products['Oak Table'].id)
+
+    def test_detail_reads_neighbour_table(self):
+        """Test that the detail view serves precomputed neighbours"""
+        call_command('compute_related_products', stdout=StringIO())
+        self.assertTrue(RelatedProduct.objects.exists())
+        # Neighbours take precedence over the same-category fallback
+        store_related_products({self.products['Vase'].id: [(self.products['Oak Table'].id, 1.0)]})
+        response = self.client.get(f"/api/gallery/items/{self.products['Vase'].id}/")
+        self.assertEqual([item['id'] for item in response.data['related_products']], self._ids('Oak Table'))
+
+    def test_fallback_to_same_category(self):
+        """Test that products without neighbours still get same-category items"""
+        response = self.client.get(f"/api/gallery/items/{self.products['Oak Table'].id}/")
+        self.assertEqual([item['id'] for item in response.data['related_products']], self._ids('Walnut Table'))
+
+
+@override_settings(GALLERY_CACHE_SHARED=True)
+class RankingMaterializationTestCase(TestCase):
+    """Test cases for the daily ranking job and the top-N API"""
+
+    def setUp(self):
+        cache.clear()  # The local-memory test cache isn't rolled back between tests
+        self.client = APIClient()
+        self.rankings_url = '/api/gallery/items/rankings/'
+        self.category = Category.objects.create(title='Test Category')
+        self.products = []
+        for i in range(3):
+            product = GalleryItem.objects.create(
+                category=self.category, title=f'Product {i}', metaKeyWords='t', metaKeyDescription='t'
+            )
+            product.default_variant = Variant.objects.create(
+                product=product, title='Default', price=10.00, quantity=5, volume=1, weight=1
+            )
+            product.save()
+            self.products.append(product)
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='pass12345')
+            for i in range(3)
+        ]
+
+    def _ranking(self, criteria):
+        return list(Ranking.objects.filter(criteria=criteria).order_by('rank').values_list('product_id', 'value'))
+
+    def test_rankings_per_criteria(self):
+        """Test favorited, viewed and sold rankings"""
+        from django.utils import timezone
+        from cart.models import Order, OrderItem
+        first, second, third = self.products
+        for user in self.users:
+            WishedItem.objects.create(user=user, product=second)
+        WishedItem.objects.create(user=self.users[0], product=first)
+        WishedItem.objects.create(user=self.users[1], product=third, is_unwished=True)
+        GalleryItem.objects.filter(pk=third.pk).update(total_views=7)
+        order = Order.objects.create(ordered=True, ordered_date=timezone.now(), status=Order.ORDERED)
+        OrderItem.objects.create(order=order, variant=first.default_variant, quantity=4)
+        canceled = Order.objects.create(ordered=True, ordered_date=timezone.now(), status=Order.CANCELED)
+        OrderItem.objects.create(order=canceled, variant=second.default_variant, quantity=9)
+
+        call_command('compute_rankings', stdout=StringIO())
+        self.assertEqual(self._ranking(Ranking.MOST_FAVORITED), [(second.id, 3), (first.id, 1)])
+        self.assertEqual(self._ranking(Ranking.MOST_VIEWED), [(third.id, 7)])
+        self.assertEqual(self._ranking(Ranking.MOST_SOLD), [(first.id, 4)])
+
+    def test_views_are_deltas_and_reruns_replace(self):
+        """Test that a same-day rerun replaces rows and views count from the previous snapshot"""
+        import datetime
+        from .models import ProductViewSnapshot
+        product = self.products[0]
+        ProductViewSnapshot.objects.create(
+            product=product, date=datetime.date.today() - datetime.timedelta(days=1), total_views=10
+        )
+        GalleryItem.objects.filter(pk=product.pk).update(total_views=15)
+        call_command('compute_rankings', stdout=StringIO())
+        call_command('compute_rankings', stdout=StringIO())
+        self.assertEqual(self._ranking(Ranking.MOST_VIEWED), [(product.id, 5)])
+
+    def test_top_n_api(self):
+        """Test the cached top-N endpoint"""
+        for user in self.users[:2]:
+            WishedItem.objects.create(user=user, product=self.products[2])
+        WishedItem.objects.create(user=self.users[0], product=self.products[1])
+        call_command('compute_rankings', stdout=StringIO())
+
+        response = self.client.get(f'{self.rankings_url}?criteria=favorited&limit=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['product']['id'] for row in response.data], [self.products[2].id])
+        self.assertEqual(self.client.get(f'{self.rankings_url}?criteria=favorited&limit=1')['X-Cache'], 'HIT')
+
+        response = self.client.get(f'{self.rankings_url}?criteria=unknown')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StockStatusTestCase(TestCase):
+    """Test cases for the admin stock status API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/gallery/stock-status/'
+        category = Category.objects.create(title='Test Category')
+        product = GalleryItem.objects.create(
+            category=category, title='Test Product', metaKeyWords='t', metaKeyDescription='t'
+        )
+        for i, quantity in enumerate((0, 5, 20, 0, 8)):
+            Variant.objects.create(
+                product=product, title=f'Variant {i}', price=10.00, quantity=quantity, volume=1, weight=1
+            )
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass12345')
+        refresh = RefreshToken.for_user(admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(refresh.access_token)}')
+
+    def test_summary_and_pagination(self):
+        """Test the single-query summary and paged variants"""
+        response = self.client.get(f'{self.url}?filter=in_stock&page_size=2&page=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['summary'], {
+            'total_variants': 5, 'in_stock': 3, 'out_of_stock': 2, 'low_stock': 2, 'total_quantity': 33,
+        })
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['total_pages'], 2)
+        self.assertEqual(len(response.data['variants']), 1)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        """Test that nested variant data is prefetched"""
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(f'{self.url}?page_size=1')
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(f'{self.url}?page_size=5')
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_streaming_exports(self):
+        """Test CSV and NDJSON exports"""
+        response = self.client.get(f'{self.url}?export=csv&filter=out_of_stock')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'product_id', 'product'])
+        self.assertEqual(len(lines), 3)
+
+        response = self.client.get(f'{self.url}?export=ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['category'], 'Test Category')
+
+
+class AdminStockSummaryTestCase(TestCase):
+    """Test cases for the annotated stock columns in the admin changelists"""
+
+    def setUp(self):
+        self.category = Category.objects.create(title='Test Category')
+        for title, quantities in (('Full', (3, 4)), ('Partial', (0, 20)), ('Empty', (0,)), ('Bare', ())):
+            product = GalleryItem.objects.create(
+                category=self.category, title=title, metaKeyWords='t', metaKeyDescription='t'
+            )
+            for i, quantity in enumerate(quantities):
+                Variant.objects.create(
+                    product=product, title=f'{title} {i}', price=10.00, quantity=quantity, volume=1, weight=1
+                )
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass12345')
+        self.client.force_login(admin)
+
+    def test_stock_summary_uses_annotations(self):
+        """Test the stock summary column and the stock filter"""
+        response = self.client.get('/admin/galleryItem/galleryitem/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'All in stock (7 total)')
+        self.assertContains(response, '1 in stock, 1 out of stock')
+        self.assertContains(response, 'All out of stock')
+        self.assertContains(response, 'No variants')
+
+        response = self.client.get('/admin/galleryItem/galleryitem/?stock=partial')
+        titles = [obj.title for obj in response.context['cl'].result_list]
+        self.assertEqual(titles, ['Partial'])
+
+    def test_changelist_query_count_is_constant(self):
+        """Test that the changelist does not query per product"""
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/admin/galleryItem/galleryitem/?stock=in_stock')
+        with CaptureQueriesContext(connection) as many:
+            self.client.get('/admin/galleryItem/galleryitem/')
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_variant_stock_filter(self):
+        """Test the variant stock level filter"""
+        response = self.client.get('/admin/galleryItem/variant/?stock=low_stock')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = sorted(obj.title for obj in response.context['cl'].result_list)
+        self.assertEqual(titles, ['Full 0', 'Full 1'])
+        self.assertContains(response, 'Low Stock (3)')
+
+
+class ImageDerivativesTestCase(TestCase):
+    """Test cases for responsive image derivatives"""
+
+    def setUp(self):
+        import tempfile
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, GALLERY_IMAGE_DERIVATIVES_ASYNC=False
+        )
+        self.settings_override.enable()
+        category = Category.objects.create(title='Test Category')
+        self.product = GalleryItem.objects.create(
+            category=category, title='Test Product', metaKeyWords='t', metaKeyDescription='t'
+        )
+
+    def tearDown(self):
+        import shutil
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _upload(self, name, width, height):
+        from io import BytesIO
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), 'red').save(buffer, format='JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_derivatives_generated_after_commit(self):
+        """Test that widths below the original are generated and served as srcset maps"""
+        import os
+        with self.captureOnCommitCallbacks(execute=True):
+            variant = Variant.objects.create(
+                product=self.product, title='V', price=10.00, quantity=1, volume=1, weight=1,
+                image=self._upload('small.jpg', 500, 250), largeImage=self._upload('large.jpg', 900, 450)
+            )
+        variant.refresh_from_db()
+        self.assertEqual(variant.image_derivatives['image']['widths'], [200, 400])
+        self.assertEqual(variant.image_derivatives['largeImage']['widths'], [200, 400, 800])
+        root = os.path.splitext(variant.image.path)[0]
+        self.assertTrue(os.path.exists(f'{root}_400w.webp'))
+        self.assertTrue(os.path.exists(f'{root}_400w.jpg'))
+
+        self.product.default_variant = variant
+        self.product.save()
+        response = APIClient().get('/api/gallery/items/')
+        srcset = response.data[0]['default_variant_image_srcset']
+        self.assertEqual(sorted(srcset), ['jpeg', 'webp'])
+        self.assertTrue(srcset['webp']['200'].endswith('_200w.webp'))
+
+    def test_unchanged_images_are_not_requeued(self):
+        """Test that saves without a new upload skip generation"""
+        from galleryItem.image_derivatives import needs_derivatives
+        with self.captureOnCommitCallbacks(execute=True):
+            variant = Variant.objects.create(
+                product=self.product, title='V', price=10.00, quantity=1, volume=1, weight=1,
+                image=self._upload('a.jpg', 300, 300), largeImage=self._upload('b.jpg', 300, 300)
+            )
+        variant.refresh_from_db()
+        self.assertFalse(needs_derivatives(variant))
+        variant.quantity = 5
+        from unittest import mock
+        with mock.patch('galleryItem.signals.schedule_derivatives') as schedule:
+            variant.save()
+        schedule.assert_not_called()
+
+    def test_stale_copy_does_not_overwrite_record(self):
+        """Test that saving a copy loaded before generation keeps the worker's record"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            variant = Variant.objects.create(
+                product=self.product, title='V', price=10.00, quantity=1, volume=1, weight=1,
+                image=self._upload('a.jpg', 500, 500), largeImage=self._upload('b.jpg', 500, 500)
+            )
+        stale = Variant.objects.get(pk=variant.pk)
+        for callback in callbacks:
+            callback()
+        stale.quantity = 5
+        stale.save()
+        variant.refresh_from_db()
+        self.assertEqual(variant.quantity, 5)
+        self.assertEqual(variant.image_derivatives['image']['widths'], [200, 400])
+
+
+class ProductImportTestCase(TestCase):
+    """Test cases for the JSON product importer"""
+
+    def setUp(self):
+        import tempfile
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        import shutil
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _write_json(self, products):
+        import os
+        path = os.path.join(self.media_root, 'products.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(products, f)
+        return path
+
+    def test_fetch_images_limits_per_host(self):
+        """Test that downloads run concurrently but respect the per-host limit"""
+        import threading
+        import time
+        from unittest import mock
+        from galleryItem.utils import fetch_images
+
+        lock = threading.Lock()
+        active, peak = {}, {}
+
+        def fake_download(url):
+            host = url.split('/')[2]
+            with lock:
+                active[host] = active.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), active[host])
+            time.sleep(0.02)
+            with lock:
+                active[host] -= 1
+            return None if url.endswith('bad') else b'data'
+
+        urls = [f'https://a.example/{i}' for i in range(8)] + ['https://b.example/1', 'https://b.example/bad']
+        stats = {'image_failures': 0, 'image_bytes': 0, 'fetch_seconds': 0.0}
+        with mock.patch('galleryItem.utils.download_image', side_effect=fake_download):
+            results = fetch_images(urls, stats=stats, max_workers=6, per_host=2)
+        self.assertEqual(len(results), 10)
+        self.assertEqual(peak['a.example'], 2)
+        self.assertEqual(stats['image_failures'], 1)
+        self.assertEqual(stats['image_bytes'], 36)
+
+    def test_import_command_downloads_new_products_only(self):
+        """Test that images are only fetched for products that don't exist yet"""
+        from io import BytesIO
+        from unittest import mock
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10), 'blue').save(buffer, format='JPEG')
+        GalleryItem.objects.create(
+            category=Category.objects.create(title='Existing'),
+            title='Old Vase', metaKeyWords='t', metaKeyDescription='t'
+        )
+        path = self._write_json([
+            {'title': 'New Lamp', 'price': 10, 'quantity': 2,
+             'images': ['https://img.example/lamp-0.jpg', 'https://img.example/lamp-1.jpg']},
+            {'title': 'old vase', 'price': 5, 'images': ['https://img.example/vase.jpg']},
+        ])
+        out = StringIO()
+        with mock.patch('galleryItem.utils.download_image', return_value=buffer.getvalue()) as download:
+            call_command('import_products', path, stdout=out)
+        self.assertEqual(sorted(call.args[0] for call in download.call_args_list),
+                         ['https://img.example/lamp-0.jpg', 'https://img.example/lamp-1.jpg'])
+        lamp = GalleryItem.objects.get(title='New Lamp')
+        self.assertEqual(lamp.default_variant.variantimage_set.count(), 1)
+        self.assertIn('Images downloaded: 2', out.getvalue())
+        self.assertIn('products/s', out.getvalue())
+
+    def test_rolled_back_product_is_not_remembered(self):
+        """Test that a product whose savepoint rolled back doesn't make its title a duplicate"""
+        from galleryItem.utils import import_products_from_json_data
+        with self.assertLogs('galleryItem.utils', 'ERROR') as logs:
+            stats = import_products_from_json_data([
+                {'title': 'Lamp', 'price': 'not a price'},
+                {'title': 'Lamp', 'price': 10},
+                {'title': 'lamp', 'price': 12},
+            ])
+        self.assertEqual((stats['errors'], stats['created'], stats['skipped']), (1, 1, 1))
+        self.assertIn("Could not import product 'Lamp'", logs.output[0])
+        self.assertEqual(GalleryItem.objects.get(title='Lamp').default_variant.price, 10)
+
+    def test_iter_json_products_streams_arrays_and_ndjson(self):
+        """Test the incremental parser across chunk boundaries"""
+        from galleryItem.utils import iter_json_products
+        products = [{'title': f'Product {i}', 'tags': 'a,b' * i} for i in range(5)]
+        as_array = StringIO(json.dumps(products, indent=2))
+        as_ndjson = StringIO('\n'.join(json.dumps(product) for product in products) + '\n')
+        self.assertEqual(list(iter_json_products(as_array, chunk_size=7)), products)
+        self.assertEqual(list(iter_json_products(as_ndjson, chunk_size=7)), products)
+        with self.assertRaises(ValueError):
+            list(iter_json_products(StringIO('[{"title": "a"}, {"title"'), chunk_size=7))
+
+    def test_resume_from_checkpoint(self):
+        """Test that a crashed import resumes after the last committed batch"""
+        import os
+        from unittest import mock
+        from galleryItem.utils import fetch_images
+
+        path = self._write_json([{'title': f'Product {i}', 'price': 1} for i in range(5)])
+        calls = []
+
+        def crash_on_second_batch(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return fetch_images(*args, **kwargs)
+
+        with mock.patch('galleryItem.utils.fetch_images', side_effect=crash_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                call_command('import_products', path, '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(GalleryItem.objects.count(), 2)
+        with open(f'{path}.checkpoint', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['processed'], 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_products', path, '--batch-size', '2', '--resume', stdout=StringIO())
+        self.assertEqual(
+            sorted(GalleryItem.objects.values_list('title', flat=True)),
+            [f'Product {i}' for i in range(5)]
+        )
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+        self.assertFalse(any('."title" LIKE' in query['sql'] for query in queries.captured_queries))
+
+    def test_reviews_are_bulk_loaded_and_deduplicated(self):
+        """Test bulk review loading, rating aggregates and re-import dedupe"""
+        products = [{
+            'title': 'Reviewed Lamp', 'price': 10,
+            'reviews': [
+                {'reviewer': 'Ann', 'star_rating': 5, 'message': 'Great', 'date_reviewed': '20/01/2025'},
+                {'reviewer': 'Bob', 'star_rating': 3, 'message': 'Fine', 'date_reviewed': '21/01/2025'},
+                {'reviewer': 'Ann', 'star_rating': 5, 'message': 'Great', 'date_reviewed': '20/01/2025'},
+                {'reviewer': 'Cy', 'star_rating': 4, 'message': 'Nice', 'date_reviewed': 'last week'},
+            ],
+        }]
+        path = self._write_json(products)
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_products', path, stdout=StringIO())
+        inserts = [q for q in queries.captured_queries if 'INSERT INTO "galleryItem_review"' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+
+        lamp = GalleryItem.objects.get(title='Reviewed Lamp')
+        self.assertEqual(lamp.rating_count, 3)
+        self.assertEqual(lamp.rating_sum, 12)
+        self.assertEqual(lamp.reviews.get(import_author='Bob').date_added.day, 21)
+
+        # Re-importing the reviews for the product (e.g. after resetting its aggregates) adds
+        # nothing, including the review whose date couldn't be parsed
+        GalleryItem.objects.filter(pk=lamp.pk).update(rating_count=0)
+        out = StringIO()
+        call_command('import_products', path, stdout=out)
+        self.assertEqual(lamp.reviews.count(), 3)
+        self.assertIn('Duplicate reviews skipped: 4', out.getvalue())
+
+    def test_review_batches_only_flush_between_products(self):
+        """Test that add() never writes; flush_if_full() does once a batch is queued"""
+        from galleryItem.review_import import BulkReviewLoader
+        lamp = GalleryItem.objects.create(
+            category=Category.objects.create(title='Lamps'), title='Lamp', metaKeyWords='t', metaKeyDescription='t'
+        )
+        loader = BulkReviewLoader(batch_size=2)
+        loader.add(lamp.pk, [{'reviewer': 'Ann', 'message': 'Good'}, {'reviewer': 'Bob', 'message': 'Bad'}])
+        self.assertFalse(lamp.reviews.exists())
+        self.assertEqual(loader.flush_if_full(), 2)
+        self.assertEqual(lamp.reviews.count(), 2)
+
+
+class ContentAddressedStorageTestCase(TestCase):
+    """Test cases for content-addressed product image storage"""
+
+    def setUp(self):
+        import tempfile
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, GALLERY_IMAGE_DERIVATIVES_ASYNC=False
+        )
+        self.settings_override.enable()
+        category = Category.objects.create(title='Test Category')
+        self.product = GalleryItem.objects.create(
+            category=category, title='Test Product', metaKeyWords='t', metaKeyDescription='t'
+        )
+
+    def tearDown(self):
+        import shutil
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _image_bytes(self, color):
+        from io import BytesIO
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new('RGB', (4, 4), color).save(buffer, format='JPEG')
+        return buffer.getvalue()
+
+    def _variant(self, content):
+        from django.core.files.base import ContentFile
+        variant = Variant(product=self.product, title='V', price=10.00, quantity=1, volume=1, weight=1)
+        variant.image.save('product_1_img_0.jpg', ContentFile(content), save=False)
+        variant.largeImage.save('product_1_img_0.jpg', ContentFile(content), save=False)
+        variant.save()
+        return variant
+
+    def test_identical_content_is_stored_once(self):
+        """Test that image and largeImage (and re-imports) share one reference-counted blob"""
+        from galleryItem.models import MediaBlob
+        content = self._image_bytes('red')
+        first = self._variant(content)
+        second = self._variant(content)
+        self.assertEqual(first.image.name, first.largeImage.name)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('cas/'))
+        self.assertEqual(MediaBlob.objects.get().refcount, 4)
+
+    def test_file_deleted_with_last_reference(self):
+        """Test that files are released on replace/delete and removed with the last reference"""
+        import os
+        from django.core.files.base import ContentFile
+        from galleryItem.models import MediaBlob
+        with self.captureOnCommitCallbacks(execute=True):
+            variant = self._variant(self._image_bytes('red'))
+        path = variant.image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.image.save('other.jpg', ContentFile(self._image_bytes('blue')))
+        self.assertEqual(MediaBlob.objects.get(name=variant.largeImage.name).refcount, 1)
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_legacy_files_are_never_deleted(self):
+        """Test that rows sharing a pre-content-addressed file don't delete it on replace/delete"""
+        import os
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import FileSystemStorage
+        legacy_name = FileSystemStorage().save('products/images/shared.jpg', ContentFile(self._image_bytes('red')))
+        variants = [
+            Variant.objects.create(
+                product=self.product, title=f'V{i}', price=10.00, quantity=1, volume=1, weight=1,
+                image=legacy_name, largeImage=legacy_name
+            )
+            for i in range(2)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            variants[0].image.save('other.jpg', ContentFile(self._image_bytes('blue')))
+        with self.captureOnCommitCallbacks(execute=True):
+            variants[0].delete()
+        variants[1].refresh_from_db()
+        self.assertEqual(variants[1].image.name, legacy_name)
+        self.assertTrue(os.path.exists(variants[1].image.path))
+
+    def test_derivatives_of_shared_blob_are_rendered_once_in_place(self):
+        """Test that shared sources render once and regeneration never creates suffixed copies"""
+        import os
+        from io import BytesIO
+        from unittest import mock
+        from PIL import Image
+        from galleryItem import image_derivatives
+        buffer = BytesIO()
+        Image.new('RGB', (500, 500), 'red').save(buffer, format='JPEG')
+        with mock.patch.object(image_derivatives, 'render_derivatives', wraps=image_derivatives.render_derivatives) as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                variant = self._variant(buffer.getvalue())
+            self.assertEqual(render.call_count, 1)
+            out = StringIO()
+            call_command('generate_image_derivatives', '--force', stdout=out)
+            self.assertEqual(render.call_count, 2)
+        variant.refresh_from_db()
+        self.assertEqual(variant.image_derivatives['largeImage']['widths'], [200, 400])
+        directory = os.path.dirname(variant.image.path)
+        digest = os.path.splitext(os.path.basename(variant.image.name))[0]
+        self.assertEqual(sorted(os.listdir(directory)), sorted(
+            [os.path.basename(variant.image.name)] +
+            [f'{digest}_{width}w.{ext}' for width in (200, 400) for ext in ('webp', 'jpg')]
+        ))
+
+    def test_derivatives_of_legacy_files_are_written_in_place_and_kept(self):
+        """Test that a shared legacy original gets unsuffixed derivatives that replacing one row keeps"""
+        import os
+        from io import BytesIO
+        from PIL import Image
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import FileSystemStorage
+        from galleryItem.models import MediaBlob
+        buffer = BytesIO()
+        Image.new('RGB', (300, 300), 'red').save(buffer, format='JPEG')
+        legacy_name = FileSystemStorage().save('products/images/shared.jpg', ContentFile(buffer.getvalue()))
+        with self.captureOnCommitCallbacks(execute=True):
+            variants = [
+                Variant.objects.create(
+                    product=self.product, title=f'V{i}', price=10.00, quantity=1, volume=1, weight=1,
+                    image=legacy_name, largeImage=legacy_name
+                )
+                for i in range(2)
+            ]
+        call_command('generate_image_derivatives', '--force', stdout=StringIO())
+        derivative = os.path.join(self.media_root, 'products/images/shared_200w.webp')
+        self.assertEqual(
+            sorted(os.listdir(os.path.dirname(derivative))),
+            ['shared.jpg', 'shared_200w.jpg', 'shared_200w.webp']
+        )
+        self.assertFalse(MediaBlob.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            variants[0].image.save('other.jpg', ContentFile(self._image_bytes('blue')))
+        variants[1].refresh_from_db()
+        self.assertEqual(variants[1].image_derivatives['image']['widths'], [200])
+        self.assertTrue(os.path.exists(derivative))
+
+    def test_immutable_cache_headers(self):
+        """Test that content-addressed media is served with far-future cache headers"""
+        from django.test import RequestFactory
+        from galleryItem.views import serve_immutable_media
+        variant = self._variant(self._image_bytes('green'))
+        request = RequestFactory().get(variant.image.url)
+        response = serve_immutable_media(request, variant.image.name, document_root=self.media_root)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+class SlugAllocationTestCase(TestCase):
+    """Test cases for query-free slug allocation"""
+
+    def setUp(self):
+        self.category = Category.objects.create(title='Test Category')
+
+    def _create(self, title):
+        return GalleryItem.objects.create(
+            category=self.category, title=title, metaKeyWords='t', metaKeyDescription='t'
+        )
+
+    def test_save_uses_one_query_for_colliding_titles(self):
+        """Test that the next free suffix is found with a single slug query"""
+        for _ in range(5):
+            self._create('Oak Bowl')
+        from galleryItem.slugs import allocate_slug
+        with CaptureQueriesContext(connection) as queries:
+            slug = allocate_slug(GalleryItem, 'Oak Bowl')
+        self.assertEqual(slug, 'oak-bowl-5')
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(self._create('Oak  Bowl').slug, 'oak-bowl-5')
+
+    def test_batch_allocation(self):
+        """Test allocating slugs for many titles at once"""
+        from galleryItem.slugs import allocate_slugs
+        self._create('Oak Bowl')
+        self._create('Oak Bowl')
+        GalleryItem.objects.filter(slug='oak-bowl').delete()
+        with CaptureQueriesContext(connection) as queries:
+            slugs = allocate_slugs(GalleryItem, ['Oak Bowl', 'Oak Bowl', 'Oak Bowl', 'Pine Box', '!!!'])
+        self.assertEqual(slugs, ['oak-bowl', 'oak-bowl-2', 'oak-bowl-3', 'pine-box', 'galleryitem'])
+        self.assertEqual(len(queries.captured_queries), 1)
+
+
+class SparseFieldsetTestCase(TestCase):
+    """Test cases for ?fields= / ?omit= on the catalog endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(title='Test Category')
+        self.gallery_item = GalleryItem.objects.create(
+            category=self.category,
+            title='Test Product',
+            description='A long description',
+            metaKeyWords='test',
+            metaKeyDescription='test',
+            active=True
+        )
+        self.variant = Variant.objects.create(
+            product=self.gallery_item, title='Small', price=10.00, quantity=5, volume=1, weight=1
+        )
+        self.gallery_item.default_variant = self.variant
+        self.gallery_item.save()
+
+    def test_list_fields(self):
+        """Test that only the requested fields are returned"""
+        response = self.client.get('/api/gallery/items/?fields=id,title,slug,default_variant_price&fields=bogus')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0]), {'id', 'title', 'slug', 'default_variant_price'})
+
+    def test_list_omit(self):
+        """Test that omitted fields are dropped and the rest kept"""
+        response = self.client.get('/api/gallery/items/?omit=description,average_rating')
+        self.assertNotIn('description', response.data[0])
+        self.assertNotIn('average_rating', response.data[0])
+        self.assertIn('review_count', response.data[0])
+
+    def test_detail_skips_unrequested_queries(self):
+        """Test that omitted method fields and their prefetches cost no queries"""
+        url = f'/api/gallery/items/slug/{self.gallery_item.slug}/'
+        with CaptureQueriesContext(connection) as full:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client.get(f'{url}?fields=title,slug,default_variant')
+        self.assertEqual(set(response.data), {'title', 'slug', 'default_variant'})
+        self.assertLess(len(sparse.captured_queries), len(full.captured_queries))
+
+    def test_variant_and_review_endpoints(self):
+        """Test that variant and review lists honour the fieldset"""
+        from django.utils import timezone
+        Review.objects.create(product=self.gallery_item, rating=4, date_added=timezone.now())
+        response = self.client.get(f'/api/gallery/variants/?product={self.gallery_item.id}&fields=id,price')
+        self.assertEqual(set(response.data[0]), {'id', 'price'})
+        response = self.client.get(f'/api/gallery/reviews/?product={self.gallery_item.id}&omit=content')
+        self.assertNotIn('content', response.data[0])
+        self.assertIn('rating', response.data[0])
+
+
+@override_settings(GALLERY_CACHE_SHARED=True)
+class StreamingListTestCase(TestCase):
+    """Test cases for streamed (chunked) list responses"""
+
+    def setUp(self):
+        cache.clear()  # The local-memory test cache isn't rolled back between tests
+        self.client = APIClient()
+        self.item_list_url = '/api/gallery/items/'
+        self.category = Category.objects.create(title='Test Category')
+        for i in range(5):
+            item = GalleryItem.objects.create(
+                category=self.category, title=f'Product {i}', metaKeyWords='t', metaKeyDescription='t', active=True
+            )
+            Variant.objects.create(product=item, title='Small', price=10.00, quantity=5, volume=1, weight=1)
+
+    def _body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_stream_matches_buffered_response(self):
+        """Test that the streamed body is byte-identical to the buffered one"""
+        from galleryItem.views import GalleryItemListView
+        buffered = self.client.get(f'{self.item_list_url}?ordering=title')
+        original = GalleryItemListView.stream_chunk_size
+        GalleryItemListView.stream_chunk_size = 2
+        try:
+            streamed = self.client.get(f'{self.item_list_url}?ordering=title&stream=true')
+        finally:
+            GalleryItemListView.stream_chunk_size = original
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        self.assertEqual(self._body(streamed), buffered.content)
+
+    def test_empty_stream(self):
+        """Test that an empty queryset streams an empty array"""
+        response = self.client.get(f'{self.item_list_url}?category=999999&stream=true')
+        self.assertEqual(json.loads(self._body(response)), [])
+
+    def test_streamed_response_is_cached(self):
+        """Test that a fully streamed response is stored in the response cache"""
+        url = f'{self.item_list_url}?stream=true'
+        body = self._body(self.client.get(url))
+        cached = self.client.get(url)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, body)
+
+    def test_large_streamed_response_is_not_buffered(self):
+        """Test that a body past the size cap is streamed through and not cached"""
+        url = f'{self.item_list_url}?stream=true'
+        with override_settings(GALLERY_RESPONSE_CACHE_MAX_STREAM_BYTES=10):
+            body = self._body(self.client.get(url))
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self._body(response), body)
+
+    @override_settings(GALLERY_STREAM_LIST_RESPONSES=True)
+    def test_setting_enables_streaming_for_wishlist(self):
+        """Test that the setting streams authenticated lists and stream=false opts out"""
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass12345')
+        WishedItem.objects.create(user=user, product=GalleryItem.objects.first())
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/api/gallery/wishlist/')
+        self.assertEqual(len(json.loads(self._body(response))), 1)
+        self.assertFalse(self.client.get('/api/gallery/wishlist/?stream=false').streaming)
+
+
+class FastListSerializerTestCase(TestCase):
+    """Test cases for the projection-based catalog list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.item_list_url = '/api/gallery/items/'
+        self.category = Category.objects.create(title='Test Category')
+        self.with_variant = GalleryItem.objects.create(
+            category=self.category, title='With Variant', description='Described',
+            metaKeyWords='t', metaKeyDescription='t', active=True
+        )
+        variant = Variant.objects.create(
+            product=self.with_variant, title='Small', price=12.5, quantity=0, volume=1, weight=1,
+            image='cas/ab/cd/image.jpg', largeImage='cas/ab/cd/image.jpg'
+        )
+        Variant.objects.filter(pk=variant.pk).update(
+            image_derivatives={'image': {'source': 'cas/ab/cd/image.jpg', 'widths': [200, 400]}}
+        )
+        GalleryItem.objects.filter(pk=self.with_variant.pk).update(
+            default_variant=variant, rating_sum=14, rating_count=3
+        )
+        GalleryItem.objects.create(
+            category=self.category, title='No Variant', metaKeyWords='t', metaKeyDescription='t', active=True
+        )
+
+    def _serializer_output(self, url):
+        with override_settings(GALLERY_FAST_LIST_SERIALIZER=False, GALLERY_RESPONSE_CACHE_ENABLED=False):
+            return self.client.get(url).content
+
+    def test_output_is_byte_identical(self):
+        """Test that the projection renders exactly what the serializer renders"""
+        for query in ('', '?ordering=title', '?omit=description', '?fields=id,default_variant_image_srcset'):
+            url = f'{self.item_list_url}{query}'
+            with override_settings(GALLERY_RESPONSE_CACHE_ENABLED=False):
+                fast = self.client.get(url).content
+            self.assertEqual(fast, self._serializer_output(url))
+        rows = {row['title']: row for row in json.loads(self._serializer_output(self.item_list_url))}
+        self.assertEqual(rows['With Variant']['default_variant_price'], '12.50')
+        self.assertEqual(rows['With Variant']['average_rating'], 4.67)
+        self.assertIsNotNone(rows['With Variant']['default_variant_image_srcset'])
+        self.assertNotIn('default_variant_price', rows['No Variant'])
+
+    def test_projection_uses_one_query(self):
+        """Test that the fast list costs a single query however many products there are"""
+        with override_settings(GALLERY_RESPONSE_CACHE_ENABLED=False):
+            self.client.get(self.item_list_url)
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(f'{self.item_list_url}?stream=true').getvalue()
+        # Conditional GET validators (aggregate + content versions) + the projection
+        self.assertEqual(len(catalog_queries(ctx)), 3)
+
+    def test_benchmark_command(self):
+        """Test that the benchmark runs, checks output and rolls back its products"""
+        out = StringIO()
+        call_command('benchmark_list_serializers', '--sizes', '20', '--repeat', '1', stdout=out)
+        self.assertIn('Output identical', out.getvalue())
+        self.assertEqual(GalleryItem.objects.count(), 2)
+
+
+class FastRenderingTestCase(TestCase):
+    """Test cases for the project JSON renderer and request-scoped media URLs"""
+
+    def test_renderer_matches_drf_json_renderer(self):
+        """Test that FastJSONRenderer produces JSONRenderer's bytes"""
+        import datetime
+        import decimal
+        import uuid
+        from django.utils import timezone
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from wildwud.renderers import FastJSONRenderer
+        data = {
+            'price': decimal.Decimal('12.50'),
+            'when': timezone.now(),
+            'naive': datetime.datetime(2024, 5, 1, 12, 30),
+            'day': datetime.date(2024, 5, 1),
+            'histogram': {1: 0, 5: 3},
+            'text': 'café \u2028 "quoted" \x1f',
+            'lazy': gettext_lazy('Anonymous'),
+            'uuid': uuid.UUID(int=1),
+            'nested': [{'rating': 4.67, 'flag': True, 'none': None}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render({'huge': 2 ** 70}), JSONRenderer().render({'huge': 2 ** 70}))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        indented = FastJSONRenderer().render(data, 'application/json; indent=2')
+        self.assertEqual(indented, JSONRenderer().render(data, 'application/json; indent=2'))
+        # Strict JSON has no NaN/Infinity: null here, ValueError from JSONRenderer
+        self.assertEqual(FastJSONRenderer().render({'score': float('nan'), 'max': float('inf')}),
+                         b'{"score":null,"max":null}')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({'score': float('nan')})
+
+    def test_media_urls_match_build_absolute_uri(self):
+        """Test that the media URL builder gives build_absolute_uri's URLs"""
+        from django.core.files.storage import default_storage
+        from rest_framework.test import APIRequestFactory
+        from galleryItem.media_urls import MediaUrlBuilder, get_media_url_builder
+        request = APIRequestFactory().get('/api/gallery/items/', secure=True)
+        for name in ('products/images/small/a b.jpg', 'cas/ab/cd/été.png'):
+            self.assertEqual(
+                MediaUrlBuilder(request).storage_url(default_storage, name),
+                request.build_absolute_uri(default_storage.url(name))
+            )
+        self.assertIs(get_media_url_builder(request), get_media_url_builder(request))
+        with override_settings(SITE_URL='https://shop.example'):
+            self.assertEqual(
+                MediaUrlBuilder().storage_url(default_storage, 'a.jpg'),
+                f'https://shop.example{default_storage.url("a.jpg")}'
+            )
+
+
+@override_settings(GALLERY_CHANGE_FEED_SETTLE_SECONDS=0)
+class CatalogChangeFeedTestCase(TestCase):
+    """Test cases for the catalog change feed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/gallery/changes/'
+        self.category = Category.objects.create(title='Test Category')
+        self.gallery_item = GalleryItem.objects.create(
+            category=self.category, title='Test Product', metaKeyWords='t', metaKeyDescription='t', active=True
+        )
+        self.variant = Variant.objects.create(
+            product=self.gallery_item, title='Small', price=10.00, quantity=5, volume=1, weight=1
+        )
+
+    def _sync(self, cursor=None, **params):
+        if cursor:
+            params['since'] = cursor
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_full_sync_then_only_deltas(self):
+        """Test that a cursor only returns rows changed after it"""
+        first = self._sync()
+        self.assertEqual([p['id'] for p in first['products']], [self.gallery_item.id])
+        self.assertEqual([v['id'] for v in first['variants']], [self.variant.id])
+        self.assertFalse(first['has_more'])
+
+        empty = self._sync(first['cursor'])
+        self.assertEqual((empty['products'], empty['variants'], empty['tombstones']), ([], [], []))
+
+        self.variant.quantity = 0
+        self.variant.save()
+        changed = self._sync(empty['cursor'])
+        self.assertEqual(changed['products'], [])
+        self.assertEqual(changed['variants'][0]['quantity'], 0)
+        self.assertFalse(changed['variants'][0]['in_stock'])
+
+    def test_tombstones_for_deletions_and_deactivations(self):
+        """Test that deleted and deactivated rows come back as tombstones"""
+        cursor = self._sync()['cursor']
+        other = Variant.objects.create(
+            product=self.gallery_item, title='Large', price=20.00, quantity=1, volume=1, weight=1
+        )
+        other_id = other.pk  # delete() clears the pk
+        other.delete()
+        self.gallery_item.active = False
+        self.gallery_item.save()
+        data = self._sync(cursor)
+        tombstones = {(t['type'], t['id'], t['reason']) for t in data['tombstones']}
+        self.assertIn(('variant', other_id, 'deleted'), tombstones)
+        self.assertIn(('product', self.gallery_item.id, 'deactivated'), tombstones)
+        self.assertEqual(data['products'], [])
+
+    def test_special_price_moves_product_forward(self):
+        """Test that special price edits show up as product changes"""
+        cursor = self._sync()['cursor']
+        SpecialPrice.objects.create(product=self.gallery_item, name='Sale', calculation_type='subtraction', value=2)
+        self.assertEqual([p['id'] for p in self._sync(cursor)['products']], [self.gallery_item.id])
+
+    def test_paging_with_limit(self):
+        """Test that limited pages walk every change exactly once"""
+        for i in range(4):
+            GalleryItem.objects.create(
+                category=self.category, title=f'Extra {i}', metaKeyWords='t', metaKeyDescription='t', active=True
+            )
+        seen, cursor, more = [], None, True
+        while more:
+            data = self._sync(cursor, limit=2)
+            seen += [p['id'] for p in data['products']]
+            cursor, more = data['cursor'], data['has_more']
+        self.assertEqual(sorted(seen), sorted(GalleryItem.objects.values_list('id', flat=True)))
+
+    def test_invalid_and_expired_cursors(self):
+        """Test that bad cursors get 400 and cursors past the retention get 410"""
+        self.assertEqual(self.client.get(self.url, {'since': 'nope'}).status_code, status.HTTP_400_BAD_REQUEST)
+        cursor = self._sync()['cursor']
+        with override_settings(GALLERY_CHANGE_FEED_RETENTION_DAYS=0):
+            self.assertEqual(self.client.get(self.url, {'since': cursor}).status_code, status.HTTP_410_GONE)
+
+
+class CatalogSnapshotTestCase(TestCase):
+    """Test cases for the static catalog snapshots"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.category = Category.objects.create(title='Test Category')
+        self.gallery_item = GalleryItem.objects.create(
+            category=self.category, title='Test Product', metaKeyWords='t', metaKeyDescription='t', active=True
+        )
+        self.variant = Variant.objects.create(
+            product=self.gallery_item, title='Small', price=10.00, quantity=5, volume=1, weight=1
+        )
+        self.gallery_item.default_variant = self.variant
+        self.gallery_item.save()
+
+    def _build(self, **kwargs):
+        snapshot = CatalogSnapshot(self.root.name, 'http://testserver', **kwargs)
+        return snapshot, snapshot.build()
+
+    def test_documents_match_api(self):
+        """Test that snapshot documents and their compressed copies match the API responses"""
+        snapshot, stats = self._build()
+        self.assertEqual(stats['written'], 4)
+        product = snapshot.directory / f'catalog/products/{self.gallery_item.slug}.json'
+        index = snapshot.directory / 'catalog/index.json'
+        self.assertEqual(json.loads(index.read_bytes()), self.client.get('/api/gallery/items/').json())
+        self.assertEqual(
+            json.loads(gzip.decompress((snapshot.directory / 'catalog/index.json.gz').read_bytes())),
+            json.loads(index.read_bytes())
+        )
+        self.assertEqual(json.loads(product.read_bytes())['variants'][0]['price'], '10.00')
+        manifest = json.loads((snapshot.directory / 'manifest.json').read_bytes())
+        self.assertEqual(manifest['version'], 1)
+        self.assertIn('blog/index.json', manifest['documents'])
+
+    def test_only_changed_documents_are_rewritten(self):
+        """Test that a rebuild renders only documents whose rows changed and drops inactive products"""
+        snapshot, _ = self._build()
+        product = snapshot.directory / f'catalog/products/{self.gallery_item.slug}.json'
+        other = GalleryItem.objects.create(
+            category=self.category, title='Other Product', metaKeyWords='t', metaKeyDescription='t', active=True
+        )
+        _, stats = self._build()
+        # New product document, index and category counts; the first product falls back to
+        # same-category related products, so it is rendered again but its bytes are unchanged
+        self.assertEqual((stats['written'], stats['unchanged']), (3, 1))
+        _, stats = self._build()
+        self.assertEqual((stats['written'], stats['removed']), (0, 0))
+
+        self.variant.price = 12.00
+        self.variant.save()
+        RelatedProduct.objects.create(product=other, related=self.gallery_item, score=1, rank=1)
+        _, stats = self._build()
+        self.assertEqual(stats['written'], 3)
+        self.assertEqual(json.loads(product.read_bytes())['variants'][0]['price'], '12.00')
+
+        self.gallery_item.active = False
+        self.gallery_item.save()
+        _, stats = self._build()
+        self.assertEqual(stats['removed'], 1)
+        self.assertFalse(product.exists())
+        self.assertFalse(product.with_name(product.name + '.gz').exists())
+        manifest = json.loads((snapshot.directory / 'manifest.json').read_bytes())
+        self.assertEqual(manifest['version'], 4)
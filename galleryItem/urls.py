@@ -8,6 +8,8 @@ urlpatterns = [
     path('items/', views.GalleryItemListView.as_view(), name='galleryitem-list'),
     path('items/<int:pk>/', views.GalleryItemDetailView.as_view(), name='galleryitem-detail'),
     path('items/slug/<slug:slug>/', views.GalleryItemBySlugView.as_view(), name='galleryitem-by-slug'),
+    path('items/rankings/', views.RankingListView.as_view(), name='galleryitem-rankings'),
+    path('changes/', views.CatalogChangesView.as_view(), name='catalog-changes'),
     
     # Variants APIs
     path('variants/', views.VariantListView.as_view(), name='variant-list'),
@@ -1,15 +1,32 @@
 import datetime
+import json
+import logging
 import os
+import threading
 import time
 import requests
+from collections import ChainMap, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from itertools import islice
+from urllib.parse import urlparse
 from django.core.files.base import ContentFile
 from django.core.files import File
 from decimal import Decimal
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from django.db import transaction
 
-from .models import GalleryItem, Variant, VariantImage, Review, Category
+from .models import GalleryItem, Variant, VariantImage, Category
+from .review_import import BulkReviewLoader
+from .slugs import SlugAllocator
+
+logger = logging.getLogger(__name__)
+
+# JSON import: products per fetch/write batch, concurrent image downloads overall and per host
+IMPORT_BATCH_SIZE = 25
+IMAGE_FETCH_WORKERS = 8
+IMAGE_FETCH_PER_HOST = 4
 
 # Check if running on PythonAnywhere (proxy issues)
 IS_PYTHONANYWHERE = 'PYTHONANYWHERE_DOMAIN' in os.environ or 'akumar15.pythonanywhere.com' in os.environ.get('ALLOWED_HOSTS', '')
@@ -46,274 +63,338 @@ def create_session():
     
     return session
 
-# Global session
-_global_session = None
+# requests sessions aren't thread-safe; each image fetch worker gets its own
+_thread_sessions = threading.local()
+
+def get_thread_session():
+    """Get or create the current thread's session"""
+    if not hasattr(_thread_sessions, 'session'):
+        _thread_sessions.session = create_session()
+    return _thread_sessions.session
+
+
+def download_image(url, max_retries=3, retry_delay=2):
+    """Download one image with the importer's retry policy; returns the bytes or None"""
+    session = get_thread_session()
+    for attempt in range(max_retries):
+        try:
+            response = session.get(url, timeout=30, stream=True)
+            if response.status_code == 200:
+                return response.content
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            pass
+        except Exception:
+            return None
+        if attempt < max_retries - 1:
+            time.sleep(retry_delay * (attempt + 1))
+    return None
+
+
+def fetch_images(urls, stats=None, max_workers=IMAGE_FETCH_WORKERS, per_host=IMAGE_FETCH_PER_HOST):
+    """
+    Download many images concurrently: at most `max_workers` in flight and
+    `per_host` per host. Returns {url: bytes or None}; updates image_failures,
+    image_bytes and fetch_seconds in `stats`.
+    """
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls:
+        return {}
+    host_limits = defaultdict(lambda: threading.BoundedSemaphore(per_host))
+    for url in urls:
+        host_limits[urlparse(url).netloc]
+
+    def fetch(url):
+        with host_limits[urlparse(url).netloc]:
+            return download_image(url)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='import-images') as executor:
+        results = dict(zip(urls, executor.map(fetch, urls)))
+    if stats is not None:
+        stats['fetch_seconds'] += time.monotonic() - started
+        stats['image_failures'] += sum(1 for content in results.values() if content is None)
+        stats['image_bytes'] += sum(len(content) for content in results.values() if content)
+    return results
+
+
+def _product_title(product_data):
+    return (product_data.get('title') or product_data.get('TITLE') or '').strip()
+
 
-def get_session():
-    """Get or create global session"""
-    global _global_session
-    if _global_session is None:
-        _global_session = create_session()
-    return _global_session
+def _product_image_urls(product_data):
+    return product_data.get('IMAGES') or product_data.get('images') or []
+
+
+def normalize_title(title):
+    """Case- and whitespace-insensitive key for matching imported titles to products"""
+    return ' '.join(title.split()).casefold()
+
+
+def get_existing_titles():
+    """{normalized title: product ID} of every product, in one query"""
+    return {
+        normalize_title(title): product_id
+        for product_id, title in GalleryItem.objects.values_list('id', 'title').iterator()
+    }
+
+
+def iter_json_products(fileobj, chunk_size=64 * 1024):
+    """
+    Yield products one at a time from a JSON array or an NDJSON (one object
+    per line) file without loading the whole file into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    in_array = None
+
+    while True:
+        buffer = buffer.lstrip()
+        if in_array and buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if not eof and len(buffer) < chunk_size:
+            chunk = fileobj.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        if not buffer:
+            if in_array:
+                raise ValueError('Unexpected end of file inside the product array.')
+            return
+        if in_array is None:
+            # First value decides the format: '[' is a JSON array, '{' starts NDJSON
+            if buffer[0] not in '[{':
+                raise ValueError('JSON file must contain an array of products.')
+            in_array = buffer[0] == '['
+            if in_array:
+                buffer = buffer[1:]
+            continue
+        if in_array and buffer.startswith(']'):
+            return
+        try:
+            product, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The value continues past the buffer; read on
+            chunk = fileobj.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield product
 
 
 def yesterday():
     return datetime.date.today() - datetime.timedelta(1)
 
 
-def import_products_from_json_data(json_data):
+def import_products_from_json_data(json_data, batch_size=IMPORT_BATCH_SIZE,
+                                   max_workers=IMAGE_FETCH_WORKERS, per_host=IMAGE_FETCH_PER_HOST,
+                                   on_batch=None):
     """
     Import products from JSON data (called from admin panel)
+    `json_data` is a list of products or any iterable of them (see iter_json_products).
+    Each batch is committed in its own transaction, then `on_batch(processed, stats)`
+    is called, e.g. to write a checkpoint.
     Returns: dict with import statistics
     """
     stats = {
+        'processed': 0,
         'created': 0,
         'skipped': 0,
         'images': 0,
         'reviews': 0,
-        'errors': 0
+        'duplicate_reviews': 0,
+        'errors': 0,
+        'image_failures': 0,
+        'image_bytes': 0,
+        'fetch_seconds': 0.0,
     }
     
+    # If json_data is not a list, try to handle it
+    if isinstance(json_data, (dict, str, bytes)):
+        return stats
+    
     # Get or create default category
     default_category, _ = Category.objects.get_or_create(
         title='Imported Products',
         defaults={'description': 'Products imported from JSON'}
     )
+    existing_products = get_existing_titles()
+    review_loader = BulkReviewLoader()
+    slug_allocator = SlugAllocator(GalleryItem)
     
-    # If json_data is not a list, try to handle it
-    if not isinstance(json_data, list):
-        return stats
+    products = iter(json_data)
+    while True:
+        batch = list(islice(products, batch_size))
+        if not batch:
+            break
+        # Download the images of the batch's new products concurrently; DB writes stay here
+        urls = [
+            url for product_data in batch
+            if normalize_title(_product_title(product_data)) not in existing_products
+            for url in _product_image_urls(product_data)
+        ]
+        downloaded = fetch_images(urls, stats=stats, max_workers=max_workers, per_host=per_host)
+        # One query for the slugs of all new titles instead of probing per product
+        slug_allocator.preload(
+            _product_title(product_data) for product_data in batch
+            if normalize_title(_product_title(product_data)) not in existing_products
+        )
+        # Titles created by this batch; only known to later batches once it has committed
+        created = {}
+        with transaction.atomic():
+            for product_data in batch:
+                # A failing product only rolls back its own writes
+                savepoint = transaction.savepoint()
+                errors = stats['errors']
+                product_id = import_product(
+                    product_data, default_category, ChainMap(created, existing_products), downloaded, stats,
+                    review_loader, slug_allocator
+                )
+                if stats['errors'] > errors:
+                    transaction.savepoint_rollback(savepoint)
+                else:
+                    transaction.savepoint_commit(savepoint)
+                    if product_id:
+                        created[normalize_title(_product_title(product_data))] = product_id
+                review_loader.flush_if_full()
+            review_loader.flush()
+        existing_products.update(created)
+        stats['reviews'] = review_loader.created
+        stats['duplicate_reviews'] = review_loader.duplicates
+        stats['processed'] += len(batch)
+        if on_batch:
+            on_batch(stats['processed'], stats)
     
-    for idx, product_data in enumerate(json_data):
-        try:
-            # Handle both lowercase and UPPERCASE field names
-            title = (product_data.get('title') or product_data.get('TITLE') or '').strip()
-            
-            if not title:
-                continue
-            
-            # Check if product already exists
-            existing_product = GalleryItem.objects.filter(title__iexact=title).first()
+    return stats
+
+
+def import_product(product_data, default_category, existing_products, downloaded, stats, review_loader,
+                   slug_allocator=None):
+    """
+    Import one product and return the new product's ID (None when skipped or
+    failed). `existing_products` maps normalized titles to product IDs (see
+    get_existing_titles); the caller records the new product once its savepoint
+    has been released. `downloaded` maps image URLs to their bytes (None when
+    the download failed); reviews are queued on `review_loader` (a
+    BulkReviewLoader) and slugs come from `slug_allocator`. Failures are
+    logged and counted in stats['errors'].
+    """
+    title = None
+    try:
+        # Handle both lowercase and UPPERCASE field names
+        title = _product_title(product_data)
+        
+        if not title:
+            return
+        
+        # Check if product already exists
+        existing_product_id = existing_products.get(normalize_title(title))
+        
+        if existing_product_id:
+            # Product exists - check if it needs reviews
+            reviews_data = product_data.get('reviews') or product_data.get('REVIEWS') or []
+            if reviews_data and GalleryItem.objects.filter(pk=existing_product_id, rating_count=0).exists():
+                # Import reviews for existing product
+                review_loader.add(existing_product_id, reviews_data)
             
-            if existing_product:
-                # Product exists - check if it needs reviews
-                from django.utils import timezone
-                from datetime import datetime
-                
-                reviews_data = product_data.get('reviews') or product_data.get('REVIEWS') or []
-                if existing_product.reviews.count() == 0 and reviews_data:
-                    # Import reviews for existing product
-                    for review_data in reviews_data:
-                        # Parse review date from JSON
-                        date_reviewed_str = review_data.get('date_reviewed') or review_data.get('date', '')
-                        
-                        # Try multiple date formats
-                        date_added = None
-                        date_formats = [
-                            '%d/%b/%Y',  # 01/Feb/2024
-                            '%m/%d/%Y',  # 01/20/2025 (MM/DD/YYYY)
-                            '%d/%m/%Y',  # 20/01/2025 (DD/MM/YYYY)
-                        ]
-                        
-                        for fmt in date_formats:
-                            try:
-                                # Parse date and make it timezone-aware
-                                parsed_date = datetime.strptime(date_reviewed_str, fmt)
-                                date_added = timezone.make_aware(parsed_date, timezone.get_current_timezone())
-                                break  # Success! Stop trying other formats
-                            except (ValueError, AttributeError):
-                                continue  # Try next format
-                        
-                        if date_added is None:
-                            # All formats failed, use current date
-                            date_added = timezone.now()
-                        
-                        Review.objects.create(
-                            product=existing_product,
-                            content=review_data.get('message') or review_data.get('review', ''),
-                            rating=review_data.get('star_rating') or review_data.get('rating', 5),
-                            import_author=review_data.get('reviewer') or review_data.get('author', 'Anonymous'),
-                            is_imported=True,
-                            date_added=date_added  # Use parsed date
-                        )
-                        stats['reviews'] += 1
-                
-                stats['skipped'] += 1
+            stats['skipped'] += 1
+            return
+        
+        # Get description
+        description = product_data.get('description') or product_data.get('DESCRIPTION') or ''
+        
+        # Get tags for meta keywords (convert underscores to spaces, commas already there)
+        tags = product_data.get('TAGS') or product_data.get('tags') or ''
+        meta_keywords = tags.replace('_', ' ')  # dog_figure -> dog figure
+        
+        # Use TITLE for meta description (max 255 chars as per model field limit)
+        meta_description = title[:255] if len(title) > 255 else title
+        
+        # Create new product
+        product = GalleryItem.objects.create(
+            title=title,
+            slug=slug_allocator.allocate(title) if slug_allocator else None,
+            description=description,
+            category=default_category,
+            active=True,
+            metaKeyWords=meta_keywords,
+            metaKeyDescription=meta_description
+        )
+        # Create variant (handle both formats)
+        price = product_data.get('PRICE') or product_data.get('price', 0)
+        quantity = product_data.get('QUANTITY') or product_data.get('quantity') or product_data.get('stock', 0)
+        
+        # First image is required by the variant; it was downloaded by the batch's fetch stage
+        image_urls = _product_image_urls(product_data)
+        first_image_content = None
+        first_image_filename = None
+        
+        if image_urls and downloaded.get(image_urls[0]):
+            first_image_content = ContentFile(downloaded[image_urls[0]])
+            first_image_filename = f"product_{product.id}_img_0.jpg"
+            stats['images'] += 1
+        
+        # Create placeholder image if no images available
+        if not first_image_content:
+            try:
+                from PIL import Image
+                # Create a simple placeholder image (1x1 pixel)
+                placeholder = Image.new('RGB', (1, 1), color='white')
+                img_io = BytesIO()
+                placeholder.save(img_io, format='JPEG')
+                img_io.seek(0)
+                first_image_content = ContentFile(img_io.read(), name='placeholder.jpg')
+                first_image_filename = f"product_{product.id}_placeholder.jpg"
+            except ImportError:
+                # If PIL not available, create a minimal JPEG placeholder manually
+                # Minimal valid JPEG (1x1 white pixel)
+                minimal_jpeg = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x01\x00H\x00H\x00\x00\xff\xdb\x00C\x00\x08\x06\x06\x07\x06\x05\x08\x07\x07\x07\t\t\x08\n\x0c\x14\r\x0c\x0b\x0b\x0c\x19\x12\x13\x0f\x14\x1d\x1a\x1f\x1e\x1d\x1a\x1c\x1c $.\' ",#\x1c\x1c(7),01444\x1f\'9=82<.342\xff\xc0\x00\x11\x08\x00\x01\x00\x01\x01\x01\x11\x00\x02\x11\x01\x03\x11\x01\xff\xc4\x00\x14\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x08\xff\xc4\x00\x14\x10\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xff\xda\x00\x0c\x03\x01\x00\x02\x11\x03\x11\x00\x3f\x00\xaa\xff\xd9'
+                first_image_content = ContentFile(minimal_jpeg, name='placeholder.jpg')
+                first_image_filename = f"product_{product.id}_placeholder.jpg"
+        
+        # Create variant with first image
+        variant = Variant(
+            product=product,
+            title='',
+            price=Decimal(str(price)),
+            quantity=int(quantity),
+            volume=1,  # Default volume
+            weight=1   # Default weight
+        )
+        # Save images before saving variant
+        variant.image.save(first_image_filename, first_image_content, save=False)
+        variant.largeImage.save(first_image_filename, first_image_content, save=False)
+        variant.save()
+        
+        # Set as default variant
+        product.default_variant = variant
+        product.save(update_fields=['default_variant'])
+        
+        # Save additional images (if any)
+        for idx, image_url in enumerate(image_urls[1:], start=1):  # Start from index 1
+            content = downloaded.get(image_url)
+            if not content:
                 continue
+            filename = f"product_{product.id}_img_{idx}.jpg"
             
-            # Get description
-            description = product_data.get('description') or product_data.get('DESCRIPTION') or ''
-            
-            # Get tags for meta keywords (convert underscores to spaces, commas already there)
-            tags = product_data.get('TAGS') or product_data.get('tags') or ''
-            meta_keywords = tags.replace('_', ' ')  # dog_figure -> dog figure
-            
-            # Use TITLE for meta description (max 255 chars as per model field limit)
-            meta_description = title[:255] if len(title) > 255 else title
-            
-            # Create new product
-            product = GalleryItem.objects.create(
-                title=title,
-                description=description,
-                category=default_category,
-                active=True,
-                metaKeyWords=meta_keywords,
-                metaKeyDescription=meta_description
+            # Additional images - save to VariantImage
+            variant_image = VariantImage(
+                variant=variant,
+                name=f"Image {idx}"
             )
-            
-            # Create variant (handle both formats)
-            price = product_data.get('PRICE') or product_data.get('price', 0)
-            quantity = product_data.get('QUANTITY') or product_data.get('quantity') or product_data.get('stock', 0)
-            
-            # Download first image before creating variant (required fields)
-            images = product_data.get('IMAGES') or product_data.get('images', [])
-            first_image_content = None
-            first_image_filename = None
-            
-            if images:
-                try:
-                    # Download first image with retry logic
-                    session = get_session()
-                    max_retries = 3
-                    retry_delay = 2
-                    
-                    for attempt in range(max_retries):
-                        try:
-                            response = session.get(images[0], timeout=30, stream=True)
-                            if response.status_code == 200:
-                                first_image_content = ContentFile(response.content)
-                                first_image_filename = f"product_{product.id}_img_0.jpg"
-                                stats['images'] += 1
-                                break  # Success, exit retry loop
-                            else:
-                                if attempt < max_retries - 1:
-                                    time.sleep(retry_delay * (attempt + 1))
-                                    continue
-                        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
-                            if attempt < max_retries - 1:
-                                time.sleep(retry_delay * (attempt + 1))
-                                continue
-                            else:
-                                raise e
-                except Exception as e:
-                    pass
-            
-            # Create placeholder image if no images available
-            if not first_image_content:
-                try:
-                    from PIL import Image
-                    # Create a simple placeholder image (1x1 pixel)
-                    placeholder = Image.new('RGB', (1, 1), color='white')
-                    img_io = BytesIO()
-                    placeholder.save(img_io, format='JPEG')
-                    img_io.seek(0)
-                    first_image_content = ContentFile(img_io.read(), name='placeholder.jpg')
-                    first_image_filename = f"product_{product.id}_placeholder.jpg"
-                except ImportError:
-                    # If PIL not available, create a minimal JPEG placeholder manually
-                    # Minimal valid JPEG (1x1 white pixel)
-                    minimal_jpeg = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x01\x00H\x00H\x00\x00\xff\xdb\x00C\x00\x08\x06\x06\x07\x06\x05\x08\x07\x07\x07\t\t\x08\n\x0c\x14\r\x0c\x0b\x0b\x0c\x19\x12\x13\x0f\x14\x1d\x1a\x1f\x1e\x1d\x1a\x1c\x1c $.\' ",#\x1c\x1c(7),01444\x1f\'9=82<.342\xff\xc0\x00\x11\x08\x00\x01\x00\x01\x01\x01\x11\x00\x02\x11\x01\x03\x11\x01\xff\xc4\x00\x14\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x08\xff\xc4\x00\x14\x10\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xff\xda\x00\x0c\x03\x01\x00\x02\x11\x03\x11\x00\x3f\x00\xaa\xff\xd9'
-                    first_image_content = ContentFile(minimal_jpeg, name='placeholder.jpg')
-                    first_image_filename = f"product_{product.id}_placeholder.jpg"
-            
-            # Create variant with first image
-            variant = Variant(
-                product=product,
-                title='',
-                price=Decimal(str(price)),
-                quantity=int(quantity),
-                volume=1,  # Default volume
-                weight=1   # Default weight
-            )
-            # Save images before saving variant
-            variant.image.save(first_image_filename, first_image_content, save=False)
-            variant.largeImage.save(first_image_filename, first_image_content, save=False)
-            variant.save()
-            
-            # Set as default variant
-            product.default_variant = variant
-            product.save(update_fields=['default_variant'])
-            
-            # Download and save additional images (if any)
-            for idx, image_url in enumerate(images[1:], start=1):  # Start from index 1
-                try:
-                    # Download image with retry logic
-                    session = get_session()
-                    max_retries = 3
-                    retry_delay = 2
-                    
-                    for attempt in range(max_retries):
-                        try:
-                            response = session.get(image_url, timeout=30, stream=True)
-                            if response.status_code == 200:
-                                image_content = ContentFile(response.content)
-                                filename = f"product_{product.id}_img_{idx}.jpg"
-                                
-                                # Additional images - save to VariantImage
-                                variant_image = VariantImage(
-                                    variant=variant,
-                                    name=f"Image {idx}"
-                                )
-                                variant_image.image.save(filename, image_content, save=True)
-                                
-                                stats['images'] += 1
-                                break  # Success, exit retry loop
-                            else:
-                                if attempt < max_retries - 1:
-                                    time.sleep(retry_delay * (attempt + 1))
-                                    continue
-                        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
-                            if attempt < max_retries - 1:
-                                time.sleep(retry_delay * (attempt + 1))
-                                continue
-                            else:
-                                raise e
-                except Exception as e:
-                    pass
-            
-            # Import reviews (handle both formats)
-            from django.utils import timezone
-            from datetime import datetime
-            
-            reviews_data = product_data.get('REVIEWS') or product_data.get('reviews', [])
-            for review_data in reviews_data:
-                # Parse review date from JSON - try multiple formats
-                date_reviewed_str = review_data.get('date_reviewed') or review_data.get('date', '')
-                
-                # Try multiple date formats
-                date_added = None
-                date_formats = [
-                    '%d/%b/%Y',  # 01/Feb/2024
-                    '%m/%d/%Y',  # 01/20/2025 (MM/DD/YYYY)
-                    '%d/%m/%Y',  # 20/01/2025 (DD/MM/YYYY)
-                ]
-                
-                for fmt in date_formats:
-                    try:
-                        # Parse date and make it timezone-aware
-                        parsed_date = datetime.strptime(date_reviewed_str, fmt)
-                        date_added = timezone.make_aware(parsed_date, timezone.get_current_timezone())
-                        break  # Success! Stop trying other formats
-                    except (ValueError, AttributeError):
-                        continue  # Try next format
-                
-                if date_added is None:
-                    # All formats failed, use current date
-                    date_added = timezone.now()
-                
-                Review.objects.create(
-                    product=product,
-                    content=review_data.get('message') or review_data.get('review', ''),
-                    rating=review_data.get('star_rating') or review_data.get('rating', 5),
-                    import_author=review_data.get('reviewer') or review_data.get('author', 'Anonymous'),
-                    is_imported=True,
-                    date_added=date_added  # Use parsed date from JSON
-                )
-                stats['reviews'] += 1
-            
-            stats['created'] += 1
-            
-        except Exception as e:
-            stats['errors'] += 1
-    
-    return stats
+            variant_image.image.save(filename, ContentFile(content), save=True)
+            stats['images'] += 1
+        
+        # Import reviews (handle both formats); written in bulk at the end of the batch
+        reviews_data = product_data.get('REVIEWS') or product_data.get('reviews', [])
+        review_loader.add(product.id, reviews_data)
+        
+        stats['created'] += 1
+        return product.id
+        
+    except Exception:
+        logger.exception('Could not import product %r', title)
+        stats['errors'] += 1
@@ -0,0 +1,188 @@
+"""
+Write-buffered product view counter.
+
+Product page hits are accumulated in memory (or in the shared Django cache)
+and flushed as `UPDATE ... SET total_views = total_views + n`, one statement
+per distinct increment, instead of a read-modify-write save() on every hit.
+
+Settings:
+    GALLERY_VIEW_COUNTER_BACKEND  'local' (per-process buffer, default) or 'cache'
+    GALLERY_VIEW_FLUSH_INTERVAL   seconds between automatic flushes of the local buffer
+    GALLERY_VIEW_FLUSH_THRESHOLD  flush the local buffer early once this many hits are pending
+
+The local buffer lives in the web process: it is flushed by that process
+(interval/threshold) and at interpreter exit, so `flush_view_counts` can't
+reach it. The 'cache' backend needs a shared Redis/Memcached cache (see
+galleryItem.cache_backends; without one it falls back to 'local' with a
+warning) and `python manage.py flush_view_counts` run periodically (e.g. a
+PythonAnywhere scheduled task every few minutes).
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .cache_backends import is_shared_cache
+from .models import GalleryItem
+
+logger = logging.getLogger(__name__)
+
+
+def apply_view_counts(counts):
+    """
+    Persist {product_id: hits} with as few UPDATEs as possible: products
+    that received the same number of hits share one statement.
+    Returns the total number of hits written.
+    """
+    by_increment = defaultdict(list)
+    for product_id, hits in counts.items():
+        if hits > 0:
+            by_increment[hits].append(product_id)
+
+    with transaction.atomic():
+        for hits, product_ids in by_increment.items():
+            GalleryItem.objects.filter(pk__in=product_ids).update(total_views=F('total_views') + hits)
+    return sum(hits * len(ids) for hits, ids in by_increment.items())
+
+
+class LocalViewCounter:
+    """Per-process buffer of product view hits"""
+
+    def __init__(self, flush_interval=30, flush_threshold=500):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending = Counter()
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, product_id):
+        with self._lock:
+            self._pending[product_id] += 1
+            self._pending_total += 1
+            due = (
+                self._pending_total >= self.flush_threshold or
+                time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                # Logged and kept buffered by flush(); a page view must not fail on it
+                pass
+
+    def pending(self, product_id):
+        with self._lock:
+            return self._pending.get(product_id, 0)
+
+    def flush(self):
+        """Write all buffered hits; on failure they go back into the buffer"""
+        with self._lock:
+            counts, self._pending = self._pending, Counter()
+            self._pending_total = 0
+            self._last_flush = time.monotonic()
+        if not counts:
+            return 0
+        try:
+            return apply_view_counts(counts)
+        except Exception:
+            logger.exception('Failed to flush product view counts, keeping them buffered')
+            with self._lock:
+                self._pending.update(counts)
+                self._pending_total += sum(counts.values())
+            raise
+
+
+class CacheViewCounter:
+    """View hits kept in the shared Django cache so every worker feeds one counter"""
+    key_prefix = 'gallery:views:'
+
+    def key(self, product_id):
+        return f'{self.key_prefix}{product_id}'
+
+    def record(self, product_id):
+        key = self.key(product_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Key missing: add() is atomic, so if another worker won the race incr again
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+
+    def pending(self, product_id):
+        return cache.get(self.key(product_id), 0)
+
+    def flush(self):
+        """
+        Move cached hits into the database. Counters are decremented by the
+        amount written rather than deleted, so hits that arrive during the
+        flush are kept for the next run.
+        """
+        product_ids = GalleryItem.objects.values_list('id', flat=True)
+        keys = {self.key(pk): pk for pk in product_ids}
+        counts = {}
+        for key, hits in cache.get_many(list(keys)).items():
+            if hits:
+                counts[keys[key]] = hits
+        written = apply_view_counts(counts)
+        for product_id, hits in counts.items():
+            cache.decr(self.key(product_id), hits)
+        return written
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_view_counter():
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                backend = getattr(settings, 'GALLERY_VIEW_COUNTER_BACKEND', 'local')
+                if backend == 'cache' and not is_shared_cache():
+                    logger.warning(
+                        "GALLERY_VIEW_COUNTER_BACKEND = 'cache' needs a shared (Redis/Memcached) cache; "
+                        "buffering view counts in this process instead"
+                    )
+                    backend = 'local'
+                if backend == 'cache':
+                    _counter = CacheViewCounter()
+                else:
+                    _counter = LocalViewCounter(
+                        flush_interval=getattr(settings, 'GALLERY_VIEW_FLUSH_INTERVAL', 30),
+                        flush_threshold=getattr(settings, 'GALLERY_VIEW_FLUSH_THRESHOLD', 500),
+                    )
+    return _counter
+
+
+def record_view(product_id):
+    """Count one product page view without touching the database"""
+    get_view_counter().record(product_id)
+
+
+def uses_shared_counter():
+    """True when hits are counted in the shared cache (flushable from any process)"""
+    return isinstance(get_view_counter(), CacheViewCounter)
+
+
+def flush_view_counts():
+    """Write this process's buffered (or the shared cached) view counts; returns the number of hits written"""
+    return get_view_counter().flush()
+
+
+def _flush_at_exit():
+    if isinstance(_counter, LocalViewCounter):
+        try:
+            _counter.flush()
+        except Exception:
+            logger.exception('Lost buffered product view counts at shutdown')
+
+
+atexit.register(_flush_at_exit)
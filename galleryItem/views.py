@@ -1,13 +1,33 @@
+import csv
+import itertools
+
 from rest_framework import status, generics, permissions, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
-from django.db.models import Q, Sum, Count
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, Sum, Count, Max
+from django.http import StreamingHttpResponse
+from django.utils.http import quote_etag
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from .models import GalleryItem, Variant, Category, Review, WishedItem
+from .categories import get_category_index, get_category_tree
+from .change_feed import ChangeFeed, ExpiredCursor, InvalidCursor, DEFAULT_LIMIT as CHANGE_FEED_LIMIT
+from . import fast_serializers
+from .conditional import ConditionalGetMixin, conditional_get
+from .content_versions import get_content_versions
+from .fieldsets import SparseFieldsetViewMixin
+from .pagination import GalleryItemKeysetPagination
+from .rankings import resolve_criteria, top_rankings
+from .related_products import neighbours_prefetch
+from .response_cache import ResponseCacheMixin
+from .search import GalleryItemSearchFilter, GalleryItemOrderingFilter
+from .storage import IMMUTABLE_CACHE_CONTROL
+from .streaming import StreamingListMixin
+from .view_counter import record_view
 from .serializers import (
     GalleryItemListSerializer,
     GalleryItemDetailSerializer,
@@ -17,100 +37,79 @@ from .serializers import (
     CategorySerializer,
     ReviewSerializer,
     ReviewCreateSerializer,
-    WishedItemSerializer
+    WishedItemSerializer,
+    RankingSerializer
 )
 
+# ?fields= / ?omit= on the catalog read endpoints (see galleryItem.fieldsets)
+SPARSE_FIELDSET_PARAMETERS = [
+    openapi.Parameter('fields', openapi.IN_QUERY, description="Comma-separated fields to return (default: all)", type=openapi.TYPE_STRING),
+    openapi.Parameter('omit', openapi.IN_QUERY, description="Comma-separated fields to leave out", type=openapi.TYPE_STRING),
+]
+
+# ?stream=true on the unpaginated list endpoints (see galleryItem.streaming)
+STREAM_PARAMETER = openapi.Parameter(
+    'stream', openapi.IN_QUERY, description="Stream the JSON array in chunks instead of buffering it", type=openapi.TYPE_BOOLEAN
+)
 
-class GalleryItemListView(generics.ListCreateAPIView):
+# Prefetches that only some GalleryItemDetailSerializer fields need
+GALLERY_ITEM_DETAIL_PREFETCHES = {
+    'variants': (
+        'variant_set__variantimage_set',
+        'variant_set__variantvideo_set',
+        'variant_set__variantyoutubevideo_set',
+        'variant_set__variantsupply_set__supply__supplier',
+    ),
+    'reviews': ('reviews',),
+    'related_products': (neighbours_prefetch(),),
+}
+
+
+class GalleryItemListView(StreamingListMixin, SparseFieldsetViewMixin, ResponseCacheMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     """
     List all gallery items or create a new gallery item.
     
     GET: Returns a list of all active gallery items (no pagination - frontend handles it).
+         Send `page_size` and/or `cursor` to get keyset-paginated pages instead.
+         `fields` / `omit` select the fields returned (e.g. for grid views).
+         `stream=true` streams the unpaginated list in chunks.
     POST: Create a new gallery item (Admin/Staff only).
     """
     queryset = GalleryItem.objects.filter(active=True).select_related(
         'category', 'default_variant'
-    ).prefetch_related('reviews').order_by('-timeStamp')
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'metaKeyWords']
+    ).order_by('-timeStamp')
+    filter_backends = [GalleryItemSearchFilter, GalleryItemOrderingFilter]
+    search_fields = ['title', 'description', 'metaKeyWords']  # Used only when no full-text index is available
     ordering_fields = ['timeStamp', 'updated', 'total_views', 'title']
     ordering = ['-timeStamp']
     pagination_class = None  # Disable pagination
+    sparse_deferred = {'description': ('description',)}
+    # Conditional GET: ratings are written without touching `updated`; view counts
+    # are left out so a view flush doesn't invalidate every client's copy
+    validator_timestamp_fields = ('updated', 'default_variant__updated')
+    validator_aggregates = {'rating_sum': Sum('rating_sum'), 'rating_count': Sum('rating_count')}
+    validator_tags = ('products', 'categories')
+    
+    def get_cache_tags(self, request, response):
+        # Listings show category titles, default variant prices/images and ratings
+        return ['products', 'categories']
     
     def get_queryset(self):
         """Filter queryset based on query parameters"""
         queryset = super().get_queryset()
         
         # Support multiple category filters
+        # Parent-child selections use AND logic (intersection), unrelated/sibling
+        # selections use OR logic (union); resolved in memory from the cached tree.
         category_ids = self.request.query_params.getlist('category')
         
         if category_ids:
-            valid_categories = []
-            for category_id in category_ids:
-                try:
-                    category = Category.objects.get(id=category_id)
-                    valid_categories.append(category)
-                except (Category.DoesNotExist, ValueError):
-                    # If category doesn't exist or invalid ID, skip it
-                    continue
-            
-            if not valid_categories:
-                # No valid categories found, return empty queryset
-                queryset = queryset.none()
-            elif len(valid_categories) == 1:
-                # Single category: get all descendants (including itself)
-                category = valid_categories[0]
-                descendant_ids = category.get_descendants(include_self=True).values_list('id', flat=True)
-                queryset = queryset.filter(category_id__in=descendant_ids)
+            matching_ids = get_category_index().resolve_filter(category_ids)
+            if matching_ids:
+                queryset = queryset.filter(category_id__in=matching_ids)
             else:
-                # Multiple categories: Check if they have parent-child relationship
-                # If parent-child: Use AND logic (intersection)
-                # If different/sibling categories: Use OR logic (union)
-                
-                # Check if any category is a descendant of another
-                has_parent_child_relationship = False
-                for i, cat1 in enumerate(valid_categories):
-                    for j, cat2 in enumerate(valid_categories):
-                        if i != j:
-                            # Check if cat1 is ancestor of cat2 or vice versa
-                            if cat1.is_ancestor_of(cat2) or cat2.is_ancestor_of(cat1):
-                                has_parent_child_relationship = True
-                                break
-                    if has_parent_child_relationship:
-                        break
-                
-                if has_parent_child_relationship:
-                    # Parent-child relationship: Use AND logic (intersection)
-                    # Find products that are in ALL selected category trees
-                    all_possible_ids = []
-                    for category in valid_categories:
-                        descendant_ids = category.get_descendants(include_self=True).values_list('id', flat=True)
-                        all_possible_ids.append(set(descendant_ids))
-                    
-                    # Find intersection - categories that are descendants of ALL selected categories
-                    if all_possible_ids:
-                        intersection_ids = set.intersection(*all_possible_ids)
-                        
-                        if intersection_ids:
-                            # Filter products that belong to categories in the intersection
-                            queryset = queryset.filter(category_id__in=intersection_ids)
-                        else:
-                            # No intersection - no products match all categories
-                            queryset = queryset.none()
-                    else:
-                        queryset = queryset.none()
-                else:
-                    # Different/sibling categories: Use OR logic (union)
-                    # Show products from ANY of the selected categories
-                    all_category_ids = set()
-                    for category in valid_categories:
-                        descendant_ids = category.get_descendants(include_self=True).values_list('id', flat=True)
-                        all_category_ids.update(descendant_ids)
-                    
-                    if all_category_ids:
-                        queryset = queryset.filter(category_id__in=all_category_ids)
-                    else:
-                        queryset = queryset.none()
+                # No valid categories (or no intersection) - no products match
+                queryset = queryset.none()
         
         return queryset
     
@@ -128,16 +127,37 @@ class GalleryItemListView(generics.ListCreateAPIView):
         operation_description="Get list of all active gallery items. Supports filtering, searching, and ordering. No pagination - returns all results.",
         manual_parameters=[
             openapi.Parameter('category', openapi.IN_QUERY, description="Filter by category ID", type=openapi.TYPE_INTEGER),
-            openapi.Parameter('search', openapi.IN_QUERY, description="Search in title, description, keywords", type=openapi.TYPE_STRING),
+            openapi.Parameter('search', openapi.IN_QUERY, description="Full-text search in title, description, keywords (results ranked by relevance unless `ordering` is given)", type=openapi.TYPE_STRING),
             openapi.Parameter('ordering', openapi.IN_QUERY, description="Order by: timeStamp, updated, total_views, title", type=openapi.TYPE_STRING),
-        ],
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Opt in to cursor pagination with this many items per page (max 100)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Page token taken from the `next`/`previous` links of a paginated response", type=openapi.TYPE_STRING),
+        ] + SPARSE_FIELDSET_PARAMETERS + [STREAM_PARAMETER],
         responses={
             200: GalleryItemListSerializer(many=True),
         },
         tags=['Gallery Items']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
+        
+        # Cursor pagination is opt-in so existing clients still get the full list
+        if GalleryItemKeysetPagination.is_requested(request):
+            paginator = GalleryItemKeysetPagination()
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            serializer = self.get_serializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+        
+        # Anonymous lists skip model instances and serializer fields (same output)
+        if fast_serializers.is_enabled(request):
+            projection = fast_serializers.GalleryItemListProjection(request, self.get_fieldset())
+            if self.should_stream(request):
+                return self.stream_rows(projection.iter_rows(queryset, self.stream_chunk_size))
+            return Response(projection.data(queryset))
+        
+        if self.should_stream(request):
+            return self.stream_list(queryset)
+        
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -156,7 +176,7 @@ class GalleryItemListView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class GalleryItemDetailView(generics.RetrieveUpdateDestroyAPIView):
+class GalleryItemDetailView(SparseFieldsetViewMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a gallery item.
     
@@ -166,14 +186,14 @@ class GalleryItemDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     queryset = GalleryItem.objects.all().select_related(
         'category', 'default_variant', 'google_product_category'
-    ).prefetch_related(
-        'variant_set__variantimage_set',
-        'variant_set__variantvideo_set',
-        'variant_set__variantyoutubevideo_set',
-        'variant_set__variantsupply_set__supply__supplier',
-        'reviews'
     )
+    sparse_prefetches = GALLERY_ITEM_DETAIL_PREFETCHES
     lookup_field = 'pk'
+    # Conditional GET covers the product, its variants and rating aggregates (not the view
+    # count); related products, images and special prices change the `products`/`variants` tags
+    validator_timestamp_fields = ('updated', 'variant__updated')
+    validator_aggregates = {'rating_sum': Max('rating_sum'), 'rating_count': Max('rating_count')}
+    validator_tags = ('products', 'variants', 'reviews', 'categories')
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -185,21 +205,27 @@ class GalleryItemDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
     
+    def not_modified(self, request):
+        # A revalidated page is still a product view
+        record_view(self.validator_row['validator_pk'])
+    
     def retrieve(self, request, *args, **kwargs):
-        """Increment view count when retrieving"""
+        """Count the view (buffered, flushed in bulk) and return the item"""
         instance = self.get_object()
-        instance.total_views += 1
-        instance.save(update_fields=['total_views'])
-        return super().retrieve(request, *args, **kwargs)
+        record_view(instance.pk)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
 
     @swagger_auto_schema(
         operation_description="Get detailed information about a gallery item including variants, reviews, and ratings.",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         responses={
             200: GalleryItemDetailSerializer,
             404: 'Not Found'
         },
         tags=['Gallery Items']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
@@ -247,7 +273,7 @@ class GalleryItemDetailView(generics.RetrieveUpdateDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
-class GalleryItemBySlugView(generics.RetrieveAPIView):
+class GalleryItemBySlugView(SparseFieldsetViewMixin, ResponseCacheMixin, ConditionalGetMixin, generics.RetrieveAPIView):
     """
     Retrieve a gallery item by slug.
     
@@ -256,39 +282,57 @@ class GalleryItemBySlugView(generics.RetrieveAPIView):
     """
     queryset = GalleryItem.objects.filter(active=True).select_related(
         'category', 'default_variant', 'google_product_category'
-    ).prefetch_related(
-        'variant_set__variantimage_set',
-        'variant_set__variantvideo_set',
-        'variant_set__variantyoutubevideo_set',
-        'variant_set__variantsupply_set__supply__supplier',
-        'reviews'
     )
+    sparse_prefetches = GALLERY_ITEM_DETAIL_PREFETCHES
     serializer_class = GalleryItemDetailSerializer
     lookup_field = 'slug'
     permission_classes = [permissions.AllowAny]
+    # Same validators as GalleryItemDetailView
+    validator_timestamp_fields = GalleryItemDetailView.validator_timestamp_fields
+    validator_aggregates = GalleryItemDetailView.validator_aggregates
+    validator_tags = GalleryItemDetailView.validator_tags
+    
+    def get_cache_tags(self, request, response):
+        # `id` may have been left out with ?fields=/?omit=
+        product_id = self.object.pk
+        tags = [f'product:{product_id}', f'reviews:{product_id}', 'categories']
+        tags.extend(f"product:{related['id']}" for related in response.data.get('related_products') or [])
+        return tags
+    
+    def get_cache_meta(self, request, response):
+        return self.object.pk
+    
+    def cache_hit(self, request, product_id):
+        # Cached pages still count as product views
+        record_view(product_id)
+    
+    def not_modified(self, request):
+        record_view(self.validator_row['validator_pk'])
     
     def retrieve(self, request, *args, **kwargs):
-        """Increment view count when retrieving and return with related products"""
-        instance = self.get_object()
-        instance.total_views += 1
-        instance.save(update_fields=['total_views'])
+        """Count the view (buffered, flushed in bulk) and return with related products"""
+        instance = self.object = self.get_object()
+        record_view(instance.pk)
         
-        # Get response from parent class (related products are included in serializer)
-        return super().retrieve(request, *args, **kwargs)
+        # Related products are included in serializer
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
 
     @swagger_auto_schema(
         operation_description="Get gallery item by slug (SEO-friendly URL).",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         responses={
             200: GalleryItemDetailSerializer,
             404: 'Not Found'
         },
         tags=['Gallery Items']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
 
-class VariantListView(generics.ListCreateAPIView):
+class VariantListView(StreamingListMixin, SparseFieldsetViewMixin, ResponseCacheMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     """
     List variants for a specific product or create a new variant.
     
@@ -301,6 +345,11 @@ class VariantListView(generics.ListCreateAPIView):
     ordering_fields = ['price', 'quantity', 'updated']
     ordering = ['-updated']
     pagination_class = None  # Disable pagination
+    validator_timestamp_fields = ('updated',)
+    validator_tags = ('variants',)
+    
+    def get_cache_tags(self, request, response):
+        return ['variants']
     
     def get_queryset(self):
         """Filter queryset based on query parameters"""
@@ -327,14 +376,17 @@ class VariantListView(generics.ListCreateAPIView):
         operation_description="Get list of variants. Filter by product_id to get variants for a specific product. No pagination.",
         manual_parameters=[
             openapi.Parameter('product', openapi.IN_QUERY, description="Filter by product ID", type=openapi.TYPE_INTEGER, required=True),
-        ],
+        ] + SPARSE_FIELDSET_PARAMETERS + [STREAM_PARAMETER],
         responses={
             200: VariantSerializer(many=True),
         },
         tags=['Variants']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
+        if self.should_stream(request):
+            return self.stream_list(queryset)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -353,7 +405,7 @@ class VariantListView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class VariantDetailView(generics.RetrieveUpdateDestroyAPIView):
+class VariantDetailView(SparseFieldsetViewMixin, ResponseCacheMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a variant.
     
@@ -365,6 +417,11 @@ class VariantDetailView(generics.RetrieveUpdateDestroyAPIView):
         'variantimage_set', 'variantvideo_set', 'variantyoutubevideo_set'
     )
     serializer_class = VariantSerializer
+    validator_timestamp_fields = ('updated',)
+    validator_tags = ('variants',)
+    
+    def get_cache_tags(self, request, response):
+        return [f"variant:{self.kwargs['pk']}"]
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -378,12 +435,14 @@ class VariantDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     @swagger_auto_schema(
         operation_description="Get detailed information about a variant including images and videos.",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         responses={
             200: VariantSerializer,
             404: 'Not Found'
         },
         tags=['Variants']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
@@ -431,31 +490,38 @@ class VariantDetailView(generics.RetrieveUpdateDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(ConditionalGetMixin, generics.ListAPIView):
     """
     List all categories.
     
     GET: Returns a hierarchical list of all categories. No pagination.
+         The tree is built from one query and cached until a category or
+         product changes; only rendering runs per request.
     """
     queryset = Category.objects.filter(level=0)  # Get root categories only
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None  # Disable pagination
 
+    def get_validators(self, request):
+        # The tree changes with categories and product counts: one content-version read
+        versions = get_content_versions(('categories', 'products'))
+        return quote_etag(f"categories-{versions['categories']}-{versions['products']}"), None
+
     @swagger_auto_schema(
-        operation_description="Get hierarchical list of all categories (tree structure). No pagination.",
+        operation_description="Get hierarchical list of all categories (tree structure) with direct "
+                              "(products_count) and subtree (products_cumulative_count) active product counts. No pagination.",
         responses={
             200: CategorySerializer(many=True),
         },
         tags=['Categories']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return Response(get_category_tree(request))
 
 
-class CategoryDetailView(generics.RetrieveAPIView):
+class CategoryDetailView(ResponseCacheMixin, ConditionalGetMixin, generics.RetrieveAPIView):
     """
     Retrieve a category.
     
@@ -464,6 +530,11 @@ class CategoryDetailView(generics.RetrieveAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    validator_tags = ('categories',)
+    
+    def get_cache_tags(self, request, response):
+        # Nested children can change without this category's row changing
+        return [f"category:{response.data['id']}", 'categories']
 
     @swagger_auto_schema(
         operation_description="Get category details including children categories.",
@@ -473,11 +544,12 @@ class CategoryDetailView(generics.RetrieveAPIView):
         },
         tags=['Categories']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
 
-class ReviewListView(generics.ListCreateAPIView):
+class ReviewListView(StreamingListMixin, SparseFieldsetViewMixin, ResponseCacheMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     """
     List reviews for a product or create a new review.
     
@@ -489,6 +561,13 @@ class ReviewListView(generics.ListCreateAPIView):
     ordering_fields = ['date_added', 'rating']
     ordering = ['-date_added']
     pagination_class = None  # Disable pagination
+    # Reviews have no edit timestamp (so no Last-Modified); edits bump the `reviews` tag
+    validator_aggregates = {'latest': Max('date_added'), 'rating_sum': Sum('rating')}
+    validator_tags = ('reviews',)
+    
+    def get_cache_tags(self, request, response):
+        product_id = request.query_params.get('product')
+        return [f'reviews:{product_id}'] if product_id else ['reviews']
     
     def get_queryset(self):
         """Filter queryset based on query parameters"""
@@ -520,14 +599,17 @@ class ReviewListView(generics.ListCreateAPIView):
             openapi.Parameter('product', openapi.IN_QUERY, description="Filter by product ID", type=openapi.TYPE_INTEGER, required=True),
             openapi.Parameter('rating', openapi.IN_QUERY, description="Filter by rating (1-5)", type=openapi.TYPE_INTEGER),
             openapi.Parameter('featured', openapi.IN_QUERY, description="Filter featured reviews", type=openapi.TYPE_BOOLEAN),
-        ],
+        ] + SPARSE_FIELDSET_PARAMETERS + [STREAM_PARAMETER],
         responses={
             200: ReviewSerializer(many=True),
         },
         tags=['Reviews']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
+        if self.should_stream(request):
+            return self.stream_list(queryset)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -551,7 +633,7 @@ class ReviewListView(generics.ListCreateAPIView):
         return Response(output_serializer.data, status=status.HTTP_201_CREATED)
 
 
-class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ReviewDetailView(SparseFieldsetViewMixin, ResponseCacheMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a review.
     
@@ -561,6 +643,11 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     queryset = Review.objects.all().select_related('product', 'author')
     serializer_class = ReviewSerializer
+    validator_aggregates = {'latest': Max('date_added'), 'rating_sum': Sum('rating')}
+    validator_tags = ('reviews',)
+    
+    def get_cache_tags(self, request, response):
+        return [f"review:{self.kwargs['pk']}"]
     
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
@@ -598,12 +685,14 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     @swagger_auto_schema(
         operation_description="Get review details.",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         responses={
             200: ReviewSerializer,
             404: 'Not Found'
         },
         tags=['Reviews']
     )
+    @conditional_get
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
@@ -651,7 +740,92 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
-class WishedItemListView(generics.ListCreateAPIView):
+class RankingListView(ResponseCacheMixin, generics.ListAPIView):
+    """
+    Top products by a materialized ranking.
+    
+    GET: Returns the latest daily ranking (most favorited / viewed / sold) computed by
+         `python manage.py compute_rankings`. No live aggregation. No pagination.
+    """
+    serializer_class = RankingSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None  # Disable pagination
+    default_limit = 10
+    max_limit = 50
+    
+    def get_cache_tags(self, request, response):
+        return ['rankings', 'products']
+    
+    def get_queryset(self):
+        criteria = resolve_criteria(self.request.query_params.get('criteria'))
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except (TypeError, ValueError):
+            limit = self.default_limit
+        return top_rankings(criteria, max(1, min(limit, self.max_limit)))
+
+    @swagger_auto_schema(
+        operation_description="Get top products by ranking criteria (daily materialized). No pagination.",
+        manual_parameters=[
+            openapi.Parameter('criteria', openapi.IN_QUERY, description="F/favorited, V/viewed or S/sold", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Number of products (default 10, max 50)", type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            200: RankingSerializer(many=True),
+            400: 'Bad Request - Unknown criteria'
+        },
+        tags=['Gallery Items']
+    )
+    def get(self, request, *args, **kwargs):
+        if resolve_criteria(request.query_params.get('criteria')) is None:
+            return Response(
+                {'error': 'criteria must be one of F, V, S (favorited, viewed, sold)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().get(request, *args, **kwargs)
+
+
+class CatalogChangesView(APIView):
+    """
+    Catalog change feed for incremental frontend sync.
+    
+    GET: Products, variants (price/stock) and tombstones (deletions/deactivations) changed
+         after `since`. Pass the returned `cursor` back as `since` until `has_more` is false.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @swagger_auto_schema(
+        operation_description="Get catalog changes after a cursor (omit `since` for a full sync). "
+                              "Returns products, variants, tombstones, the next `cursor` and `has_more`.",
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY, description="Cursor from the previous response", type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description=f"Rows per stream (default {CHANGE_FEED_LIMIT}, max 2000)", type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            200: 'Changes since the cursor',
+            400: 'Bad Request - Invalid cursor',
+            410: 'Gone - Cursor older than the tombstone retention; resync without `since`'
+        },
+        tags=['Gallery Items']
+    )
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', CHANGE_FEED_LIMIT))
+        except ValueError:
+            limit = CHANGE_FEED_LIMIT
+        try:
+            data = ChangeFeed(request, limit).read(request.query_params.get('since'))
+        except ExpiredCursor:
+            return Response(
+                {'error': 'Cursor expired; resync without `since`'},
+                status=status.HTTP_410_GONE
+            )
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+
+class WishedItemListView(StreamingListMixin, generics.ListCreateAPIView):
     """
     List user's wishlist items or add item to wishlist.
     
@@ -680,6 +854,7 @@ class WishedItemListView(generics.ListCreateAPIView):
 
     @swagger_auto_schema(
         operation_description="Get current user's wishlist items. No pagination.",
+        manual_parameters=[STREAM_PARAMETER],
         responses={
             200: WishedItemSerializer(many=True),
             401: 'Unauthorized - Authentication required'
@@ -689,6 +864,8 @@ class WishedItemListView(generics.ListCreateAPIView):
     )
     def get(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
+        if self.should_stream(request):
+            return self.stream_list(queryset)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -764,63 +941,130 @@ class WishedItemDetailView(generics.RetrieveDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
+class Echo:
+    """File-like object for csv.writer that returns each row instead of buffering it"""
+    def write(self, value):
+        return value
+
+
 class StockStatusAPIView(APIView):
     """
     API to get stock status of all products/variants.
     Returns products with their stock information.
+    
+    The summary is one conditional-aggregate query; the variant list is paginated
+    (`page`, `page_size`). `export=csv` or `export=ndjson` streams every matching
+    variant instead, reading rows in chunks so memory stays flat.
     """
     permission_classes = [permissions.IsAdminUser]  # Only admins can view stock status
+    low_stock_threshold = 10
+    page_size = 100
+    max_page_size = 500
+    export_chunk_size = 2000
+    export_fields = (
+        ('id', 'id'), ('product_id', 'product_id'), ('product', 'product__title'),
+        ('category', 'product__category__title'), ('variant', 'title'), ('price', 'price'),
+        ('quantity', 'quantity'), ('active', 'active'), ('updated', 'updated'),
+    )
+    
+    def filter_variants(self, request, variants):
+        """Apply the category/search/stock filters from the query string"""
+        stock_filter = request.GET.get('filter', 'all')  # all, in_stock, out_of_stock, low_stock
+        category_id = request.GET.get('category', None)
+        search_query = request.GET.get('search', None)
+        
+        if category_id:
+            variants = variants.filter(product__category_id=category_id)
+        
+        if search_query:
+            variants = variants.filter(
+                Q(product__title__icontains=search_query) |
+                Q(title__icontains=search_query)
+            )
+        
+        # Stock status filter
+        if stock_filter == 'in_stock':
+            variants = variants.filter(quantity__gt=0)
+        elif stock_filter == 'out_of_stock':
+            variants = variants.filter(quantity=0)
+        elif stock_filter == 'low_stock':
+            variants = variants.filter(quantity__gt=0, quantity__lte=self.low_stock_threshold)
+        return variants
+    
+    def get_summary(self, filtered):
+        """Global stock summary plus the filtered count, in a single query"""
+        low_stock = Q(quantity__gt=0, quantity__lte=self.low_stock_threshold)
+        return Variant.objects.aggregate(
+            total_variants=Count('id'),
+            in_stock=Count('id', filter=Q(quantity__gt=0)),
+            out_of_stock=Count('id', filter=Q(quantity=0)),
+            low_stock=Count('id', filter=low_stock),
+            total_quantity=Sum('quantity', default=0),
+            count=Count('id', filter=Q(pk__in=filtered.values('pk'))),
+        )
+    
+    def export(self, variants, export_format):
+        """Stream matching variants as CSV or NDJSON without serializers"""
+        headers = [name for name, _ in self.export_fields]
+        rows = variants.order_by('id').values_list(
+            *[field for _, field in self.export_fields]
+        ).iterator(chunk_size=self.export_chunk_size)
+        
+        if export_format == 'ndjson':
+            encoder = DjangoJSONEncoder(ensure_ascii=False)
+            content = (encoder.encode(dict(zip(headers, row))) + '\n' for row in rows)
+            response = StreamingHttpResponse(content, content_type='application/x-ndjson')
+            extension = 'ndjson'
+        else:
+            writer = csv.writer(Echo())
+            content = (writer.writerow(row) for row in itertools.chain([headers], rows))
+            response = StreamingHttpResponse(content, content_type='text/csv')
+            extension = 'csv'
+        response['Content-Disposition'] = f'attachment; filename="stock-status.{extension}"'
+        return response
     
     def get(self, request):
         """Get stock status for all variants"""
         try:
-            # Get filter parameters
-            stock_filter = request.GET.get('filter', 'all')  # all, in_stock, out_of_stock, low_stock
-            category_id = request.GET.get('category', None)
-            search_query = request.GET.get('search', None)
+            variants = self.filter_variants(
+                request, Variant.objects.select_related('product', 'product__category').all()
+            )
             
-            # Base queryset
-            variants = Variant.objects.select_related('product', 'product__category').all()
+            export_format = request.GET.get('export')
+            if export_format in ('csv', 'ndjson'):
+                return self.export(variants, export_format)
             
-            # Apply filters
-            if category_id:
-                variants = variants.filter(product__category_id=category_id)
+            summary = self.get_summary(variants)
+            count = summary.pop('count')
             
-            if search_query:
-                variants = variants.filter(
-                    Q(product__title__icontains=search_query) |
-                    Q(title__icontains=search_query)
-                )
+            try:
+                page_size = min(int(request.GET.get('page_size', self.page_size)), self.max_page_size)
+                page = int(request.GET.get('page', 1))
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'error': 'page and page_size must be integers'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            page_size = max(page_size, 1)
+            total_pages = max((count + page_size - 1) // page_size, 1)
+            page = min(max(page, 1), total_pages)
             
-            # Stock status filter
-            if stock_filter == 'in_stock':
-                variants = variants.filter(quantity__gt=0)
-            elif stock_filter == 'out_of_stock':
-                variants = variants.filter(quantity=0)
-            elif stock_filter == 'low_stock':
-                variants = variants.filter(quantity__gt=0, quantity__lte=10)
+            page_variants = variants.order_by('product__title', 'id').prefetch_related(
+                'variantimage_set', 'variantvideo_set', 'variantyoutubevideo_set',
+                'variantsupply_set__supply__supplier'
+            )[(page - 1) * page_size:page * page_size]
             
             # Serialize data
-            serializer = VariantSerializer(variants, many=True, context={'request': request})
-            
-            # Calculate summary statistics
-            total_variants = Variant.objects.count()
-            in_stock_count = Variant.objects.filter(quantity__gt=0).count()
-            out_of_stock_count = Variant.objects.filter(quantity=0).count()
-            low_stock_count = Variant.objects.filter(quantity__gt=0, quantity__lte=10).count()
-            total_quantity = Variant.objects.aggregate(total=Sum('quantity'))['total'] or 0
+            serializer = VariantSerializer(page_variants, many=True, context={'request': request})
             
             return Response({
                 'success': True,
-                'summary': {
-                    'total_variants': total_variants,
-                    'in_stock': in_stock_count,
-                    'out_of_stock': out_of_stock_count,
-                    'low_stock': low_stock_count,
-                    'total_quantity': total_quantity,
-                },
+                'summary': summary,
                 'variants': serializer.data,
-                'count': variants.count(),
+                'count': count,
+                'page': page,
+                'page_size': page_size,
+                'total_pages': total_pages,
             })
         except Exception as e:
             return Response({
@@ -828,3 +1072,14 @@ class StockStatusAPIView(APIView):
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+def serve_immutable_media(request, path, document_root=None):
+    """
+    Development media view for content-addressed files (MEDIA_URL/cas/...):
+    their names change whenever the content does, so they never need revalidation.
+    """
+    from django.views.static import serve
+
+    response = serve(request, path, document_root=document_root)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
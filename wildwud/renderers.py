@@ -0,0 +1,44 @@
+"""
+Project-wide JSON renderer backed by orjson.
+
+orjson serializes datetimes (with a `Z` suffix for UTC, like DRF), dates,
+times and UUIDs natively and much faster than the stdlib encoder; Decimal and
+the other types DRF's encoder knows (lazy strings, timedeltas, querysets, ...)
+go through DRF's encoder as `default`, so the bytes match JSONRenderer's
+compact, unescaped-unicode output for JSON-representable data.
+
+One deliberate difference: NaN and +/-Infinity floats are rendered as `null`,
+where JSONRenderer (strict JSON, allow_nan=False) raises ValueError and the
+request fails with a 500. Finding them first would mean walking every
+response in Python, which costs more than the orjson encoding saves.
+
+Falls back to DRF's JSONRenderer when orjson is not installed, when the client
+asks for indented output, when UNICODE_JSON/COMPACT_JSON are turned off, or
+for data orjson refuses (e.g. integers wider than 64 bits).
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer producing the same bytes through orjson (non-finite floats become null)"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except TypeError:  # orjson.JSONEncodeError
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer: U+2028/U+2029 are not valid in JavaScript strings
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
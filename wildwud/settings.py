@@ -159,11 +159,82 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed JSON (same output as DRF's JSONRenderer; falls back to it without orjson)
+    'DEFAULT_RENDERER_CLASSES': (
+        'wildwud.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     # Pagination removed - frontend will handle pagination
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     # 'PAGE_SIZE': 20
 }
 
+# Cache: the response cache, the 'cache' view counter and the cached category tree/index
+# need a cache shared by every worker and management command with atomic incr(), i.e.
+# Redis or Memcached, e.g. DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# and DJANGO_CACHE_LOCATION=redis://127.0.0.1:6379. Without one (the local-memory default)
+# those features stay off. GALLERY_CACHE_SHARED=True forces them on for another backend that
+# is shared (or a single-process deployment); don't use the database cache for this, it
+# writes to the database on every request.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
+    }
+}
+GALLERY_CACHE_SHARED = {'true': True, 'false': False}.get(os.environ.get('GALLERY_CACHE_SHARED', '').lower())
+
+# Product search backend: 'auto' uses the full-text index (SQLite FTS5 / PostgreSQL tsvector),
+# 'icontains' falls back to plain LIKE searches. Rebuild with: python manage.py rebuild_search_index
+GALLERY_SEARCH_BACKEND = os.environ.get('GALLERY_SEARCH_BACKEND', 'auto')
+
+# Product view counter: hits are buffered and flushed in bulk instead of one UPDATE per page view.
+# 'local' buffers per process (flushed every interval/threshold and at exit);
+# 'cache' shares counters through the shared (Redis/Memcached) cache and needs a scheduled
+# python manage.py flush_view_counts; without a shared cache it falls back to 'local'
+GALLERY_VIEW_COUNTER_BACKEND = os.environ.get('GALLERY_VIEW_COUNTER_BACKEND', 'local')
+GALLERY_VIEW_FLUSH_INTERVAL = 30  # seconds
+GALLERY_VIEW_FLUSH_THRESHOLD = 500  # pending hits
+
+# Anonymous GET responses of the public catalog APIs are cached and purged by tag when
+# products/variants/reviews/categories change. Counters: python manage.py response_cache_stats
+GALLERY_RESPONSE_CACHE_ENABLED = os.environ.get('GALLERY_RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+GALLERY_RESPONSE_CACHE_TIMEOUT = 60 * 5  # seconds
+GALLERY_RESPONSE_CACHE_MAX_STREAM_BYTES = 1024 * 1024  # larger streamed bodies are not cached
+
+# Unpaginated catalog lists can be streamed as chunked JSON arrays (?stream=true) so worker
+# memory does not grow with the catalog; True makes streaming the default (?stream=false opts out)
+GALLERY_STREAM_LIST_RESPONSES = os.environ.get('GALLERY_STREAM_LIST_RESPONSES', 'False').lower() == 'true'
+
+# Anonymous product lists are built from .values() projections instead of serializer instances
+# (same JSON, see galleryItem.fast_serializers). Compare with: python manage.py benchmark_list_serializers
+GALLERY_FAST_LIST_SERIALIZER = os.environ.get('GALLERY_FAST_LIST_SERIALIZER', 'True').lower() == 'true'
+
+# Catalog change feed (/api/gallery/changes/): rows are served once older than the settle window
+# (longer than the slowest catalog-writing transaction); tombstones are kept RETENTION_DAYS
+# and pruned with: python manage.py prune_catalog_tombstones
+GALLERY_CHANGE_FEED_SETTLE_SECONDS = 30
+GALLERY_CHANGE_FEED_RETENTION_DAYS = 90
+
+# Static catalog snapshots for the frontend's ISR builds (galleryItem.snapshots), written
+# incrementally with: python manage.py build_catalog_snapshot
+# Serve the directory directly (nginx: gzip_static/brotli_static on); the base URL host
+# must be in ALLOWED_HOSTS
+GALLERY_SNAPSHOT_ROOT = Path(os.environ.get('GALLERY_SNAPSHOT_ROOT', BASE_DIR / 'snapshots'))
+GALLERY_SNAPSHOT_BASE_URL = os.environ.get('GALLERY_SNAPSHOT_BASE_URL', 'http://localhost:8000')
+
+# Responsive image derivatives (WebP + JPEG at fixed widths) stored next to the uploaded
+# originals. Generated in a background thread after upload unless ASYNC is False; the
+# thread needs uWSGI's `enable-threads = true`. Schedule (and backfill with)
+# python manage.py generate_image_derivatives to catch anything the thread missed
+GALLERY_IMAGE_DERIVATIVE_WIDTHS = (200, 400, 800, 1600)
+GALLERY_IMAGE_DERIVATIVES_ASYNC = os.environ.get('GALLERY_IMAGE_DERIVATIVES_ASYNC', 'True').lower() == 'true'
+
+# Product images are stored once per distinct content under MEDIA_ROOT/cas/ and
+# reference-counted (galleryItem.storage); serve MEDIA_URL/cas/ with
+# "Cache-Control: public, max-age=31536000, immutable"
+GALLERY_CONTENT_ADDRESSED_MEDIA = os.environ.get('GALLERY_CONTENT_ADDRESSED_MEDIA', 'True').lower() == 'true'
+
 # JWT Settings
 from datetime import timedelta
 
@@ -86,6 +86,13 @@ if SWAGGER_AVAILABLE and schema_view:
 # This only works when DEBUG=True (local development)
 # On production (PythonAnywhere), media files are served by the web server
 if settings.DEBUG:
+    from galleryItem.views import serve_immutable_media
+
+    # Content-addressed product images never change, so they get far-future cache headers
+    urlpatterns += [
+        re_path(r'^%s(?P<path>cas/.*)$' % settings.MEDIA_URL.lstrip('/'), serve_immutable_media,
+                {'document_root': settings.MEDIA_ROOT}),
+    ]
     # Serve media files (images, uploads, etc.)
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     # Serve files from products/ folder when URL starts with /products/